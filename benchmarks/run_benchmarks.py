@@ -0,0 +1,289 @@
+"""Benchmarks of the capture, preprocessing, inference and training paths.
+
+Everything runs on synthetic frames and a tiny generated dataset, so a CPU-only
+box without a camera is enough. Results are written as JSON, and a previous
+results file can be compared against to catch regressions between commits:
+
+    python -m benchmarks.run_benchmarks --output bench_results.json
+    python -m benchmarks.run_benchmarks --quick --compare bench_results.json
+
+Benchmarks:
+
+    display     frames/sec of mirroring a BGR frame into the Tk image (pipeline.FrameRenderer)
+                and of making the unmirrored image a saved frame needs
+    inference   cold start, preprocessing and single/batched latency of the
+                make_and_train_model architecture, saved as .h5 and as its lean
+                SavedModel export (exported_ metrics, see cnn.export_inference_model)
+    input       images/sec of decoding the dataset into its cache and of streaming
+                batches from the cache and from the image folders
+    training    images/sec of model.fit on the cached dataset
+
+Every benchmark records the peak RSS of the process once it is done.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_dataset, make_frames
+
+BENCHMARK_NAMES = ("display", "inference", "input", "training")
+
+# Defaults for run_benchmarks, the model resolution is the one the CLI trains at
+DEFAULT_MODEL_WIDTH = 320
+DEFAULT_MODEL_HEIGHT = 240
+DEFAULT_INFERENCE_BATCH_SIZES = (1, 8, 32)
+DEFAULT_TRAINING_BATCH_SIZE = 32
+DEFAULT_ITERATIONS = 200
+QUICK_ITERATIONS = 20
+
+# Defaults for compare, metrics are expected to get worse by no more than this fraction
+DEFAULT_TOLERANCE = 0.2
+# Metric name endings where larger is better, smaller is better for the other timings
+HIGHER_IS_BETTER = ("fps", "per_sec")
+LOWER_IS_BETTER = ("_ms", "_seconds", "_mb")
+
+# Output format strings
+RESULT_MSG = "{benchmark:<10} {metric:<32} {value:>12.3f}"
+REGRESSION_MSG = "{benchmark}.{metric}: {old:.3f} -> {new:.3f} ({change:+.1%})"
+NO_REGRESSIONS_MSG = "No regressions beyond {tolerance:.0%}"
+
+
+def _peak_rss_mb():
+    """Returns: The peak resident set size of this process so far, in MB (Linux reports KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _time_calls(function, iterations: int, warmup: int = 3):
+    """Calls function warmup times, then times iterations calls.
+
+    Returns: An array of the seconds every timed call took
+    """
+    for _ in range(warmup):
+        function()
+
+    seconds = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        function()
+        seconds[i] = time.perf_counter() - start
+    return seconds
+
+
+def _latency(seconds: np.ndarray, prefix: str = ""):
+    """Returns: A dictionary of the p50, p99 and mean of seconds in milliseconds"""
+    return {f"{prefix}p50_ms": float(np.percentile(seconds, 50) * 1000),
+            f"{prefix}p99_ms": float(np.percentile(seconds, 99) * 1000),
+            f"{prefix}mean_ms": float(seconds.mean() * 1000)}
+
+
+def bench_display(frames: np.ndarray, iterations: int):
+    """Measures the display path of pipeline.FramePipeline without a window."""
+    from pipeline import Frame, FrameRenderer
+
+    renderer = FrameRenderer()
+    positions = iter(range(10 ** 9))
+    render_seconds = _time_calls(lambda: renderer.render(frames[next(positions) % len(frames)]), iterations)
+    save_seconds = _time_calls(lambda: Frame(0, frames[next(positions) % len(frames)]).to_image(), iterations)
+
+    return {"render_fps": float(1 / render_seconds.mean()), **_latency(render_seconds, "render_"),
+            "save_image_fps": float(1 / save_seconds.mean())}
+
+
+def bench_inference(model_path: str, frames: np.ndarray, batch_sizes, iterations: int):
+    """Measures loading the model and running it through the detector's classification path."""
+    from backends import load_backend
+    from detector import FrameClassifier
+
+    start = time.perf_counter()
+    backend = load_backend(model_path)
+    classes = backend.predict(np.zeros((1, *backend.input_shape), dtype=np.uint8)).shape[-1]
+    results = {"cold_start_seconds": time.perf_counter() - start}
+
+    classifier = FrameClassifier(backend, [str(i) for i in range(classes)])
+    positions = iter(range(10 ** 9))
+    preprocess_seconds = _time_calls(lambda: classifier.preprocess(frames[next(positions) % len(frames)]), iterations)
+    results["preprocess_fps"] = float(1 / preprocess_seconds.mean())
+
+    inputs = np.stack([classifier.preprocess(frame) for frame in frames[:max(batch_sizes)]])
+    for batch_size in batch_sizes:
+        batch = np.resize(inputs, (batch_size, *inputs.shape[1:]))
+        seconds = _time_calls(lambda: backend.predict(batch), max(3, iterations // batch_size))
+        results.update(_latency(seconds, f"batch_{batch_size}_"))
+        results[f"batch_{batch_size}_fps"] = float(batch_size / seconds.mean())
+
+    return results
+
+
+def bench_input(dataset_dir: str, width: int, height: int, batch_size: int, image_count: int, epochs: int):
+    """Measures decoding the dataset into its cache and streaming training batches."""
+    import cnn
+    import dataset_cache
+
+    cache = dataset_cache.DatasetCache(dataset_dir, width, height)
+    start = time.perf_counter()
+    cache.update()
+    results = {"cache_decode_images_per_sec": image_count / (time.perf_counter() - start)}
+
+    def images_per_sec(dataset):
+        images = 0
+        start = time.perf_counter()
+        for _ in range(epochs):
+            for batch, _ in dataset:
+                images += len(batch)
+        return images / (time.perf_counter() - start)
+
+    results["cached_images_per_sec"] = images_per_sec(cache.dataset(None, batch_size, shuffle=True))
+    folder_ds = cnn._load_split(dataset_dir, "training", width, height, batch_size)
+    results["folder_images_per_sec"] = images_per_sec(folder_ds)
+
+    return results
+
+
+def bench_training(dataset_dir: str, width: int, height: int, batch_size: int, epochs: int):
+    """Measures model.fit of the make_and_train_model architecture on the cached dataset."""
+    import cnn
+    import dataset_cache
+
+    cache = dataset_cache.DatasetCache(dataset_dir, width, height)
+    cache.update()
+    train_ds = cache.dataset("training", batch_size)
+    model = cnn._build_model(len(cache.class_names), width, height)
+
+    # The first epoch traces the training step, only the later ones are timed
+    model.fit(train_ds, epochs=1, verbose=0)
+    start = time.perf_counter()
+    model.fit(train_ds, epochs=epochs, verbose=0)
+    seconds = time.perf_counter() - start
+
+    return {"train_images_per_sec": len(cache.split("training")[0]) * epochs / seconds,
+            "epoch_seconds": seconds / epochs}
+
+
+def _environment():
+    """Returns: A dictionary describing the machine and the commit the results belong to"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    import tensorflow as tf
+    return {"commit": commit, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "numpy": np.__version__,
+            "tensorflow": tf.__version__}
+
+
+def run_benchmarks(names=BENCHMARK_NAMES, quick: bool = False):
+    """Runs the benchmarks named in names on synthetic data.
+
+    Args:
+        names: The benchmarks to run, see BENCHMARK_NAMES
+        quick: A boolean representing if fewer iterations and a smaller dataset are used (smoke runs)
+
+    Returns: A dictionary of the environment and the results of every benchmark
+    """
+    iterations = QUICK_ITERATIONS if quick else DEFAULT_ITERATIONS
+    images_per_class = 10 if quick else 60
+    epochs = 1 if quick else 3
+    width, height = DEFAULT_MODEL_WIDTH, DEFAULT_MODEL_HEIGHT
+    frames = make_frames(16 if quick else 64)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dataset_dir = os.path.join(tmp_dir, "datasets")
+        image_count = make_dataset(dataset_dir, images_per_class=images_per_class)
+
+        for name in names:
+            if name == "display":
+                results[name] = bench_display(frames, iterations)
+            elif name == "inference":
+                import cnn
+                model_path = os.path.join(tmp_dir, "bench_model.h5")
+                cnn._build_model(3, width, height).save(model_path)
+                results[name] = bench_inference(model_path, frames, DEFAULT_INFERENCE_BATCH_SIZES, iterations)
+                export_path = cnn.export_inference_model(model_path, compare=False)
+                exported = bench_inference(export_path, frames, DEFAULT_INFERENCE_BATCH_SIZES, iterations)
+                results[name].update({f"exported_{metric}": value for metric, value in exported.items()})
+            elif name == "input":
+                results[name] = bench_input(dataset_dir, width, height, DEFAULT_TRAINING_BATCH_SIZE,
+                                            image_count, epochs)
+            elif name == "training":
+                results[name] = bench_training(dataset_dir, width, height, DEFAULT_TRAINING_BATCH_SIZE, epochs)
+            else:
+                raise ValueError(f"Unknown benchmark {name}, expected one of: {', '.join(BENCHMARK_NAMES)}")
+
+            results[name]["peak_rss_mb"] = _peak_rss_mb()
+
+    return {"environment": _environment(), "quick": quick, "results": results}
+
+
+def compare(old: dict, new: dict, tolerance: float = DEFAULT_TOLERANCE):
+    """Finds the metrics of new that got worse than in old by more than tolerance.
+
+    Only metrics whose name says which direction is better are compared.
+
+    Returns: A list of (benchmark, metric, old value, new value, relative change) tuples
+    """
+    regressions = []
+    for benchmark, metrics in new["results"].items():
+        for metric, value in metrics.items():
+            old_value = old["results"].get(benchmark, {}).get(metric)
+            if not old_value:
+                continue
+
+            change = (value - old_value) / old_value
+            if metric.endswith(HIGHER_IS_BETTER):
+                worse = change < -tolerance
+            elif metric.endswith(LOWER_IS_BETTER):
+                worse = change > tolerance
+            else:
+                continue
+
+            if worse:
+                regressions.append((benchmark, metric, old_value, value, change))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of capture, preprocessing, inference and training")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON results of an earlier run, regressions make the exit code 1")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Fraction a metric may get worse before it counts as a regression")
+    parser.add_argument("--quick", action="store_true", help="Few iterations and a tiny dataset")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARK_NAMES, default=BENCHMARK_NAMES)
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.only, args.quick)
+    for benchmark, metrics in report["results"].items():
+        for metric, value in metrics.items():
+            print(RESULT_MSG.format(benchmark=benchmark, metric=metric, value=value))
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r") as old_file:
+            regressions = compare(json.load(old_file), report, args.tolerance)
+        for benchmark, metric, old_value, new_value, change in regressions:
+            print(REGRESSION_MSG.format(benchmark=benchmark, metric=metric, old=old_value, new=new_value,
+                                        change=change))
+        if not regressions:
+            print(NO_REGRESSIONS_MSG.format(tolerance=args.tolerance))
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
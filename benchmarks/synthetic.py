@@ -0,0 +1,43 @@
+"""Synthetic inputs for the benchmarks, so they run without a camera or real datasets."""
+import numpy as np
+import os
+
+from PIL import Image
+
+# Resolution of the synthetic camera frames, the default capture size of most webcams
+DEFAULT_FRAME_WIDTH = 640
+DEFAULT_FRAME_HEIGHT = 480
+DEFAULT_SEED = 1234
+
+
+def make_frames(count: int, width: int = DEFAULT_FRAME_WIDTH, height: int = DEFAULT_FRAME_HEIGHT,
+                seed: int = DEFAULT_SEED):
+    """Makes camera-like BGR frames: a smooth gradient with noise, so encoders and
+    resizing do real work.
+
+    Returns: A uint8 array shaped (count, height, width, 3)
+    """
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 200, width, dtype=np.float32)[None, :, None]
+    frames = gradient + rng.normal(0, 20, (count, height, width, 3)).astype(np.float32)
+    return np.clip(frames, 0, 255).astype(np.uint8)
+
+
+def make_dataset(dataset_dir: str, class_names=("alice", "bob", "carol"), images_per_class: int = 40,
+                 width: int = 160, height: int = 120, seed: int = DEFAULT_SEED):
+    """Writes a tiny dataset of PNG images in the layout data_collect.create_dataset makes.
+
+    Every class gets its own brightness so a model can actually learn them apart.
+
+    Returns: The number of images written
+    """
+    rng = np.random.default_rng(seed)
+    for index, class_name in enumerate(class_names):
+        class_dir = os.path.join(dataset_dir, class_name)
+        os.makedirs(class_dir, exist_ok=True)
+        base = 40 + index * 160 // max(1, len(class_names) - 1)
+        for i in range(images_per_class):
+            image = np.clip(base + rng.normal(0, 25, (height, width, 3)), 0, 255).astype(np.uint8)
+            Image.fromarray(image).save(os.path.join(class_dir, f"{class_name}_{i}.png"))
+
+    return len(class_names) * images_per_class
@@ -0,0 +1,366 @@
+"""Inference backends used to run a trained roommate classifier.
+
+Every backend takes a batch of RGB frames shaped (batch, height, width, 3) with
+pixel values in [0, 255] and returns an array of class probabilities shaped
+(batch, classes). This lets detector swap a full Keras model for its lean
+SavedModel export (see cnn.export_inference_model), a TensorFlow Lite model,
+an embedding index (see embeddings.py), a model served by server.py or a
+cascade of a small gatekeeper model in front of the full model without
+changing anything else. Backends that know their own class names expose
+them as class_names.
+
+    Typical usage example:
+
+    backend = load_backend("model/cat_dog_model_int8.tflite", num_threads=4)
+    probabilities = backend.predict(frames)
+"""
+import io
+import json
+import numpy as np
+import os
+
+from cv2 import cvtColor, resize, COLOR_RGB2GRAY, INTER_AREA
+
+# Default thread count, the Raspberry Pi 4 Model B has four cores
+DEFAULT_NUM_THREADS = 4
+
+TFLITE_EXTENSION = ".tflite"
+EMBEDDING_INDEX_EXTENSION = ".npz"
+SERVICE_URL_PREFIX = "http://"
+CASCADE_SUFFIX = ".cascade.json"
+# cnn.export_inference_model saves <model>_inference next to <model>.h5
+SAVED_MODEL_SUFFIX = "_inference"
+SAVED_MODEL_FILE_NAME = "saved_model.pb"
+
+# Default timeout of requests to the inference server, in seconds
+DEFAULT_SERVICE_TIMEOUT = 10.0
+
+# Default error message for ServiceBackend
+SERVICE_ERR_MSG = "Inference server at {url} answered {status}: {body}"
+
+# Default error message for CascadeBackend
+CASCADE_CLASSES_ERR_MSG = "The gatekeeper predicts {gatekeeper} classes, the model {model}"
+
+
+def softmax(logits: np.ndarray):
+    """Turns a batch of logits into a batch of probabilities."""
+    exp = np.exp(logits - np.max(logits, axis=-1, keepdims=True))
+    return exp / np.sum(exp, axis=-1, keepdims=True)
+
+
+def _import_tensorflow(num_threads: int):
+    """Imports TensorFlow and limits the threads a single op may use.
+
+    Returns: The tensorflow module
+    """
+    import tensorflow as tf
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+    except RuntimeError:
+        # TensorFlow was already initialized by an earlier backend, keep its setting
+        pass
+
+    return tf
+
+
+def is_saved_model(model_path: str):
+    """Returns: A boolean representing if model_path is a SavedModel folder"""
+    return os.path.isfile(os.path.join(model_path, SAVED_MODEL_FILE_NAME))
+
+
+class KerasBackend:
+    """Runs a tf.keras model saved with model.save.
+
+    Attributes:
+        model: The loaded tf.keras model
+        input_shape: A tuple of the (height, width, channels) the model expects
+    """
+
+    def __init__(self, model_path: str, num_threads: int = DEFAULT_NUM_THREADS):
+        """Loads the model at model_path.
+
+        Args:
+            model_path: The path of the saved tf.keras model
+            num_threads: The number of threads TensorFlow may use for a single op
+        """
+        tf = _import_tensorflow(num_threads)
+
+        self.model = tf.keras.models.load_model(model_path)
+        self.input_shape = tuple(self.model.input_shape[1:])
+        # Trace the forward pass once instead of paying model.predict's per call setup
+        self._forward = tf.function(lambda batch: self.model(batch, training=False))
+
+    def predict(self, batch: np.ndarray):
+        """Returns the class probabilities for a batch of frames."""
+        return softmax(self._forward(batch.astype(np.float32)).numpy())
+
+
+class SavedModelBackend:
+    """Runs a model exported by cnn.export_inference_model.
+
+    The export holds a single function, traced once for uint8 frames of the model's
+    input size, that returns probabilities. Loading restores that graph instead of
+    rebuilding and retracing the Keras layers, and frames go in without any
+    conversion on the host.
+
+    Attributes:
+        input_shape: A tuple of the (height, width, channels) the model expects
+    """
+
+    def __init__(self, model_path: str, num_threads: int = DEFAULT_NUM_THREADS):
+        """Loads the export at model_path.
+
+        Args:
+            model_path: The path of the SavedModel folder
+            num_threads: The number of threads TensorFlow may use for a single op
+        """
+        tf = _import_tensorflow(num_threads)
+
+        self._model = tf.saved_model.load(model_path)
+        # Calling the serving signature skips the argument matching of the restored tf.function
+        self._serve = self._model.signatures["serving_default"]
+        (self._input_name, input_spec), = self._serve.structured_input_signature[1].items()
+        self._output_name, = self._serve.structured_outputs
+        self.input_shape = tuple(input_spec.shape[1:])
+        self._constant = tf.constant
+
+    def predict(self, batch: np.ndarray):
+        """Returns the class probabilities for a batch of frames."""
+        frames = self._constant(batch.astype(np.uint8, copy=False))
+        return self._serve(**{self._input_name: frames})[self._output_name].numpy()
+
+
+class TFLiteBackend:
+    """Runs a TensorFlow Lite model, float or int8 quantized.
+
+    The lightweight tflite_runtime package is used when it is installed, so
+    TensorFlow itself does not have to be on the device.
+
+    Attributes:
+        input_shape: A tuple of the (height, width, channels) the model expects
+    """
+
+    def __init__(self, model_path: str, num_threads: int = DEFAULT_NUM_THREADS):
+        """Loads the model at model_path.
+
+        Args:
+            model_path: The path of the .tflite model
+            num_threads: The number of threads the interpreter may use
+        """
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self._interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        self.input_shape = tuple(int(dim) for dim in self._input["shape"][1:])
+
+    def _resize_batch(self, batch_size: int):
+        if batch_size == self._batch_size:
+            return
+
+        self._interpreter.resize_tensor_input(self._input["index"], [batch_size, *self.input_shape])
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = batch_size
+
+    def predict(self, batch: np.ndarray):
+        """Returns the class probabilities for a batch of frames."""
+        self._resize_batch(len(batch))
+
+        # Quantized models take integer input, map pixels with the input quantization
+        dtype = self._input["dtype"]
+        scale, zero_point = self._input["quantization"]
+        if dtype != np.float32:
+            if scale:
+                batch = batch.astype(np.float32) / scale + zero_point
+            batch = np.clip(np.round(batch), np.iinfo(dtype).min, np.iinfo(dtype).max)
+
+        self._interpreter.set_tensor(self._input["index"], batch.astype(dtype))
+        self._interpreter.invoke()
+        logits = self._interpreter.get_tensor(self._output["index"])
+
+        scale, zero_point = self._output["quantization"]
+        if self._output["dtype"] != np.float32 and scale:
+            logits = (logits.astype(np.float32) - zero_point) * scale
+
+        return softmax(logits.astype(np.float32))
+
+
+class ServiceBackend:
+    """Runs predictions on a model served by server.py instead of loading it.
+
+    Every thread gets its own keep-alive connection to the server.
+
+    Attributes:
+        url: The base URL of the server, e.g. http://127.0.0.1:8765
+        input_shape: A tuple of the (height, width, channels) the served model expects
+        class_names: A list of the class names the served model predicts, or None
+    """
+
+    def __init__(self, url: str, timeout: float = DEFAULT_SERVICE_TIMEOUT):
+        """Connects to the server at url and asks it for the model's input shape.
+
+        Args:
+            url: The base URL of the server
+            timeout: The seconds to wait for an answer
+        """
+        import threading
+        from urllib.parse import urlsplit
+
+        self.url = url.rstrip("/")
+        self._address = urlsplit(self.url).netloc
+        self._timeout = timeout
+        self._local = threading.local()
+
+        info = json.loads(self._request("GET", "/info"))
+        self.input_shape = tuple(info["input_shape"])
+        self.class_names = info["class_names"]
+
+    def _request(self, method: str, path: str, body: bytes = None):
+        """Returns: The body of the server's answer, raises IOError unless it succeeded"""
+        import http.client
+
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self._address, timeout=self._timeout)
+
+        try:
+            connection.request(method, path, body, {"Content-Type": "application/octet-stream"})
+            response = connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            # The server closed the kept-alive connection, reconnect once
+            connection.close()
+            connection.request(method, path, body, {"Content-Type": "application/octet-stream"})
+            response = connection.getresponse()
+            data = response.read()
+
+        if response.status != 200:
+            raise IOError(SERVICE_ERR_MSG.format(url=self.url, status=response.status,
+                                                 body=data.decode(errors="replace")))
+        return data
+
+    def predict(self, batch: np.ndarray):
+        """Returns the class probabilities for a batch of frames."""
+        buffer = io.BytesIO()
+        np.save(buffer, batch, allow_pickle=False)
+        return np.load(io.BytesIO(self._request("POST", "/predict", buffer.getvalue())), allow_pickle=False)
+
+
+class CascadeBackend:
+    """Runs a small gatekeeper model on every frame and the full model only on the frames it is unsure about.
+
+    The gatekeeper (see cnn.make_and_train_gatekeeper_model) is trained on the same
+    dataset folders at a lower resolution, grayscale, so it costs a fraction of the
+    full model. Frames the gatekeeper classifies with at least threshold confidence
+    keep its prediction, the others go through the full model in one batch.
+
+    Attributes:
+        model: The backend of the full model
+        gatekeeper: The backend of the gatekeeper model
+        threshold: The gatekeeper confidence from which the full model is skipped
+        input_shape: A tuple of the (height, width, channels) the full model expects
+        class_names: The class names of the full model, if it knows them
+        frames: An integer count of frames predicted
+        escalated: An integer count of frames that went through the full model
+    """
+
+    def __init__(self, model, gatekeeper, threshold: float):
+        """Initializes CascadeBackend with two loaded backends.
+
+        Args:
+            model: The backend of the full model
+            gatekeeper: The backend of the gatekeeper model, predicting the same classes
+            threshold: The gatekeeper confidence from which the full model is skipped
+        """
+        self.model = model
+        self.gatekeeper = gatekeeper
+        self.threshold = threshold
+        self.input_shape = model.input_shape
+        self.class_names = getattr(model, "class_names", None)
+        self.frames = 0
+        self.escalated = 0
+
+    @classmethod
+    def from_file(cls, cascade_path: str, num_threads: int = DEFAULT_NUM_THREADS):
+        """Loads the cascade described by a file written by save_cascade."""
+        with open(cascade_path, "r") as cascade_file:
+            cascade = json.load(cascade_file)
+
+        # Model paths are stored relative to the cascade file
+        folder = os.path.dirname(os.path.abspath(cascade_path))
+        return cls(load_backend(os.path.join(folder, cascade["model"]), num_threads),
+                   load_backend(os.path.join(folder, cascade["gatekeeper"]), num_threads),
+                   cascade["threshold"])
+
+    def screen(self, batch: np.ndarray):
+        """Returns the gatekeeper's class probabilities for a batch of full model sized frames."""
+        height, width, channels = self.gatekeeper.input_shape
+        small = np.stack([resize(frame, (width, height), interpolation=INTER_AREA) for frame in batch])
+        if channels == 1:
+            small = np.stack([cvtColor(frame, COLOR_RGB2GRAY) for frame in small])[..., np.newaxis]
+        return self.gatekeeper.predict(small)
+
+    def predict(self, batch: np.ndarray):
+        """Returns the class probabilities for a batch of frames."""
+        probabilities = self.screen(batch)
+        unsure = probabilities.max(axis=-1) < self.threshold
+        self.frames += len(batch)
+
+        if unsure.any():
+            model_probabilities = self.model.predict(batch[unsure])
+            if model_probabilities.shape[-1] != probabilities.shape[-1]:
+                raise ValueError(CASCADE_CLASSES_ERR_MSG.format(gatekeeper=probabilities.shape[-1],
+                                                                model=model_probabilities.shape[-1]))
+            probabilities[unsure] = model_probabilities
+            self.escalated += int(unsure.sum())
+
+        return probabilities
+
+
+def save_cascade(cascade_path: str, model_path: str, gatekeeper_path: str, threshold: float):
+    """Writes the file load_backend opens as a CascadeBackend.
+
+    Args:
+        cascade_path: The path of the file, ending in CASCADE_SUFFIX
+        model_path: The path of the full model
+        gatekeeper_path: The path of the gatekeeper model
+        threshold: The gatekeeper confidence from which the full model is skipped
+    """
+    folder = os.path.dirname(os.path.abspath(cascade_path))
+    with open(cascade_path, "w") as cascade_file:
+        json.dump({"model": os.path.relpath(os.path.abspath(model_path), folder),
+                   "gatekeeper": os.path.relpath(os.path.abspath(gatekeeper_path), folder),
+                   "threshold": threshold}, cascade_file, indent=2)
+
+
+def load_backend(model_path: str, num_threads: int = DEFAULT_NUM_THREADS):
+    """Picks the backend for model_path by its file extension.
+
+    Returns: A backend that can run the model at model_path, http:// URLs
+             connect to a model served by server.py
+    """
+    if model_path.startswith(SERVICE_URL_PREFIX):
+        return ServiceBackend(model_path)
+    if model_path.endswith(CASCADE_SUFFIX):
+        return CascadeBackend.from_file(model_path, num_threads)
+    if is_saved_model(model_path):
+        return SavedModelBackend(model_path, num_threads)
+
+    extension = os.path.splitext(model_path)[1]
+    if extension == TFLITE_EXTENSION:
+        return TFLiteBackend(model_path, num_threads)
+    if extension == EMBEDDING_INDEX_EXTENSION:
+        # Imported here since embeddings imports this module
+        from embeddings import EmbeddingBackend
+        return EmbeddingBackend.from_index_file(model_path, num_threads)
+
+    return KerasBackend(model_path, num_threads)
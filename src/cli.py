@@ -1,16 +1,202 @@
-import cnn
-import data_collect
-import detector
+import argparse
 import os
 
+# The subsystems pull in TensorFlow, OpenCV, tkinter and friends, which takes
+# seconds on a Raspberry Pi. They are imported only once their option is picked
+# so the menu itself comes up with nothing but the standard library loaded.
+
 DEFAULT_WELCOME_MESSAGE = ">>> Roomate Detector <<<\n" +\
                           "-------------------------------------------------------------------"
 DEFAULT_OPTIONS_MESSAGE = "Type the number of what option you would like to run:\n\n" +\
                           "\t1. Add / Edit a Dataset\n" +\
                           "\t2. Train the Rommate Detecting Model\n" +\
-                          "\t3. Run Roomate Detector\n\n" +\
+                          "\t3. Run Roomate Detector\n" +\
+                          "\t4. Run Roomate Detector Headless (no window)\n" +\
+                          "\t5. Export the Model for Inference (SavedModel and TensorFlow Lite)\n" +\
+                          "\t6. Remove Near-Duplicate Images from the Datasets\n" +\
+                          "\t7. Enroll Roomates Without Retraining (embedding index)\n" +\
+                          "\t8. Run Roomate Detector on Several Cameras Headless\n" +\
+                          "\t9. Record a Camera Session (replay it as a video source)\n" +\
+                          "\t10. Add a Dataset from a Recorded Session\n" +\
+                          "\t11. Train a Gatekeeper Model for a Faster Model Cascade\n\n" +\
                           "\tOr type \"exit\" to exit the application\n\n"
 DEFAULT_INPUT_NOT_RECOGNIZED = "Input not recognized, please try again\n\n"
+MODEL_PATH_PROMPT = "Path of the model to use (leave empty for the default model): "
+H5_MODEL_PATH_PROMPT = "Path of the trained .h5 model (leave empty for the default model): "
+ENROLL_NAME_PROMPT = "Name of the roomate to enroll (leave empty to update everyone): "
+VIDEO_SOURCES_PROMPT = "Comma separated camera indexes, video file paths and/or recording folders to detect on: "
+VIDEO_SOURCE_PROMPT = ("Camera index, video file path or recording folder to detect on "
+                       "(leave empty for the default camera): ")
+RECORD_SOURCE_PROMPT = "Camera index or video file path to record (leave empty for the default camera): "
+RECORDING_PATH_PROMPT = "Path of the recording folder: "
+EXTRACT_EVERY_PROMPT = "Save every how many frames? (leave empty for every frame): "
+FACE_CROP_PROMPT = "Crop frames to the faces in them? (y/n): "
+TRANSFER_PROMPT = "Train on top of the pretrained backbone (faster, needs its weights file)? (y/n): "
+UNKNOWN_RESPONSE_PROMPT = '\nPlease respond with "y" or "n"'
+
+# Full frame resolution used when frames are not cropped to faces
+DEFAULT_IMG_WIDTH = 320
+DEFAULT_IMG_HEIGHT = 240
+DEFAULT_MODEL_NAME = "cat_dog"
+DEFAULT_H5_MODEL_PATH = os.path.join(os.getcwd(), "model", f"{DEFAULT_MODEL_NAME}_model.h5")
+
+# Same as server.DEFAULT_HOST and server.DEFAULT_PORT
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 8765
+
+# Same as cnn.SAVE_POLICY_*, repeated so parsing the command line imports nothing heavy
+SAVE_POLICIES = ("prompt", "overwrite", "timestamp")
+
+
+def _ask_video_source(prompt: str = VIDEO_SOURCE_PROMPT):
+    """Prompts the user for a video source.
+
+    Returns: An integer camera index or a video file (or recording folder) path string
+    """
+    source = input(prompt).strip()
+    if not source:
+        return 0
+    return int(source) if source.isdigit() else source
+
+
+def _ask_video_sources():
+    """Prompts the user for several video sources until at least one is given.
+
+    Returns: A list of integer camera indexes and/or video file path strings
+    """
+    while True:
+        sources = [source.strip() for source in input(VIDEO_SOURCES_PROMPT).split(",") if source.strip()]
+        if sources:
+            return [int(source) if source.isdigit() else source for source in sources]
+
+
+def _ask_face_cropping():
+    """Prompts the user if frames should be cropped to faces.
+
+    Datasets collected with face cropping must also be trained and detected on
+    with face cropping, so every option that touches frames asks this.
+
+    Returns: A boolean representing if the user wants face cropping
+    """
+    return _ask_yes_no(FACE_CROP_PROMPT)
+
+
+def _load_player():
+    """Decodes the theme songs in the default songs folder.
+
+    Returns: A playback.ThemeSongPlayer, or None if there are no songs
+    """
+    import playback
+    return playback.ThemeSongPlayer.from_songs_dir()
+
+
+def _close_player(player):
+    """Stops the theme song playback of a player from _load_player, if any."""
+    if player is not None:
+        player.close()
+
+
+def _ask_yes_no(prompt: str):
+    """Prompts the user with a yes or no question until they answer it.
+
+    Returns: A boolean representing if the user answered yes
+    """
+    while True:
+        ans = input(prompt).strip().lower()
+        if ans in ('y', 'n'):
+            return ans == 'y'
+        print(UNKNOWN_RESPONSE_PROMPT)
+
+
+def build_parser():
+    """Creates the parser of the non-interactive command line.
+
+    Returns: The argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(description="Roomate Detector")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train = commands.add_parser("train", help="Train the roomate detecting model without any prompts")
+    _add_training_arguments(train)
+    train.add_argument("--batch-size", type=int)
+    train.add_argument("--resume", action="store_true", help="Continue an interrupted run")
+    train.add_argument("--no-cache", action="store_true", help="Decode the dataset instead of using its cache")
+
+    sweep = commands.add_parser("sweep", help="Train a model per hyperparameter combination and keep the best")
+    _add_training_arguments(sweep)
+    sweep.add_argument("--space", help="JSON file mapping hyperparameter names to lists of values "
+                                       "(defaults to sweep.DEFAULT_SEARCH_SPACE)")
+    sweep.add_argument("--trials", type=int, help="Largest number of trials, sampled from the grid")
+    sweep.add_argument("--workers", type=int, help="Number of trials trained at once")
+    sweep.add_argument("--threads-per-trial", type=int)
+
+    serve = commands.add_parser("serve", help="Keep a model loaded and answer predictions over localhost HTTP")
+    serve.add_argument("--model", help="Defaults to the default model of the detector")
+    serve.add_argument("--host", default=DEFAULT_SERVER_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_SERVER_PORT)
+    # Left out options fall back to the defaults of server.serve
+    serve.add_argument("--num-threads", type=int)
+    serve.add_argument("--max-batch-size", type=int, help="Largest number of frames in one model call")
+    serve.add_argument("--max-wait", type=float, help="Seconds a request waits for others to join its batch")
+
+    return parser
+
+
+def _add_training_arguments(parser):
+    """Adds the arguments every training command takes to parser."""
+    parser.add_argument("--dataset-dir", default=os.path.join(os.getcwd(), "datasets"))
+    parser.add_argument("--output-dir", default=os.path.join(os.getcwd(), "model"))
+    parser.add_argument("--name", default=DEFAULT_MODEL_NAME, help="Name the model is saved under")
+    parser.add_argument("--img-width", type=int, default=DEFAULT_IMG_WIDTH)
+    parser.add_argument("--img-height", type=int, default=DEFAULT_IMG_HEIGHT)
+    # Left out options fall back to the defaults of the cnn and sweep functions
+    parser.add_argument("--epochs", type=int)
+    parser.add_argument("--patience", type=int,
+                        help="Epochs without a lower validation loss before stopping, 0 to never stop early")
+    parser.add_argument("--save-policy", choices=SAVE_POLICIES, default="timestamp",
+                        help="What to do when a model with the same name already exists")
+
+
+def _given_options(args, names):
+    """Picks the optional arguments that were given on the command line.
+
+    Returns: A dictionary of keyword arguments, a patience of 0 becomes None (never stop early)
+    """
+    options = {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+    if options.get("patience") == 0:
+        options["patience"] = None
+    return options
+
+
+def run_command(argv):
+    """Runs a command of the non-interactive command line.
+
+    Args:
+        argv: A list of the command line arguments, without the program name
+    """
+    args = build_parser().parse_args(argv)
+
+    if args.command == "train":
+        import cnn
+        cnn.make_and_train_model(args.dataset_dir, args.output_dir, args.name, args.img_width, args.img_height,
+                                 use_cache=not args.no_cache, resume=args.resume, save_policy=args.save_policy,
+                                 **_given_options(args, ("epochs", "batch_size", "patience")))
+    elif args.command == "sweep":
+        import json
+        import sweep
+        search_space = None
+        if args.space:
+            with open(args.space, "r") as space_file:
+                search_space = json.load(space_file)
+        sweep.run_sweep(args.dataset_dir, args.output_dir, args.name, args.img_width, args.img_height,
+                        search_space, args.trials, args.workers, save_policy=args.save_policy,
+                        **_given_options(args, ("threads_per_trial", "epochs", "patience")))
+    elif args.command == "serve":
+        import detector
+        import server
+        server.serve(args.model or detector.default_model_path(), args.host, args.port,
+                     **_given_options(args, ("num_threads", "max_batch_size", "max_wait")))
+
 
 # TODO Turn this into a class that can potentially have custom paths for data set
 def run_cli():
@@ -24,14 +210,94 @@ def run_cli():
         option = option.lower()
 
         if option == "1":
+            import data_collect
+            import metrics
+            import roi
             # What if I dont want to input defaults??? Need to handle that (json?)
-            data_collect.create_dataset()
+            cropper = roi.FaceCropper() if _ask_face_cropping() else None
+            data_collect.create_dataset(cropper=cropper, metrics=metrics.from_env())
         elif option == "2":
+            import cnn
+            import data_collect
+            import roi
             # TODO how do I get img_width and img_height?
             # Maybe just ask the user (so many vairables in dataset creation (different devices, sources, cameras, etc...))
-            cnn.make_and_train_model(data_collect.DEFAULT_DATASET_PATH, os.path.join(os.getcwd(), "model"), "cat_dog", 320, 240)
+            if _ask_face_cropping():
+                img_width, img_height = roi.DEFAULT_ROI_SIZE, roi.DEFAULT_ROI_SIZE
+            else:
+                img_width, img_height = DEFAULT_IMG_WIDTH, DEFAULT_IMG_HEIGHT
+            if _ask_yes_no(TRANSFER_PROMPT):
+                cnn.make_and_train_transfer_model(data_collect.DEFAULT_DATASET_PATH, os.path.join(os.getcwd(), "model"), DEFAULT_MODEL_NAME, img_width, img_height)
+            else:
+                cnn.make_and_train_model(data_collect.DEFAULT_DATASET_PATH, os.path.join(os.getcwd(), "model"), DEFAULT_MODEL_NAME, img_width, img_height)
         elif option == "3":
-            detector.detect()
+            import detector
+            import metrics
+            import motion
+            import roi
+            model_path = input(MODEL_PATH_PROMPT).strip() or detector.default_model_path()
+            cropper = roi.FaceCropper() if _ask_face_cropping() else None
+            player = _load_player()
+            detector.detect(model_path, motion_gate=motion.MotionGate(), cropper=cropper, player=player,
+                            metrics=metrics.from_env())
+            _close_player(player)
+        elif option == "4":
+            import detector
+            import metrics
+            import motion
+            import roi
+            model_path = input(MODEL_PATH_PROMPT).strip() or detector.default_model_path()
+            source = _ask_video_source()
+            cropper = roi.FaceCropper() if _ask_face_cropping() else None
+            player = _load_player()
+            detector.detect_headless(model_path, source, motion_gate=motion.MotionGate(), cropper=cropper,
+                                     player=player, metrics=metrics.from_env())
+            _close_player(player)
+        elif option == "5":
+            import cnn
+            import data_collect
+            model_path = input(H5_MODEL_PATH_PROMPT).strip() or DEFAULT_H5_MODEL_PATH
+            cnn.export_inference_model(model_path)
+            cnn.export_tflite_models(model_path, data_collect.DEFAULT_DATASET_PATH)
+        elif option == "6":
+            import data_collect
+            import dedupe
+            dedupe.dedupe_datasets(data_collect.DEFAULT_DATASET_PATH)
+        elif option == "7":
+            import data_collect
+            import embeddings
+            # Folder names were normalized when the images were collected
+            name = data_collect.normalize(input(ENROLL_NAME_PROMPT)) or None
+            embeddings.enroll(data_collect.DEFAULT_DATASET_PATH, name=name)
+        elif option == "8":
+            import detector
+            import multicam
+            import roi
+            model_path = input(MODEL_PATH_PROMPT).strip() or detector.default_model_path()
+            sources = _ask_video_sources()
+            cropper = roi.FaceCropper() if _ask_face_cropping() else None
+            player = _load_player()
+            multicam.detect_multi(model_path, sources, gate_motion=True, cropper=cropper, player=player)
+            _close_player(player)
+        elif option == "9":
+            import recording
+            recording.record_session(source=_ask_video_source(RECORD_SOURCE_PROMPT))
+        elif option == "10":
+            import data_collect
+            import recording
+            import roi
+            recording_path = input(RECORDING_PATH_PROMPT).strip()
+            name = data_collect.normalize(input(data_collect.DATASET_PROMPT))
+            every = input(EXTRACT_EVERY_PROMPT).strip()
+            cropper = roi.FaceCropper() if _ask_face_cropping() else None
+            recording.extract_dataset(recording_path, name, every=int(every) if every.isdigit() else 1,
+                                      cropper=cropper)
+        elif option == "11":
+            import cnn
+            import data_collect
+            import detector
+            model_path = input(MODEL_PATH_PROMPT).strip() or detector.default_model_path()
+            cnn.make_cascade(model_path, data_collect.DEFAULT_DATASET_PATH)
         elif option == "exit":
             running = False
         else:
@@ -5,10 +5,17 @@ This module contains all logic for dataset preprocessing (image preprocessing,
 creating training csv), CNN training, and CNN classification.
 """
 from statistics import mode
+import backends
 import data_collect
-import matplotlib.pyplot as plt
+import dataset_cache
+import embeddings
+import numpy as np
 import os
+import shutil
+import subprocess
+import sys
 import tensorflow as tf
+import time
 
 from tensorflow import keras
 from tensorflow.keras import layers
@@ -17,6 +24,81 @@ from tensorflow.keras.models import Sequential
 # Default tensorflow params
 DEFAULT_BATCH_SIZE = 32
 DEFAULT_EPOCH_AMOUNT = 15
+DEFAULT_VALIDATION_SPLIT = 0.2
+DEFAULT_SPLIT_SEED = 123
+DEFAULT_PATIENCE = 3
+
+# Default model hyperparameters (the search space of sweep.py)
+DEFAULT_ROTATION = 0.1
+DEFAULT_ZOOM = 0.1
+DEFAULT_DROPOUT = 0.2
+DEFAULT_FILTERS = (16, 32, 64)
+DEFAULT_DENSE_UNITS = 128
+
+# Checkpoints of a training run are kept in model_output_dir/<model_name>_checkpoints
+CHECKPOINT_DIR_SUFFIX = "_checkpoints"
+BEST_CHECKPOINT_NAME = "best_model.h5"
+BACKUP_DIR_NAME = "backup"
+TRAINING_INTERRUPTED_MSG = "Training interrupted, rerun with resume=True to continue from the last finished epoch."
+
+# What _handle_save_data does when the model or graph file already exists
+SAVE_POLICY_PROMPT = "prompt"
+SAVE_POLICY_OVERWRITE = "overwrite"
+SAVE_POLICY_TIMESTAMP = "timestamp"
+# The _handle_model_graph_path_exists option each non-interactive policy picks
+SAVE_POLICY_OPTIONS = {SAVE_POLICY_OVERWRITE: "1", SAVE_POLICY_TIMESTAMP: "2"}
+SAVE_POLICY_ERR_MSG = f'save_policy must be "{SAVE_POLICY_PROMPT}", "{SAVE_POLICY_OVERWRITE}" or "{SAVE_POLICY_TIMESTAMP}"'
+
+# Default transfer learning params
+DEFAULT_HEAD_EPOCHS = 100
+DEFAULT_HEAD_UNITS = 128
+DEFAULT_FINE_TUNE_LAYERS = 20
+DEFAULT_FINE_TUNE_LEARNING_RATE = 1e-5
+TRAINING_REPORT_HEADER = f"{'model':<10}{'seconds':>10}{'accuracy':>10}"
+TRAINING_REPORT_ROW = "{name:<10}{seconds:>10.1f}{accuracy:>10.4f}"
+
+# Default TensorFlow Lite export params
+DEFAULT_CALIBRATION_SAMPLES = 100
+EXPORT_REPORT_HEADER = f"{'model':<10}{'accuracy':>10}{'delta':>10}{'ms/frame':>10}{'delta':>10}"
+EXPORT_REPORT_ROW = "{name:<10}{accuracy:>10.4f}{accuracy_delta:>+10.4f}{latency_ms:>10.2f}{latency_delta_ms:>+10.2f}"
+EMPTY_SPLIT_ERR_MSG = "The {subset} split of {dataset_dir} has no images, add more images to every class"
+
+# Default inference export params
+DEFAULT_LATENCY_FRAMES = 100
+INFERENCE_REPORT_HEADER = f"{'model':<12}{'cold start s':>14}{'ms/frame':>10}{'delta':>10}"
+INFERENCE_REPORT_ROW = "{name:<12}{cold_start_seconds:>14.2f}{latency_ms:>10.2f}{latency_delta_ms:>+10.2f}"
+INFERENCE_EXPORT_MSG = "Inference model exported to {path} (largest probability difference {difference:.2e})"
+INFERENCE_EXPORT_ERR_MSG = ("The export of {model_path} differs from it by up to {difference:.2e} in probability, "
+                            "more than the tolerance of {tolerance:.0e}")
+INFERENCE_EXPORT_FAILED_MSG = ("Warning: {model_path} was saved but could not be exported for inference, "
+                               "detection falls back to it: {error}")
+# Largest probability difference the export may have from the model it came from
+DEFAULT_EXPORT_TOLERANCE = 1e-4
+# The layers _build_model's data augmentation block is made of, they all pass inputs through at inference
+AUGMENTATION_LAYERS = (layers.RandomFlip, layers.RandomRotation, layers.RandomZoom, layers.RandomTranslation,
+                       layers.RandomContrast, layers.RandomBrightness)
+
+# Loads a model in a fresh interpreter and prints the seconds until its first prediction is done
+COLD_START_SCRIPT = """
+import sys, time
+sys.path.insert(0, {src_dir!r})
+import numpy as np
+import backends
+start = time.perf_counter()
+backend = backends.load_backend({model_path!r}, {num_threads})
+backend.predict(np.zeros((1, *backend.input_shape), dtype=np.uint8))
+print(time.perf_counter() - start)
+"""
+
+# Default gatekeeper and cascade params, the gatekeeper sees the frame at 1/scale of the full resolution
+DEFAULT_GATEKEEPER_SCALE = 4
+GATEKEEPER_HYPERPARAMETERS = {"filters": (8, 16), "dense_units": 32}
+GATEKEEPER_NAME_SUFFIX = "_gatekeeper"
+MODEL_FILE_SUFFIX = "_model"
+DEFAULT_CASCADE_ACCURACY_DROP = 0.01
+CASCADE_REPORT_HEADER = f"{EXPORT_REPORT_HEADER}{'full runs':>10}"
+CASCADE_REPORT_ROW = f"{EXPORT_REPORT_ROW}{{escalated:>10.1%}}"
+CASCADE_SAVED_MSG = "Gatekeeper threshold {threshold:.4f}, cascade saved to {path}"
 
 # CLI save handling strings
 DEFAULT_MODEL_EXITS_MESSAGE_ARR = ["A trained model with the name ",
@@ -26,78 +108,387 @@ DEFAULT_MODEL_EXITS_MESSAGE_ARR = ["A trained model with the name ",
                                    "\t2. Save the new file with a temporary generated name.\n"]
 
 
-def make_and_train_model(dataset_dir, model_output_dir, model_name, img_width, img_height):
+def make_and_train_model(dataset_dir, model_output_dir, model_name, img_width, img_height, use_cache=True,
+                         epochs=DEFAULT_EPOCH_AMOUNT, batch_size=DEFAULT_BATCH_SIZE, patience=DEFAULT_PATIENCE,
+                         resume=False, save_policy=SAVE_POLICY_PROMPT, hyperparameters=None, grayscale=False):
     """ Creates and traines a tf.keras.Sequential model and saves it 
     so it can be loaded and reused (in HD5F format).
 
+    Training stops early once the validation loss has not improved for patience
+    epochs, and the weights of the best epoch are kept. The best model so far is
+    checkpointed to model_output_dir/<model_name>_checkpoints after every epoch,
+    together with a backup of the last finished epoch that resume picks up after
+    a crash or Ctrl-C.
+
     Args:
         dataset_dir: The path of the dataset
                      directory (containing all subfolders with training examples)
         model_output_dir: The path to save the model and model analytics.
         model_name: The name of the model when saved into model_output_dir
+        img_width: The width images are resized to
+        img_height: The height images are resized to
+        use_cache: Whether to stream the images from a dataset_cache.DatasetCache
+                   (only new images are decoded) instead of decoding every image
+        epochs: The largest number of epochs to train for
+        batch_size: The number of images per batch
+        patience: The number of epochs without a lower val_loss before stopping,
+                  None to always train for epochs
+        resume: Whether to continue an interrupted run from its last finished epoch
+                (otherwise a leftover backup is discarded and training starts over)
+        save_policy: What to do when the model or graph file already exists,
+                     "prompt" to ask, "overwrite" or "timestamp" to run unattended
+        hyperparameters: A dictionary of keyword arguments for _build_model,
+                         the defaults are used for the ones left out
+        grayscale: Whether the model takes single channel grayscale images
+
+    The model is also exported for inference next to it, see export_inference_model.
+
+    Returns:
+        The path the model was saved to, or None if nothing was trained.
+    """
+    if save_policy != SAVE_POLICY_PROMPT and save_policy not in SAVE_POLICY_OPTIONS:
+        raise ValueError(SAVE_POLICY_ERR_MSG)
+
+    if not _paths_exist(dataset_dir, model_output_dir):
+        return
+
+    checkpoint_dir = os.path.join(model_output_dir, f"{data_collect.normalize(model_name)}{CHECKPOINT_DIR_SUFFIX}")
+    backup_dir = os.path.join(checkpoint_dir, BACKUP_DIR_NAME)
+    if not resume and os.path.exists(backup_dir):
+        shutil.rmtree(backup_dir)
+
+    callbacks = [
+        # Saves the last finished epoch (weights, optimizer and epoch number) and
+        # restores it when fit is called again, it is deleted once training completes
+        keras.callbacks.BackupAndRestore(backup_dir),
+        keras.callbacks.ModelCheckpoint(os.path.join(checkpoint_dir, BEST_CHECKPOINT_NAME),
+                                        monitor='val_loss', save_best_only=True)
+    ]
+    if patience is not None:
+        callbacks.append(keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience,
+                                                       restore_best_weights=True))
+
+    try:
+        model, history = _train_cnn(dataset_dir, img_width, img_height, use_cache, epochs, batch_size, callbacks,
+                                    hyperparameters, grayscale)
+    except KeyboardInterrupt:
+        print(TRAINING_INTERRUPTED_MSG)
+        return
+
+    # Creating Training Results Plot
+    result_graph = _plot_history(history)
+
+    model_path = _handle_save_data(model, result_graph, model_output_dir, model_name, save_policy)
+    _export_trained_model(model_path)
+
+    return model_path
+
+def make_and_train_gatekeeper_model(dataset_dir, model_output_dir, model_name, img_width, img_height,
+                                    scale=DEFAULT_GATEKEEPER_SCALE, **training_options):
+    """ Trains the small gatekeeper model of a cascade (see backends.CascadeBackend)
+    and saves it like make_and_train_model does, as <model_name>_gatekeeper.
+
+    The gatekeeper learns the same dataset folders as the full model, from
+    grayscale images at 1/scale of the full model's resolution, with fewer and
+    narrower layers (GATEKEEPER_HYPERPARAMETERS).
+
+    Args:
+        dataset_dir: The path of the dataset directory
+        model_output_dir: The path to save the model and model analytics.
+        model_name: The name of the full model the gatekeeper goes in front of
+        img_width: The width of the full model's input
+        img_height: The height of the full model's input
+        scale: How many times smaller the gatekeeper's input is in each dimension
+        training_options: Keyword arguments for make_and_train_model (epochs, save_policy...)
+
+    Returns:
+        The path the gatekeeper was saved to, or None if nothing was trained.
+    """
+    return make_and_train_model(dataset_dir, model_output_dir, f"{model_name}{GATEKEEPER_NAME_SUFFIX}",
+                                max(1, img_width // scale), max(1, img_height // scale),
+                                hyperparameters=GATEKEEPER_HYPERPARAMETERS, grayscale=True, **training_options)
+
+def make_cascade(model_path, dataset_dir, scale=DEFAULT_GATEKEEPER_SCALE,
+                 max_accuracy_drop=DEFAULT_CASCADE_ACCURACY_DROP, num_threads=backends.DEFAULT_NUM_THREADS,
+                 **training_options):
+    """ Trains a gatekeeper for the saved model at model_path and tunes the cascade of both.
+
+    Args:
+        model_path: The path of the saved full model
+        dataset_dir: The path of the dataset directory the model was trained on
+        scale: How many times smaller the gatekeeper's input is in each dimension
+        max_accuracy_drop: The validation accuracy the cascade may lose against the full model
+        num_threads: The number of threads used when measuring latency
+        training_options: Keyword arguments for make_and_train_model (epochs, save_policy...)
+
+    Returns:
+        The report of tune_cascade, or None if no gatekeeper was trained.
+    """
+    img_height, img_width = backends.load_backend(model_path, num_threads).input_shape[:2]
+    model_name = os.path.splitext(os.path.basename(os.path.normpath(model_path)))[0]
+    if model_name.endswith(backends.SAVED_MODEL_SUFFIX):
+        model_name = model_name[:-len(backends.SAVED_MODEL_SUFFIX)]
+    if model_name.endswith(MODEL_FILE_SUFFIX):
+        model_name = model_name[:-len(MODEL_FILE_SUFFIX)]
+
+    gatekeeper_path = make_and_train_gatekeeper_model(dataset_dir, os.path.dirname(os.path.abspath(model_path)),
+                                                      model_name, img_width, img_height, scale, **training_options)
+    if gatekeeper_path is None:
+        return None
+
+    # The gatekeeper was exported right after training, run the lean graph
+    return tune_cascade(model_path, inference_export_path(gatekeeper_path), dataset_dir, max_accuracy_drop,
+                        num_threads)
+
+def make_and_train_transfer_model(dataset_dir, model_output_dir, model_name, img_width, img_height,
+                                  weights_path=embeddings.DEFAULT_BACKBONE_WEIGHTS,
+                                  head_epochs=DEFAULT_HEAD_EPOCHS, fine_tune_epochs=0, compare=True,
+                                  save_policy=SAVE_POLICY_PROMPT):
+    """ Trains a classifier head on top of a frozen pretrained backbone and saves it
+    like make_and_train_model does.
+
+    The backbone (see embeddings.FeatureExtractor) runs over every image once and
+    its features are cached next to the dataset, so later runs only embed new
+    images. Only the small head is trained, on the cached features, which takes
+    seconds per hundred epochs on a CPU. The saved model still takes frames: it
+    is the backbone and the head put together.
+
+    Args:
+        dataset_dir: The path of the dataset
+                     directory (containing all subfolders with training examples)
+        model_output_dir: The path to save the model and model analytics.
+        model_name: The name of the model when saved into model_output_dir
+        img_width: The width images are resized to for the comparison CNN
+        img_height: The height images are resized to for the comparison CNN
+        weights_path: The path of the local backbone weights file (include_top=False)
+        head_epochs: The number of epochs the head is trained on the cached features
+        fine_tune_epochs: The number of epochs the top of the backbone is fine tuned
+                          afterwards on the images themselves, 0 to skip fine tuning
+        compare: Whether to also train the CNN of make_and_train_model (without saving
+                 it) and report both
+        save_policy: What to do when the model or graph file already exists,
+                     "prompt" to ask, "overwrite" or "timestamp" to run unattended
+
+    Returns:
+        A dictionary mapping "transfer" (and "cnn" when compare is True) to the
+        training seconds and validation accuracy.
+    """
+    if not _paths_exist(dataset_dir, model_output_dir):
+        return
+
+    start = time.perf_counter()
+
+    # Embedding the dataset once is the only time the backbone sees the training images
+    extractor = embeddings.FeatureExtractor(weights_path)
+    index = embeddings.EmbeddingIndex(dataset_dir, extractor)
+    added, removed = index.update()
+    index.save()
+    print(f"Feature cache: {len(index)} images ({added} embedded, {removed} removed)")
+
+    train_features, train_labels = index.split("training")
+    val_features, val_labels = index.split("validation")
+
+    head = Sequential([
+        layers.Dropout(0.2, input_shape=train_features.shape[1:]),
+        layers.Dense(DEFAULT_HEAD_UNITS, activation='relu'),
+        layers.Dense(len(index.class_names))
+    ])
+    head.compile(optimizer='adam',
+                 loss=tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+                 metrics=['accuracy'])
+    history = head.fit(train_features, train_labels,
+                       validation_data=(val_features, val_labels),
+                       batch_size=DEFAULT_BATCH_SIZE,
+                       epochs=head_epochs,
+                       verbose=0)
+
+    # Put the backbone in front of the head so the saved model takes frames like any other
+    size = extractor.input_size
+    inputs = keras.Input(shape=(size, size, 3))
+    features = layers.Rescaling(1./127.5, offset=-1)(inputs) # Same as mobilenet_v2.preprocess_input
+    features = extractor.model(features, training=False)
+    features = layers.UnitNormalization()(features)
+    model = keras.Model(inputs, head(features))
+
+    if fine_tune_epochs:
+        history = _fine_tune(model, extractor.model, dataset_dir, size, fine_tune_epochs)
+
+    report = {"transfer": {"seconds": time.perf_counter() - start,
+                           "accuracy": history.history['val_accuracy'][-1]}}
+
+    if compare:
+        start = time.perf_counter()
+        _, cnn_history = _train_cnn(dataset_dir, img_width, img_height)
+        report["cnn"] = {"seconds": time.perf_counter() - start,
+                         "accuracy": cnn_history.history['val_accuracy'][-1]}
+
+    print(TRAINING_REPORT_HEADER)
+    for name, result in report.items():
+        print(TRAINING_REPORT_ROW.format(name=name, **result))
+
+    model_path = _handle_save_data(model, _plot_history(history), model_output_dir, model_name, save_policy)
+    _export_trained_model(model_path)
+
+    return report
+
+def _fine_tune(model, backbone, dataset_dir, size, epochs):
+    """ Trains the top layers of the backbone together with the head at a low learning rate.
+
+    Args:
+        model: The backbone and head put together
+        backbone: The backbone model inside of model
+        dataset_dir: The path of the dataset directory
+        size: The side length of the square images model takes
+        epochs: The number of epochs to fine tune for
+
+    Returns:
+        The History object returned by model.fit
+    """
+    backbone.trainable = True
+    for layer in backbone.layers[:-DEFAULT_FINE_TUNE_LAYERS]:
+        layer.trainable = False
+
+    cache = dataset_cache.DatasetCache(dataset_dir, size, size)
+    cache.update()
+
+    model.compile(optimizer=keras.optimizers.Adam(DEFAULT_FINE_TUNE_LEARNING_RATE),
+                  loss=tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+                  metrics=['accuracy'])
+
+    return model.fit(
+        cache.dataset("training", DEFAULT_BATCH_SIZE),
+        validation_data=cache.dataset("validation", DEFAULT_BATCH_SIZE),
+        epochs=epochs
+    )
+
+def _paths_exist(dataset_dir, model_output_dir):
+    """ Checks the input paths of a training run and reports the ones that are missing.
+
+    Returns:
+        A boolean representing if both paths exist.
     """
     # Handle if either input path does not exist
     if not os.path.exists(dataset_dir):
         print(f"dataset_dir: \"{dataset_dir}\" either could not be found or does not exist!")
-        return
+        return False
 
     if not os.path.exists(model_output_dir):
         print(f"model_output_dir: \"{model_output_dir}\" either could not be found or does not exist!")
-        return
+        return False
+
+    return True
 
+def _train_cnn(dataset_dir, img_width, img_height, use_cache=True, epochs=DEFAULT_EPOCH_AMOUNT,
+               batch_size=DEFAULT_BATCH_SIZE, callbacks=None, hyperparameters=None, grayscale=False):
+    """ Trains the CNN of make_and_train_model without saving it.
+
+    Args:
+        hyperparameters: A dictionary of keyword arguments for _build_model,
+                         the defaults are used for the ones left out
+        grayscale: Whether the images are converted to grayscale for a single channel model
+
+    Returns:
+        A tuple of the trained model and the History object returned by model.fit
+    """
     # Creating training and validation datasets
-    train_ds = tf.keras.utils.image_dataset_from_directory(
-        dataset_dir,
-        validation_split=0.2,
-        subset="training",
-        seed=123,
-        image_size=(img_height, img_width),
-        batch_size=DEFAULT_BATCH_SIZE)
+    if use_cache:
+        cache = dataset_cache.DatasetCache(dataset_dir, img_width, img_height)
+        added, removed = cache.update()
+        print(f"Dataset cache: {len(cache)} images ({added} decoded, {removed} removed)")
 
-    val_ds = tf.keras.utils.image_dataset_from_directory(
-        dataset_dir,
-        validation_split=0.2,
-        subset="validation",
-        seed=123,
-        image_size=(img_height, img_width),
-        batch_size=DEFAULT_BATCH_SIZE)
-    
-    class_names = train_ds.class_names
-    
-    # Configuring Dataset for performance
-    AUTOTUNE = tf.data.AUTOTUNE
+        train_ds = _to_channels(cache.dataset("training", batch_size), grayscale)
+        val_ds = _to_channels(cache.dataset("validation", batch_size), grayscale)
+        class_names = cache.class_names
+    else:
+        train_ds = _load_split(dataset_dir, "training", img_width, img_height, batch_size)
+        val_ds = _load_split(dataset_dir, "validation", img_width, img_height, batch_size)
 
-    train_ds = train_ds.cache().shuffle(1000).prefetch(buffer_size=AUTOTUNE)
-    val_ds = val_ds.cache().prefetch(buffer_size=AUTOTUNE)
+        class_names = train_ds.class_names
 
-    num_classes = len(class_names)
+        # Configuring Dataset for performance
+        AUTOTUNE = tf.data.AUTOTUNE
 
-    # Use data augmentation to expose model to more samples to reduce overfitting
-    data_augmentation = keras.Sequential(
-        [
-            layers.RandomFlip("horizontal",
-                            input_shape=(img_height,
-                                        img_width,
-                                        3)),
-            layers.RandomRotation(0.1),
-            layers.RandomZoom(0.1),
-        ]
+        train_ds = _to_channels(train_ds, grayscale).cache().shuffle(1000).prefetch(buffer_size=AUTOTUNE)
+        val_ds = _to_channels(val_ds, grayscale).cache().prefetch(buffer_size=AUTOTUNE)
+
+    model = _build_model(len(class_names), img_width, img_height, channels=1 if grayscale else 3,
+                         **(hyperparameters or {}))
+
+    # Training the model
+    history = model.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=epochs,
+        callbacks=callbacks
     )
 
+    return model, history
+
+def _to_channels(dataset, grayscale):
+    """ Converts the images of an (images, labels) dataset to grayscale if asked to.
+
+    Returns:
+        The dataset, unchanged unless grayscale is True.
+    """
+    if not grayscale:
+        return dataset
+    return dataset.map(lambda images, labels: (tf.image.rgb_to_grayscale(images), labels),
+                       num_parallel_calls=tf.data.AUTOTUNE)
+
+def _to_image_channels(images, channels):
+    """ Converts an array of cached RGB images to the number of channels a model takes,
+    the same way _to_channels does for training.
+
+    Returns:
+        The images, unchanged unless channels is 1.
+    """
+    if channels != 1:
+        return images
+    return tf.image.rgb_to_grayscale(images).numpy()
+
+def _build_model(num_classes, img_width, img_height, rotation=DEFAULT_ROTATION, zoom=DEFAULT_ZOOM,
+                 dropout=DEFAULT_DROPOUT, filters=DEFAULT_FILTERS, dense_units=DEFAULT_DENSE_UNITS, channels=3):
+    """ Creates the compiled, untrained CNN of make_and_train_model.
+
+    Args:
+        num_classes: The number of classes the model predicts
+        img_width: The width of the images the model takes
+        img_height: The height of the images the model takes
+        rotation: The largest random rotation applied by data augmentation (fraction of 2 pi)
+        zoom: The largest random zoom applied by data augmentation, 0 disables zooming
+        dropout: The dropout rate before the dense layer
+        filters: A tuple of the filter counts of the conv layers, one conv and pooling block each
+        dense_units: The number of units of the hidden dense layer
+        channels: The number of color channels of the images, 3 for RGB and 1 for grayscale
+
+    Returns:
+        The compiled tf.keras.Sequential model.
+    """
+    # Use data augmentation to expose model to more samples to reduce overfitting
+    augmentation_layers = [layers.RandomFlip("horizontal",
+                                             input_shape=(img_height,
+                                                          img_width,
+                                                          channels))]
+    if rotation:
+        augmentation_layers.append(layers.RandomRotation(rotation))
+    if zoom:
+        augmentation_layers.append(layers.RandomZoom(zoom))
+    data_augmentation = keras.Sequential(augmentation_layers)
+
+    conv_layers = []
+    for filter_count in filters:
+        conv_layers += [layers.Conv2D(filter_count, 3, padding='same', activation='relu'),
+                        layers.MaxPooling2D()]
+
     # Creating the model (includes data standardization via layers.Rescaling)
     # Also includes Drop to reduce overfitting
     model = Sequential([
         data_augmentation,
-        layers.Rescaling(1./255, input_shape=(img_height, img_width, 3)),
-        layers.Conv2D(16, 3, padding='same', activation='relu'),
-        layers.MaxPooling2D(),
-        layers.Conv2D(32, 3, padding='same', activation='relu'),
-        layers.MaxPooling2D(),
-        layers.Conv2D(64, 3, padding='same', activation='relu'),
-        layers.MaxPooling2D(),
-        layers.Dropout(0.2), # Use dropout to reduce overfitting
+        layers.Rescaling(1./255, input_shape=(img_height, img_width, channels)),
+        *conv_layers,
+        layers.Dropout(dropout), # Use dropout to reduce overfitting
         layers.Flatten(),
-        layers.Dense(128, activation='relu'),
+        layers.Dense(dense_units, activation='relu'),
         layers.Dense(num_classes)
     ])
 
@@ -106,22 +497,32 @@ def make_and_train_model(dataset_dir, model_output_dir, model_name, img_width, i
                   loss=tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True),
                   metrics=['accuracy'])
 
-    # Training the model
-    history = model.fit(
-        train_ds,
-        validation_data=val_ds,
-        epochs=DEFAULT_EPOCH_AMOUNT
-    )
+    return model
 
-    # Creating Training Results Plot
-    acc = history.history['accuracy']
-    val_acc = history.history['val_accuracy']
+def _plot_history(history):
+    """ Creates the training results plot of accuracy and loss per epoch.
 
-    loss = history.history['loss']
-    val_loss = history.history['val_loss']
+    matplotlib is imported here, not at module level, since it is slow to import
+    and only needed once training is done.
+
+    Args:
+        history: The History object returned by model.fit, or its history dictionary
+
+    Returns:
+        The matplotlib Figure of the training results.
+    """
+    import matplotlib.pyplot as plt
+
+    metrics = getattr(history, 'history', history)
+
+    acc = metrics['accuracy']
+    val_acc = metrics['val_accuracy']
+
+    loss = metrics['loss']
+    val_loss = metrics['val_loss']
+
+    epochs_range = range(len(acc))
 
-    epochs_range = range(DEFAULT_EPOCH_AMOUNT)
-    
     result_graph = plt.figure(figsize=(8, 8))
     result_graph.add_subplot(1, 2, 1)
     plt.plot(epochs_range, acc, label='Training Accuracy')
@@ -135,9 +536,379 @@ def make_and_train_model(dataset_dir, model_output_dir, model_name, img_width, i
     plt.legend(loc='upper right')
     plt.title('Training and Validation Loss')
 
-    _handle_save_data(model, result_graph, model_output_dir, model_name)
+    return result_graph
+
+def _load_split(dataset_dir, subset, img_width, img_height, batch_size=DEFAULT_BATCH_SIZE):
+    """ Loads the training or validation split of the dataset directory.
+
+    Args:
+        dataset_dir: The path of the dataset directory
+        subset: Either "training" or "validation"
+        img_width: The width images are resized to
+        img_height: The height images are resized to
+        batch_size: The number of images per batch
+
+    Returns:
+        A tf.data.Dataset of (images, labels) batches.
+    """
+    return tf.keras.utils.image_dataset_from_directory(
+        dataset_dir,
+        validation_split=DEFAULT_VALIDATION_SPLIT,
+        subset=subset,
+        seed=DEFAULT_SPLIT_SEED,
+        image_size=(img_height, img_width),
+        batch_size=batch_size)
+
+def inference_export_path(model_path):
+    """ Returns: The path export_inference_model saves the export of the model at model_path to """
+    return f"{os.path.splitext(os.path.normpath(model_path))[0]}{backends.SAVED_MODEL_SUFFIX}"
+
+def export_inference_model(model_path, export_path=None, compare=True, num_threads=backends.DEFAULT_NUM_THREADS,
+                           tolerance=DEFAULT_EXPORT_TOLERANCE):
+    """ Exports a saved model to a lean SavedModel for inference (see backends.SavedModelBackend).
+
+    Data augmentation and dropout only matter during training and are left out,
+    the 1/255 input scaling is folded into the kernel of the first conv layer and
+    softmax is added on top. The result is traced once as a tf.function that takes
+    uint8 frames of the model's input size, and saved as the SavedModel's only
+    function. Models not made by _build_model are exported whole, with the same
+    input and softmax.
+
+    Args:
+        model_path: The path of the saved tf.keras model (HD5F format)
+        export_path: The path of the SavedModel folder, defaults to <model>_inference
+                     next to model_path (replaced if it exists)
+        compare: Whether to measure the cold start (in a fresh interpreter) and the
+                 per-frame latency of both models and print them
+        num_threads: The number of threads used when measuring
+        tolerance: The largest probability difference the export may have from the model
+
+    Returns:
+        The path of the export, or when compare is True a dictionary with the "path"
+        and, for "keras" and "exported", the cold_start_seconds, latency_ms and its
+        delta against the keras model.
+
+    Raises:
+        ValueError: If the export predicts more than tolerance away from the model, the export is removed
+    """
+    model = tf.keras.models.load_model(model_path)
+    input_shape = tuple(model.input_shape[1:])
+    lean_model = _lean_model(model) if isinstance(model, Sequential) else model
+
+    @tf.function(input_signature=[tf.TensorSpec((None, *input_shape), tf.uint8, name="frames")])
+    def serve(frames):
+        return tf.nn.softmax(lean_model(tf.cast(frames, tf.float32), training=False))
+
+    export_path = inference_export_path(model_path) if export_path is None else export_path
+    if os.path.exists(export_path):
+        shutil.rmtree(export_path)
+    module = tf.Module()
+    module.model = lean_model
+    module.serve = serve
+    tf.saved_model.save(module, export_path, signatures=serve)
 
-def _handle_save_data(trained_model, result_graph, model_output_dir, model_name):
+    # The export has to predict what the model it came from does
+    frames = np.random.default_rng(DEFAULT_SPLIT_SEED).integers(0, 256, (8, *input_shape), dtype=np.uint8)
+    expected = backends.softmax(model(frames.astype(np.float32), training=False).numpy())
+    difference = float(np.abs(serve(frames).numpy() - expected).max())
+    if difference > tolerance:
+        # Removed so the detector does not pick the broken export up as its default model
+        shutil.rmtree(export_path)
+        raise ValueError(INFERENCE_EXPORT_ERR_MSG.format(model_path=model_path, difference=difference,
+                                                         tolerance=tolerance))
+    print(INFERENCE_EXPORT_MSG.format(path=export_path, difference=difference))
+
+    if not compare:
+        return export_path
+
+    report = {"path": export_path}
+    for name, path in (("keras", model_path), ("exported", export_path)):
+        backend = backends.load_backend(path, num_threads)
+        report[name] = {"cold_start_seconds": _cold_start_seconds(path, num_threads),
+                        "latency_ms": _frame_latency_ms(backend, frames)}
+
+    print(INFERENCE_REPORT_HEADER)
+    for name in ("keras", "exported"):
+        result = report[name]
+        result["latency_delta_ms"] = result["latency_ms"] - report["keras"]["latency_ms"]
+        print(INFERENCE_REPORT_ROW.format(name=name, **result))
+
+    return report
+
+def _is_augmentation(layer):
+    """ Returns: A boolean representing if layer is a data augmentation block like the one of _build_model """
+    return (isinstance(layer, Sequential) and len(layer.layers) > 0
+            and all(isinstance(sublayer, AUGMENTATION_LAYERS) for sublayer in layer.layers))
+
+def _export_trained_model(model_path):
+    """ Exports a model that was just trained and saved for inference, see export_inference_model.
+
+    A failed export only prints a warning, the saved model is still there and the
+    detector falls back to it.
+
+    Returns:
+        The path of the export, or None if it failed.
+    """
+    try:
+        return export_inference_model(model_path, compare=False)
+    except Exception as error:
+        print(INFERENCE_EXPORT_FAILED_MSG.format(model_path=model_path, error=error))
+        return None
+
+def _lean_model(model):
+    """ Copies a model made by _build_model without the layers that only matter
+    during training, with an input Rescaling folded into the conv layer after it.
+
+    Returns:
+        The new tf.keras.Sequential model, it outputs the same logits.
+    """
+    lean_layers, weights = [], []
+    scale = None
+    for layer in model.layers:
+        if _is_augmentation(layer) or isinstance(layer, layers.Dropout):
+            # Data augmentation and dropout pass their inputs through at inference
+            continue
+
+        config = layer.get_config()
+        config.pop("batch_input_shape", None)
+        if isinstance(layer, layers.Rescaling) and not config["offset"] and scale is None:
+            # conv(x * scale) is conv with its kernel times scale, as long as nothing is added to x
+            scale = config["scale"]
+            continue
+
+        layer_weights = layer.get_weights()
+        if scale is not None:
+            if isinstance(layer, layers.Conv2D):
+                layer_weights[0] = layer_weights[0] * scale
+            else:
+                lean_layers.append(layers.Rescaling(scale))
+                weights.append([])
+            scale = None
+
+        lean_layers.append(layer.__class__.from_config(config))
+        weights.append(layer_weights)
+
+    lean_model = Sequential([keras.Input(shape=model.input_shape[1:]), *lean_layers])
+    for layer, layer_weights in zip(lean_model.layers, weights):
+        layer.set_weights(layer_weights)
+
+    return lean_model
+
+def _cold_start_seconds(model_path, num_threads=backends.DEFAULT_NUM_THREADS):
+    """ Measures the seconds from loading a model to its first prediction, in a fresh
+    interpreter so nothing loaded or traced earlier is reused.
+    """
+    script = COLD_START_SCRIPT.format(src_dir=os.path.dirname(os.path.abspath(__file__)),
+                                      model_path=os.path.abspath(model_path), num_threads=num_threads)
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def _frame_latency_ms(backend, frames, count=DEFAULT_LATENCY_FRAMES):
+    """ Returns: The mean milliseconds a backend takes for a single frame, like the detector runs it """
+    # Warm up so one time setup is not counted as latency
+    backend.predict(frames[:1])
+
+    start = time.perf_counter()
+    for i in range(count):
+        backend.predict(frames[i % len(frames)][np.newaxis])
+    return 1000 * (time.perf_counter() - start) / count
+
+def export_tflite_models(model_path, dataset_dir, num_threads=backends.DEFAULT_NUM_THREADS,
+                         calibration_samples=DEFAULT_CALIBRATION_SAMPLES):
+    """ Exports a saved model to a float16 and an int8 quantized TensorFlow Lite model.
+
+    The int8 model is calibrated on a sample of the cached training split of
+    dataset_dir. Both exports are saved next to model_path and are then compared
+    against the original model on the cached validation split. Images are
+    converted to grayscale for models that take one channel, like the gatekeeper.
+
+    Args:
+        model_path: The path of the saved tf.keras model (HD5F format)
+        dataset_dir: The path of the dataset directory the model was trained on
+        num_threads: The number of threads used when measuring latency
+        calibration_samples: The number of training images used for int8 calibration
+
+    Returns:
+        A dictionary mapping "keras", "float16" and "int8" to their path, accuracy,
+        latency_ms (per frame) and the deltas of both against the keras model.
+    """
+    model = tf.keras.models.load_model(model_path)
+    img_height, img_width, channels = model.input_shape[1:]
+    base_path = os.path.splitext(model_path)[0]
+
+    # The cached splits make_and_train_model uses, so the exports are compared on images the model never trained on
+    cache = dataset_cache.DatasetCache(dataset_dir, img_width, img_height)
+    cache.update()
+    frames = cache.frames()
+    train_rows, _ = _split_rows(cache, "training")
+    val_rows, val_labels = _split_rows(cache, "validation")
+
+    # Representative sample of the training data used to pick the int8 ranges, spread over every class
+    calibration_rows = train_rows[np.linspace(0, len(train_rows) - 1, min(calibration_samples, len(train_rows)),
+                                              dtype=int)]
+    calibration_images = _to_image_channels(np.asarray(frames[calibration_rows]), channels)
+    def representative_dataset():
+        for image in calibration_images:
+            yield [image[np.newaxis].astype(np.float32)]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    float16_path = f"{base_path}_float16.tflite"
+    with open(float16_path, "wb") as model_file:
+        model_file.write(converter.convert())
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    # Camera frames are already uint8, so they can go into the model as is
+    converter.inference_input_type = tf.uint8
+    int8_path = f"{base_path}_int8.tflite"
+    with open(int8_path, "wb") as model_file:
+        model_file.write(converter.convert())
+
+    val_images = _to_image_channels(np.asarray(frames[val_rows]), channels)
+
+    report = {}
+    for name, path in (("keras", model_path), ("float16", float16_path), ("int8", int8_path)):
+        accuracy, latency_ms = _evaluate_backend(backends.load_backend(path, num_threads), val_images, val_labels)
+        report[name] = {"path": path, "accuracy": accuracy, "latency_ms": latency_ms}
+
+    print(EXPORT_REPORT_HEADER)
+    for name, result in report.items():
+        result["accuracy_delta"] = result["accuracy"] - report["keras"]["accuracy"]
+        result["latency_delta_ms"] = result["latency_ms"] - report["keras"]["latency_ms"]
+        print(EXPORT_REPORT_ROW.format(name=name, **result))
+
+    return report
+
+def tune_cascade(model_path, gatekeeper_path, dataset_dir, max_accuracy_drop=DEFAULT_CASCADE_ACCURACY_DROP,
+                 num_threads=backends.DEFAULT_NUM_THREADS):
+    """ Picks the gatekeeper threshold of a cascade on the validation split and saves the cascade.
+
+    The lowest threshold that keeps the cascade's validation accuracy within
+    max_accuracy_drop of the full model's is picked, as it lets the gatekeeper
+    answer for the most frames. The full model, the gatekeeper alone and the
+    cascade are then compared one frame at a time, like the detector runs them.
+    The cascade is saved next to model_path as <model>.cascade.json, which
+    backends.load_backend (and so the detector) opens as a CascadeBackend.
+
+    Args:
+        model_path: The path of the saved full model
+        gatekeeper_path: The path of the saved gatekeeper model
+        dataset_dir: The path of the dataset directory both were trained on
+        max_accuracy_drop: The validation accuracy the cascade may lose against the full model
+        num_threads: The number of threads used when measuring latency
+
+    Returns:
+        A dictionary with the cascade "path" and "threshold" and, for "keras",
+        "gatekeeper" and "cascade", the accuracy, latency_ms (per frame), the deltas
+        of both against the keras model and the share of frames the full model ran on.
+    """
+    cascade = backends.CascadeBackend(backends.load_backend(model_path, num_threads),
+                                      backends.load_backend(gatekeeper_path, num_threads), 0.0)
+    img_height, img_width = cascade.input_shape[:2]
+
+    # The validation split make_and_train_model holds out, so neither model has seen these images
+    cache = dataset_cache.DatasetCache(dataset_dir, img_width, img_height)
+    cache.update()
+    val_rows, val_labels = _split_rows(cache, "validation")
+    val_images = np.asarray(cache.frames()[val_rows])
+
+    gatekeeper_probabilities = np.concatenate([cascade.screen(batch) for batch in _batches(val_images)])
+    model_probabilities = np.concatenate([cascade.model.predict(batch) for batch in _batches(val_images)])
+    cascade.threshold, _, escalated = _choose_cascade_threshold(gatekeeper_probabilities, model_probabilities,
+                                                                val_labels, max_accuracy_drop)
+
+    cascade_path = f"{os.path.splitext(model_path)[0]}{backends.CASCADE_SUFFIX}"
+    backends.save_cascade(cascade_path, model_path, gatekeeper_path, cascade.threshold)
+    print(CASCADE_SAVED_MSG.format(threshold=cascade.threshold, path=cascade_path))
+
+    report = {"path": cascade_path, "threshold": cascade.threshold}
+    for name, backend, share in (("keras", cascade.model, 1.0), ("gatekeeper", _GatekeeperOnly(cascade), 0.0),
+                                 ("cascade", cascade, escalated)):
+        accuracy, latency_ms = _evaluate_backend(backend, val_images, val_labels)
+        report[name] = {"accuracy": accuracy, "latency_ms": latency_ms, "escalated": share}
+
+    print(CASCADE_REPORT_HEADER)
+    for name in ("keras", "gatekeeper", "cascade"):
+        result = report[name]
+        result["accuracy_delta"] = result["accuracy"] - report["keras"]["accuracy"]
+        result["latency_delta_ms"] = result["latency_ms"] - report["keras"]["latency_ms"]
+        print(CASCADE_REPORT_ROW.format(name=name, **result))
+
+    return report
+
+class _GatekeeperOnly:
+    """ Runs the gatekeeper of a cascade on full sized frames, as if it were the only model. """
+
+    def __init__(self, cascade):
+        self._cascade = cascade
+
+    def predict(self, batch):
+        return self._cascade.screen(batch)
+
+def _batches(images, batch_size=DEFAULT_BATCH_SIZE):
+    """ Splits an array of images into batches of at most batch_size. """
+    return [images[start:start + batch_size] for start in range(0, len(images), batch_size)]
+
+def _split_rows(cache, subset):
+    """ Gets the frame rows and labels of a split of a dataset_cache.DatasetCache.
+
+    Raises:
+        ValueError: If the split has no images, which small datasets can end up with.
+    """
+    rows, labels = cache.split(subset)
+    if len(rows) == 0:
+        raise ValueError(EMPTY_SPLIT_ERR_MSG.format(subset=subset, dataset_dir=cache.dataset_dir))
+    return rows, labels
+
+def _choose_cascade_threshold(gatekeeper_probabilities, model_probabilities, labels,
+                              max_accuracy_drop=DEFAULT_CASCADE_ACCURACY_DROP):
+    """ Finds the lowest gatekeeper threshold that keeps the cascade within max_accuracy_drop
+    of the full model's accuracy.
+
+    Frames whose gatekeeper confidence is at least the threshold keep the gatekeeper's
+    prediction, the others get the full model's.
+
+    Returns:
+        A tuple of the threshold, the cascade accuracy and the share of frames the
+        full model runs on at that threshold.
+    """
+    confidences = gatekeeper_probabilities.max(axis=-1)
+    gatekeeper_correct = np.argmax(gatekeeper_probabilities, axis=-1) == labels
+    model_correct = np.argmax(model_probabilities, axis=-1) == labels
+    target = model_correct.mean() - max_accuracy_drop
+
+    # Only the confidences that occur change which frames are escalated, just above
+    # the highest one every frame is, which is as accurate as the full model
+    candidates = np.append(np.unique(confidences), np.nextafter(confidences.max(), np.inf))
+    for threshold in candidates:
+        accepted = confidences >= threshold
+        accuracy = np.where(accepted, gatekeeper_correct, model_correct).mean()
+        if accuracy >= target:
+            return float(threshold), float(accuracy), float(1 - accepted.mean())
+
+def _evaluate_backend(backend, images, labels):
+    """ Runs a backend over images one frame at a time, like the detector does.
+
+    Returns:
+        A tuple of the accuracy and the mean latency per frame in milliseconds.
+    """
+    # Warm up so one time setup is not counted as latency
+    backend.predict(images[:1])
+
+    correct = 0
+    start = time.perf_counter()
+    for image, label in zip(images, labels):
+        probabilities = backend.predict(image[np.newaxis])
+        correct += int(np.argmax(probabilities[0]) == label)
+    elapsed = time.perf_counter() - start
+
+    return correct / len(labels), 1000 * elapsed / len(labels)
+
+def _handle_save_data(trained_model, result_graph, model_output_dir, model_name, save_policy=SAVE_POLICY_PROMPT):
     """ Handles situations of saving model that might occur during runtime.
     Gives options on how to proceed to the user in the event we are trying to save to 
     the same file location of another model.
@@ -146,13 +917,23 @@ def _handle_save_data(trained_model, result_graph, model_output_dir, model_name)
         1. Overwriting the current model in the conflicting path.
         2. Choosing a new model name to avoid the conflict.
         3. Discarding trained_model.
+
+    Unless save_policy is "prompt" the option is picked without asking, so
+    training can run unattended.
     
     Args:
         trained_model: The model that is going to be potentially saved.
         result_graph: The plot that shows training results.
         model_output_dir: The directory in which to save the model.
         model_name: The name to be used for saving trained_model and result_graph.
+        save_policy: "prompt", "overwrite" or "timestamp" (save under a generated name)
+
+    Returns:
+        The path the model was saved to.
     """
+    if save_policy != SAVE_POLICY_PROMPT and save_policy not in SAVE_POLICY_OPTIONS:
+        raise ValueError(SAVE_POLICY_ERR_MSG)
+
     model_name = data_collect.normalize(model_name)
     model_path = os.path.join(model_output_dir, f"{model_name}_model.h5")
     graph_path = os.path.join(model_output_dir, f"{model_name}_graph.jpg")
@@ -160,16 +941,45 @@ def _handle_save_data(trained_model, result_graph, model_output_dir, model_name)
     model_path_exists = os.path.exists(model_path)
     graph_path_exists = os.path.exists(graph_path)
 
-    if model_path_exists:
-        model_path = _handle_model_graph_path_exists(model_output_dir, model_path, model_name, True)
-    
-    if graph_path_exists:
-        graph_path = _handle_model_graph_path_exists(model_output_dir, graph_path, model_name, False)
-    
+    # Generated names of the model and its graph share one time, so they can be told apart from other runs
+    time_string = data_collect.get_time_string()
+    if save_policy == SAVE_POLICY_TIMESTAMP and (model_path_exists or graph_path_exists):
+        # Unattended runs keep the model and its graph together under one generated name
+        model_path, graph_path = _timestamped_paths(model_output_dir, model_name, time_string)
+    else:
+        if model_path_exists:
+            model_path = _handle_model_graph_path_exists(model_output_dir, model_path, model_name, True, save_policy,
+                                                         time_string)
+        if graph_path_exists:
+            graph_path = _handle_model_graph_path_exists(model_output_dir, graph_path, model_name, False, save_policy,
+                                                         time_string)
+
     trained_model.save(model_path)
     result_graph.savefig(graph_path)
 
-def _handle_model_graph_path_exists(output_dir, filepath, name, is_model):
+    return model_path
+
+def _timestamped_paths(output_dir, name, time_string):
+    """ Generates the model and graph paths of a save under <name>_<time>.
+
+    The time only goes down to the second, so a counter is added when the model or
+    graph of another save made within the same second is already there.
+
+    Returns:
+        A tuple of the model path and the graph path, neither of which exists.
+    """
+    base_name = f"{name}_{time_string}"
+    count = 0
+    while True:
+        model_path = os.path.join(output_dir, f"{base_name}_model.h5")
+        graph_path = os.path.join(output_dir, f"{base_name}_graph.jpg")
+        if not os.path.exists(model_path) and not os.path.exists(graph_path):
+            return model_path, graph_path
+        count += 1
+        base_name = f"{name}_{time_string}_{count}"
+
+def _handle_model_graph_path_exists(output_dir, filepath, name, is_model, save_policy=SAVE_POLICY_PROMPT,
+                                    time_string=None):
     """ Does the cli handling in the event there is a model/graph at filepath.
     
     Args:
@@ -177,6 +987,8 @@ def _handle_model_graph_path_exists(output_dir, filepath, name, is_model):
         filepath: The path that has a conflicting model file
         name: The current name of the model to be used for saving
         is_graph: Whether or not the file conflict is for the model (if False, conflict is for the graph)
+        save_policy: "prompt" to ask the user, otherwise the option to pick without asking
+        time_string: The time generated names hold, defaults to now (see data_collect.get_time_string)
     
     Returns:
         A path that has no file conflicts that is safe for saving.
@@ -184,13 +996,16 @@ def _handle_model_graph_path_exists(output_dir, filepath, name, is_model):
     filepath_exists = True
 
     while filepath_exists:
-        if is_model:
-            message = ''.join([DEFAULT_MODEL_EXITS_MESSAGE_ARR[0], f"\"{name}\"", DEFAULT_MODEL_EXITS_MESSAGE_ARR[2]])
+        if save_policy in SAVE_POLICY_OPTIONS:
+            option = SAVE_POLICY_OPTIONS[save_policy]
         else:
-            message = ''.join([DEFAULT_MODEL_EXITS_MESSAGE_ARR[1], f"\"{name}\"", DEFAULT_MODEL_EXITS_MESSAGE_ARR[2]])
-        print(message)
+            if is_model:
+                message = ''.join([DEFAULT_MODEL_EXITS_MESSAGE_ARR[0], f"\"{name}\"", DEFAULT_MODEL_EXITS_MESSAGE_ARR[2]])
+            else:
+                message = ''.join([DEFAULT_MODEL_EXITS_MESSAGE_ARR[1], f"\"{name}\"", DEFAULT_MODEL_EXITS_MESSAGE_ARR[2]])
+            print(message)
 
-        option = input()
+            option = input()
 
         if option == "1":
             # Overwrite the model data currently at model_path
@@ -198,12 +1013,9 @@ def _handle_model_graph_path_exists(output_dir, filepath, name, is_model):
             filepath_exists = os.path.exists(filepath)  
         elif option == "2":
             # Generate a temporary path for the model to save under
-            name = data_collect.get_time_string()
-            if is_model:
-                filepath = os.path.join(output_dir, f"{name}_model.h5")
-            else:
-                filepath = os.path.join(output_dir, f"{name}_graph.jpg")
-            filepath_exists = os.path.exists(filepath)  
+            model_path, graph_path = _timestamped_paths(output_dir, name, time_string or data_collect.get_time_string())
+            filepath = model_path if is_model else graph_path
+            filepath_exists = False
         else:
             # Input not understood
             print("Option not recognized, please type in the number of the option you want.\n\n")
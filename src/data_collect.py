@@ -11,22 +11,45 @@ collection of images of the user to be used in the recognition training.
     if user_wants_a_dataset:
         create_dataset(path_to_save_dataset)
 """
+import itertools
+import numpy as np
 import os
+import queue
 import re
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from tkinter import Tk, Label
-from cv2 import cvtColor, VideoCapture, COLOR_BGR2RGB, CAP_PROP_FRAME_HEIGHT, CAP_PROP_FRAME_WIDTH, CAP_ANY
-from PIL import ImageTk, Image
+from tkinter import Tk
+from cv2 import (VideoCapture, VideoWriter_fourcc, CAP_PROP_FOURCC, CAP_PROP_FPS, CAP_PROP_FRAME_HEIGHT,
+                 CAP_PROP_FRAME_WIDTH, CAP_ANY)
+from PIL import Image
+from dedupe import HashIndex, dhash
+from metrics import NULL_METRICS, Metrics
 
 
-# Defaults for both CamCapture and CamDisplay classes
+# Defaults for CamCapture and the display loop of pipeline.FramePipeline
 DEFAULT_DATASET_PATH = os.path.join(os.getcwd(), "datasets")
 DEFAULT_FRAME_INTERVAL = 10
 
+# Defaults for ThreadedCamCapture class
+DEFAULT_BUFFER_SIZE = 4
+DEFAULT_READ_TIMEOUT = 1.0
+
 # Default error message for CamCapture class
 CAMERA_SOURCE_ERR_MSG = "Could not open camera."
-
-# Default error message for CamDisplay class
+# Printed when the device does not grant a requested capture setting
+CAPTURE_SETTING_MISMATCH_MSG = "Camera {setting}: requested {requested}, got {granted}"
+# Drivers report the frame rate as a float that is rarely exactly the one requested
+CAPTURE_FPS_TOLERANCE = 0.5
+# Resolutions (width, height) cameras commonly offer, CamCapture picks one of them for min_size
+STANDARD_CAPTURE_RESOLUTIONS = [(160, 120), (320, 180), (320, 240), (352, 288), (424, 240), (640, 360),
+                                (640, 480), (800, 448), (800, 600), (960, 540), (1024, 576), (1024, 768),
+                                (1280, 720), (1280, 960), (1600, 1200), (1920, 1080)]
+# Largest difference of width / height that still counts as the same aspect ratio
+ASPECT_RATIO_TOLERANCE = 0.05
+
+# Default error message for the display loop of pipeline.FramePipeline
 DISPLAY_FRAME_ERR_MSG = "Could not read frame from camera source."
 
 # Prompts for _handle_existing_dataset
@@ -37,6 +60,31 @@ UNKNOWN_RESPONSE_PROMPT = '\nPlease respond with "y" or "n"'
 # Prompt for create_dataset
 DATASET_PROMPT = "Name to use for new dataset: "
 
+# Defaults for saving frames, encoder names map to their file extension
+ENCODER_EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+DEFAULT_ENCODER = "png"
+DEFAULT_QUALITY = 90
+DEFAULT_WRITE_BACKLOG = 32
+# Seconds ImageWriter.close waits for the queued frames to be written
+DEFAULT_CLOSE_TIMEOUT = 30.0
+# Printed by ImageWriter when a frame could not be saved, or the queue was not written in time
+WRITE_ERR_MSG = "Could not save frame {name} to {path}: {error}"
+WRITE_TIMEOUT_MSG = "Frames were still being written after {timeout:.0f}s, the hash indexes were not saved"
+INDEX_SAVE_ERR_MSG = "Could not save the hash index of {path}: {error}"
+
+# Defaults for burst capture in create_dataset
+BURST_KEY = "b"
+DEFAULT_BURST_FPS = 5
+# Key auto-repeat sends release/press pairs while a key is held, a release only
+# counts once no press followed it within this many milliseconds
+BURST_RELEASE_DELAY = 100
+
+# Default error message for _save_frame
+ENCODER_ERR_MSG = "Unknown encoder, expected one of: " + ", ".join(ENCODER_EXTENSIONS)
+
+# Makes frame file names unique even when saved within the same microsecond
+_frame_counter = itertools.count()
+
 
 # Module Helper Functions
 
@@ -62,15 +110,21 @@ def _create_dir(name: str, path: str):
     return already_exists, file_path
 
 
-def get_time_string():
-    """Creates a string representing the current time down to the second.
+def get_time_string(with_microseconds: bool = False):
+    """Creates a string representing the current time down to the second (or microsecond).
+
+    Args:
+        with_microseconds: A boolean representing if microseconds are appended
 
     Returns: A string representing the current time in the format YYYY_MM_DD_HH_MM_SS
+             (YYYY_MM_DD_HH_MM_SS_UUUUUU with microseconds)
     """
 
     time = datetime.now()
     units = (time.year, time.month, time.day,
              time.hour, time.minute, time.second)
+    if with_microseconds:
+        units += (f"{time.microsecond:06d}",)
 
     # Create string from units of time down to second
     date_str = ""
@@ -92,10 +146,34 @@ def normalize(string: str):
     return string
 
 
-def _save_frame(name, dataset_path, frame: Image.Image):
-    """Saves the ImageTk input frame at dataset path with a standardized name."""
-    img_path = os.path.join(dataset_path, f"{get_time_string()}{name}.png")
-    frame.save(img_path)
+def _save_frame(name, dataset_path, frame: Image.Image, encoder: str = DEFAULT_ENCODER,
+                quality: int = DEFAULT_QUALITY):
+    """Saves the input frame at dataset path with a standardized name.
+
+    Names hold the time down to the microsecond plus a counter, so frames saved
+    within the same second never overwrite each other.
+
+    Args:
+        name: The name of the dataset the frame belongs to
+        dataset_path: The path of the dataset folder
+        frame: The image to save
+        encoder: One of "png", "jpeg" or "webp"
+        quality: The quality (1-100) used by the lossy encoders
+
+    Returns: The path the frame was saved at
+    """
+    if encoder not in ENCODER_EXTENSIONS:
+        raise ValueError(ENCODER_ERR_MSG)
+
+    file_name = f"{get_time_string(True)}{next(_frame_counter)}_{name}.{ENCODER_EXTENSIONS[encoder]}"
+    img_path = os.path.join(dataset_path, file_name)
+    if encoder == "png":
+        frame.save(img_path, format="PNG")
+    else:
+        # Lossy formats can not store an alpha channel
+        frame.convert("RGB").save(img_path, format=encoder.upper(), quality=quality)
+
+    return img_path
 
 
 def _handle_existing_dataset():
@@ -119,115 +197,427 @@ def _handle_existing_dataset():
 # Module Classes
 
 
+class ImageWriter:
+    """Encodes and writes dataset frames on a background thread.
+
+    Saving from the Tk thread makes the live feed stutter on every save, so frames
+    are queued here instead. The queue is bounded: when the disk can not keep up,
+    new frames are rejected rather than piling up in memory.
+
+    Attributes:
+        encoder: One of "png", "jpeg" or "webp"
+        quality: The quality (1-100) used by the lossy encoders
+        cropper: A roi.FaceCropper to save only the faces of a frame, or None
+        dedupe: A boolean representing if near-duplicates of saved images are skipped
+        written: An integer count of frames written
+        rejected: An integer count of frames dropped because the backlog was full
+        duplicates: An integer count of frames skipped as near-duplicates
+        failed: An integer count of frames that could not be saved
+    """
+
+    def __init__(self, encoder: str = DEFAULT_ENCODER, quality: int = DEFAULT_QUALITY,
+                 backlog: int = DEFAULT_WRITE_BACKLOG, cropper=None, dedupe: bool = True):
+        """Initializes ImageWriter and starts the writing thread.
+
+        Args:
+            encoder: One of "png", "jpeg" or "webp"
+            quality: The quality (1-100) used by the lossy encoders
+            backlog: The number of frames that may wait to be written
+            cropper: A roi.FaceCropper to save only the faces of a frame, or None
+            dedupe: A boolean representing if near-duplicates of images already in
+                    the dataset folder are skipped (see dedupe.py)
+        """
+        if encoder not in ENCODER_EXTENSIONS:
+            raise ValueError(ENCODER_ERR_MSG)
+
+        self.encoder = encoder
+        self.quality = quality
+        self.cropper = cropper
+        self.dedupe = dedupe
+        self.written = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.failed = 0
+
+        # Hash index of every dataset folder written to, loaded once per session
+        self._hash_indexes = {}
+
+        self._queue = queue.Queue(maxsize=backlog)
+        self._thread = threading.Thread(target=self._write_frames, daemon=True)
+        self._thread.start()
+
+    def submit(self, name, dataset_path, frame: Image.Image, block: bool = False):
+        """Queues a frame to be saved without waiting for the disk.
+
+        Args:
+            block: A boolean representing if a full backlog is waited on instead of
+                   rejecting the frame (offline extraction, see recording.py)
+
+        Returns: A boolean representing if the frame was queued
+        """
+        try:
+            self._queue.put((name, dataset_path, frame), block=block)
+        except queue.Full:
+            self.rejected += 1
+            return False
+
+        return True
+
+    def _write_frames(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            name, dataset_path, frame = job
+            try:
+                if self.cropper is None:
+                    self._write(name, dataset_path, frame)
+                else:
+                    # Save every face in the frame instead of the whole frame
+                    faces = self.cropper.crop(np.asarray(frame.convert("RGB")))
+                    for i, face in enumerate(faces):
+                        self._write(f"{name}_{i}", dataset_path, Image.fromarray(face))
+            except Exception as error:
+                # One bad frame (or a missing folder) must not stop the frames after it from being written
+                self.failed += 1
+                print(WRITE_ERR_MSG.format(name=name, path=dataset_path, error=error))
+
+    def _write(self, name, dataset_path, image: Image.Image):
+        if not self.dedupe:
+            _save_frame(name, dataset_path, image, self.encoder, self.quality)
+            self.written += 1
+            return
+
+        if dataset_path not in self._hash_indexes:
+            self._hash_indexes[dataset_path] = HashIndex(dataset_path)
+        index = self._hash_indexes[dataset_path]
+
+        image_hash = dhash(np.asarray(image.convert("RGB")))
+        if index.find_duplicate(image_hash) is not None:
+            self.duplicates += 1
+            return
+
+        img_path = _save_frame(name, dataset_path, image, self.encoder, self.quality)
+        index.add(os.path.basename(img_path), image_hash)
+        self.written += 1
+
+    def close(self, timeout: float = DEFAULT_CLOSE_TIMEOUT):
+        """Writes every queued frame, then stops the writing thread and saves the hash indexes.
+
+        Args:
+            timeout: The seconds to wait for the queued frames to be written
+        """
+        deadline = time.monotonic() + timeout
+        while self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=min(0.1, timeout))
+                break
+            except queue.Full:
+                if time.monotonic() > deadline:
+                    break
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+
+        if self._thread.is_alive():
+            print(WRITE_TIMEOUT_MSG.format(timeout=timeout))
+            return
+        for index in self._hash_indexes.values():
+            try:
+                index.save()
+            except OSError as error:
+                print(INDEX_SAVE_ERR_MSG.format(path=index.dataset_path, error=error))
+
+
+class _BurstTrigger:
+    """Calls capture at a fixed rate for as long as a key is held down."""
+
+    def __init__(self, root: Tk, capture, fps: int = DEFAULT_BURST_FPS):
+        self._root = root
+        self._capture = capture
+        self._interval = int(1000 / fps)
+        self._active = False
+        self._pending_release = None
+
+    def press(self, event=None):
+        if self._pending_release is not None:
+            # Auto-repeat, the key never really went up
+            self._root.after_cancel(self._pending_release)
+            self._pending_release = None
+
+        if not self._active:
+            self._active = True
+            self._tick()
+
+    def release(self, event=None):
+        self._pending_release = self._root.after(BURST_RELEASE_DELAY, self._stop)
+
+    def _stop(self):
+        self._pending_release = None
+        self._active = False
+
+    def _tick(self):
+        if not self._active:
+            return
+
+        self._capture()
+        self._root.after(self._interval, self._tick)
+
+
+def _fourcc_to_string(fourcc: float):
+    """Turns the CAP_PROP_FOURCC value of a VideoCapture into its four character code."""
+    code = int(fourcc)
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+
+
+def capture_size(min_width: int, min_height: int, aspect_ratio: float = None):
+    """Picks the smallest standard capture resolution that holds a min_width x min_height frame.
+
+    Args:
+        min_width: The width the frames must at least have
+        min_height: The height the frames must at least have
+        aspect_ratio: The width / height the resolution should keep (the camera's), None for any
+
+    Returns: A tuple of the (width, height) to request, or None if no standard resolution is large enough
+    """
+    candidates = [(width, height) for width, height in STANDARD_CAPTURE_RESOLUTIONS
+                  if width >= min_width and height >= min_height]
+    if aspect_ratio:
+        same_aspect = [(width, height) for width, height in candidates
+                       if abs(width / height - aspect_ratio) <= ASPECT_RATIO_TOLERANCE]
+        # Cameras with an unusual aspect ratio get the smallest large enough mode of any aspect ratio
+        candidates = same_aspect or candidates
+    if not candidates:
+        return None
+
+    return min(candidates, key=lambda size: size[0] * size[1])
+
+
 class CamCapture:
     """Class for live camera feed capture.
 
     Default values for the following parameters were chosen in mind for
     Raspberry Pi 4 Model B performance.
 
+    Capturing at the resolution the model takes saves resizing every frame, and
+    a compressed FOURCC like MJPG lets USB cameras deliver higher resolutions and
+    frame rates. Devices are free to grant something else, so the width, height,
+    fps and fourcc attributes always hold what the device actually delivers.
+
     Attributes:
-                    capture: An integer for source of video, 0 picks default camera of device
+                    capture: The cv2 VideoCapture object frames are read from
                     width: An integer for the capture width resolution
                     height: An integer for the capture height resolution
+                    fps: A float for the capture frame rate (0 if the device does not report it)
+                    fourcc: A string of the four character code of the capture format
     """
 
-    def __init__(self):
-        """Initializes CamCapture with camera source and capture resolution."""
+    def __init__(self, source=CAP_ANY, width: int = None, height: int = None, fps: float = None,
+                 fourcc: str = None, min_size: tuple = None):
+        """Initializes CamCapture with camera source and capture resolution.
 
-        # What if the user wants to use a different resolution??
-        self.capture = VideoCapture(CAP_ANY)
-        self.width = int(self.capture.get(CAP_PROP_FRAME_WIDTH))
-        self.height = int(self.capture.get(CAP_PROP_FRAME_HEIGHT))
+        Args:
+            source: Anything cv2.VideoCapture accepts, a device index (0 picks the
+                    default camera of the device) or the path of a video file
+            width: The capture width to request, None keeps the device default
+            height: The capture height to request, None keeps the device default
+            fps: The frame rate to request, None keeps the device default
+            fourcc: The four character code of the format to request (e.g. "MJPG"),
+                    None keeps the device default
+            min_size: A tuple of the (width, height) frames must at least have, used when width and
+                      height are None to request the smallest standard resolution that holds it in
+                      the device's default aspect ratio (see capture_size)
+        """
+        self.capture = VideoCapture(source)
 
         if not self.capture.isOpened():
             raise IOError(CAMERA_SOURCE_ERR_MSG)
 
+        # Some drivers only offer the larger resolutions once the format is set, so it goes first
+        if fourcc is not None:
+            self.capture.set(CAP_PROP_FOURCC, VideoWriter_fourcc(*fourcc))
+        if min_size is not None and width is None and height is None:
+            default_width = self.capture.get(CAP_PROP_FRAME_WIDTH)
+            default_height = self.capture.get(CAP_PROP_FRAME_HEIGHT)
+            size = capture_size(*min_size, default_width / default_height if default_height else None)
+            if size is not None and size != (int(default_width), int(default_height)):
+                width, height = size
+        if width is not None:
+            self.capture.set(CAP_PROP_FRAME_WIDTH, width)
+        if height is not None:
+            self.capture.set(CAP_PROP_FRAME_HEIGHT, height)
+        if fps is not None:
+            self.capture.set(CAP_PROP_FPS, fps)
+
+        self.width = int(self.capture.get(CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.capture.get(CAP_PROP_FPS)
+        self.fourcc = _fourcc_to_string(self.capture.get(CAP_PROP_FOURCC))
+
+        requested = (("width", width, self.width), ("height", height, self.height),
+                     ("fps", fps, self.fps), ("fourcc", fourcc, self.fourcc))
+        for setting, wanted, granted in requested:
+            if setting == "fps" and wanted is not None and abs(wanted - granted) <= CAPTURE_FPS_TOLERANCE:
+                continue
+            if wanted is not None and wanted != granted:
+                print(CAPTURE_SETTING_MISMATCH_MSG.format(setting=setting, requested=wanted, granted=granted))
+
+    def read(self):
+        """Reads the next frame from the capture source.
+
+        Returns: A tuple of a boolean representing if a frame was read and the BGR frame
+        """
+        return self.capture.read()
+
     def close(self):
         """Releases the cv2 VideoCapture object."""
         if self.capture.isOpened():
             self.capture.release()
 
 
-class CamDisplay:
-    """Class for displaying camera feed into a tkinter window.
+class ThreadedCamCapture(CamCapture):
+    """Camera capture that grabs frames on a background thread into a bounded ring buffer.
 
+    Reading never touches the device, so a stalled camera can not freeze the caller.
+    Consumers either ask for the latest frame (older buffered frames are dropped) or
+    for the next frame in capture order.
 
     Attributes:
-        cam_source: The CamCapture object used to get video feed from
-        root: The root tkinter window used for display
-        video: A tkinter Label class used to show the image within root
+        captured_frames: An integer count of frames grabbed from the source
+        dropped_frames: An integer count of frames that were never handed to a consumer
+        duplicated_frames: An integer count of times read_latest handed out a frame again
+        finished: A boolean representing if the source has run out of frames
     """
 
-    def _centered_tk(self, width_res: int, height_res: int):
-        """A helper function that creates a screen-centered
-           tkinter window with the given resolution.
+    def __init__(self, source=CAP_ANY, buffer_size: int = DEFAULT_BUFFER_SIZE, drop_when_full: bool = True,
+                 width: int = None, height: int = None, fps: float = None, fourcc: str = None,
+                 metrics: Metrics = NULL_METRICS, min_size: tuple = None):
+        """Initializes ThreadedCamCapture and starts the grabbing thread.
 
         Args:
-            win: The tkinter window to center
-            width_res: The resolution of the width
-            height_res: The resolution of the height
+            source: Anything cv2.VideoCapture accepts (device index or video file path)
+            buffer_size: The number of frames the ring buffer holds
+            drop_when_full: If True the oldest frame is overwritten when the buffer is full
+                            (live cameras), if False the grabber waits for a free slot so no
+                            frame is lost (video files)
+            width, height, fps, fourcc: The capture settings to request, see CamCapture
+            metrics: The metrics.Metrics grabbing is timed into (as "grab")
+            min_size: The smallest frame size to request a standard resolution for, see CamCapture
         """
+        super().__init__(source, width, height, fps, fourcc, min_size)
+
+        self._metrics = metrics
+
+        self._buffer = deque(maxlen=buffer_size)
+        self._drop_when_full = drop_when_full
+        self._condition = threading.Condition()
+        self._last_frame = None
+        self._running = True
+
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.duplicated_frames = 0
+        self.finished = False
+
+        self._thread = threading.Thread(target=self._grab_frames, daemon=True)
+        self._thread.start()
+
+    def _grab_frames(self):
+        """Grabs frames from the source until closed or the source runs out."""
+        while self._running:
+            with self._metrics.time("grab"):
+                ret, frame = self.capture.read()
+
+            with self._condition:
+                if not ret:
+                    self.finished = True
+                    self._condition.notify_all()
+                    return
+
+                if len(self._buffer) == self._buffer.maxlen:
+                    if self._drop_when_full:
+                        # deque drops the oldest frame on append
+                        self.dropped_frames += 1
+                    else:
+                        self._condition.wait_for(
+                            lambda: len(self._buffer) < self._buffer.maxlen or not self._running)
+                        if not self._running:
+                            return
+
+                self._buffer.append(frame)
+                self.captured_frames += 1
+                self._condition.notify_all()
+
+    def read_latest(self, timeout: float = DEFAULT_READ_TIMEOUT, repeat: bool = True):
+        """Returns the newest captured frame, dropping any older buffered frames.
+
+        If no new frame arrived since the last read, the previous frame is handed out
+        again (and counted as duplicated) instead of waiting on the camera. Only the very
+        first read waits, up to timeout seconds, for a frame.
 
-        win = Tk()
-        # @TODO Make window resizable later
-        win.resizable(width=False, height=False)
-        pos_horz = int(win.winfo_screenwidth()/2 - width_res/2)
-        pos_vert = int(win.winfo_screenheight()/2 - height_res/2)
-        win.geometry(f"{width_res}x{height_res}+{pos_horz}+{pos_vert}")
+        Args:
+            timeout: The seconds the first read waits for a frame
+            repeat: A boolean representing if the previous frame is handed out again,
+                    otherwise no frame is read when there is no new one
 
-        return win
+        Returns: A tuple of a boolean representing if a frame was read and the BGR frame
+        """
+        with self._condition:
+            if self._last_frame is None:
+                self._condition.wait_for(lambda: self._buffer or self.finished, timeout)
 
-    def __init__(self, cam_source: CamCapture = CamCapture(), display_title: str = "Camera Feed"):
-        """Initializes CamDisplay with a camera source and window display title.
+            if self._buffer:
+                self.dropped_frames += len(self._buffer) - 1
+                self._last_frame = self._buffer.pop()
+                self._buffer.clear()
+                self._condition.notify_all()
+                return True, self._last_frame
 
-        Args:
-            cam_source: The CamCapture object to used to get video feed from
-            display_title: The title used to name the tkinter display window
+            if self._last_frame is None or self.finished or not repeat:
+                return False, None
+
+            self.duplicated_frames += 1
+            return True, self._last_frame
+
+    def read_next(self, timeout: float = DEFAULT_READ_TIMEOUT):
+        """Returns the oldest buffered frame, waiting up to timeout seconds for one.
+
+        Returns: A tuple of a boolean representing if a frame was read and the BGR frame
         """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._buffer or self.finished, timeout):
+                return False, None
+            if not self._buffer:
+                return False, None
+
+            self._last_frame = self._buffer.popleft()
+            self._condition.notify_all()
+            return True, self._last_frame
+
+    @property
+    def exhausted(self):
+        """A boolean representing if the source ran out and every buffered frame has been read."""
+        with self._condition:
+            return self.finished and not self._buffer
+
+    def read(self):
+        """Same as read_latest, so display loops always show the freshest frame."""
+        return self.read_latest()
+
+    def close(self):
+        """Stops the grabbing thread and releases the cv2 VideoCapture object."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join()
+        super().close()
 
-        self.cam_source = cam_source
-
-        # Set up tk display
-        self.root = self._centered_tk(
-            self.cam_source.width, self.cam_source.height)
-        self.root.title(display_title)
-        self.root.bind('<Escape>', lambda event: self.root.quit())
-        self.video = Label(self.root)
-        self.video.pack()
-
-    def _display_frame(self):
-        ret, frame = self.cam_source.capture.read()
-        if not ret:
-            raise RuntimeError(DISPLAY_FRAME_ERR_MSG)
-
-        # Convert cv2 frame to ImageTk for tkinter window
-        frame = cvtColor(frame, COLOR_BGR2RGB)
-        frame = Image.fromarray(frame)
-        # Keep an unaltered frame for save frame
-        # (we want to train on the images the camera
-        # originally sees, not the flippes ones)
-        raw_frame = ImageTk.PhotoImage(frame)
-
-        # Flip display frame across y-axis to display "like a mirror"
-        mirror_frame = frame.transpose(Image.FLIP_LEFT_RIGHT)
-        mirror_frame = ImageTk.PhotoImage(mirror_frame)
-
-        # Update video label with new frame
-        self.video.raw_frame = raw_frame
-        self.video.mirror_frame = mirror_frame
-        self.video.configure(image=mirror_frame)
-
-        self.root.after(DEFAULT_FRAME_INTERVAL, self._display_frame)
-
-    def show(self):
-        """Shows the live feed from cam_source."""
-        self._display_frame()
-        self.root.mainloop()
 
 # Module Functions
 
 
-def create_dataset(path: str = DEFAULT_DATASET_PATH):
+def create_dataset(path: str = DEFAULT_DATASET_PATH, cropper=None, encoder: str = DEFAULT_ENCODER,
+                   quality: int = DEFAULT_QUALITY, burst_fps: int = DEFAULT_BURST_FPS,
+                   metrics: Metrics = NULL_METRICS):
     """Creates a dataset for a new user / extends a dataset for existing user by allowing
        the user to save images into a dataset folder to be used for classifier training.
 
@@ -237,11 +627,19 @@ def create_dataset(path: str = DEFAULT_DATASET_PATH):
 
        Controls:
             SPACE: Save current frame of the camera into dataset folder.
+            B (hold): Save frames at burst_fps for as long as the key is held.
             ESC: Quit the dataset application. The same can be achieved by pressing the "X"
                 button on the display window GUI.
 
     Args:
         path: A string representing the path to create the datasets
+        cropper: A roi.FaceCropper to save only the cropped faces of a frame,
+                 or None to save whole frames
+        encoder: One of "png", "jpeg" or "webp" (webp images are only picked up
+                 by training through dataset_cache)
+        quality: The quality (1-100) used by the lossy encoders
+        burst_fps: The number of frames per second saved while the burst key is held
+        metrics: The metrics.Metrics the capture and display loops are timed into
     """
 
     name = input(DATASET_PROMPT)
@@ -257,11 +655,10 @@ def create_dataset(path: str = DEFAULT_DATASET_PATH):
         if not is_extending:
             return
 
-    feed = CamDisplay()
-    # bind saving image to spacebar
-    feed.root.bind("<space>", lambda event: _save_frame(
-        name, dataset_path, ImageTk.getimage(feed.video.raw_frame)))
-    feed.show()
+    # pipeline builds on the capture classes of this module
+    from pipeline import FramePipeline, DisplayStage, SaveStage
 
-    # Release VideoCapture object and destroy opened windows
-    feed.cam_source.close()
+    writer = ImageWriter(encoder, quality, cropper=cropper)
+    # Showing the feed closes the camera and finishes writing once the window is closed
+    FramePipeline([SaveStage(writer, name, dataset_path, burst_fps), DisplayStage()],
+                  ThreadedCamCapture(metrics=metrics), metrics=metrics).show()
@@ -0,0 +1,240 @@
+"""Used to keep a decoded, resized copy of a dataset directory on disk.
+
+tf.keras.utils.image_dataset_from_directory decodes every image again on every
+training run and .cache() then holds the whole dataset in memory. This module
+instead decodes each image once into a flat uint8 file next to the dataset
+directory and memory maps it, so training streams frames from disk and only
+images that are new or changed since the last run are decoded.
+
+Layout of the cache for datasets/ at 320x240:
+
+    datasets_cache/320x240/frames.u8    every frame, row after row
+    datasets_cache/320x240/index.json   class names and the row of every image
+
+    Typical usage example:
+
+    cache = DatasetCache(dataset_dir, img_width, img_height)
+    cache.update()
+    train_ds = cache.dataset("training")
+"""
+import json
+import numpy as np
+import os
+import tensorflow as tf
+import zlib
+
+from PIL import Image
+
+# Image file types picked up from the dataset folders
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp")
+
+# Defaults for DatasetCache class
+DEFAULT_CACHE_SUFFIX = "_cache"
+DEFAULT_VALIDATION_PERCENT = 20
+DEFAULT_SHUFFLE_BUFFER = 1000
+
+FRAMES_FILE_NAME = "frames.u8"
+INDEX_FILE_NAME = "index.json"
+
+# Default error message for DatasetCache class
+SUBSET_ERR_MSG = 'subset must be "training", "validation" or None'
+
+
+def scan_images(dataset_dir: str):
+    """Lists the images in a dataset directory.
+
+    Returns: A dictionary mapping each image path (relative to dataset_dir) to its
+             class name and os.stat result
+    """
+    images = {}
+    for class_name in sorted(os.listdir(dataset_dir)):
+        class_dir = os.path.join(dataset_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        for file_name in sorted(os.listdir(class_dir)):
+            if os.path.splitext(file_name)[1].lower() in IMAGE_EXTENSIONS:
+                images[f"{class_name}/{file_name}"] = (class_name, os.stat(os.path.join(class_dir, file_name)))
+
+    return images
+
+
+def _is_validation(relative_path: str, validation_percent: int):
+    """Puts an image in the validation split by a hash of its path.
+
+    Unlike a seeded shuffle this never moves an existing image to the other split
+    when new images are added to the dataset.
+    """
+    return zlib.crc32(relative_path.encode("utf-8")) % 100 < validation_percent
+
+
+class DatasetCache:
+    """Decoded, resized frames of a dataset directory stored in a memory mapped file.
+
+    Attributes:
+        dataset_dir: The path of the dataset directory (one subfolder per class)
+        cache_dir: The path of the directory the cache files are stored in
+        img_width: The width every frame is resized to
+        img_height: The height every frame is resized to
+        class_names: A list of the class names, sorted like image_dataset_from_directory does
+    """
+
+    def __init__(self, dataset_dir: str, img_width: int, img_height: int, cache_dir: str = None):
+        """Initializes DatasetCache and loads the existing index, if any.
+
+        Args:
+            dataset_dir: The path of the dataset directory (one subfolder per class)
+            img_width: The width every frame is resized to
+            img_height: The height every frame is resized to
+            cache_dir: Where to store the cache, defaults to a folder next to dataset_dir
+        """
+        self.dataset_dir = os.path.normpath(dataset_dir)
+        self.img_width = img_width
+        self.img_height = img_height
+        if cache_dir is None:
+            cache_dir = os.path.join(self.dataset_dir + DEFAULT_CACHE_SUFFIX, f"{img_width}x{img_height}")
+        self.cache_dir = cache_dir
+
+        self._frames_path = os.path.join(cache_dir, FRAMES_FILE_NAME)
+        self._index_path = os.path.join(cache_dir, INDEX_FILE_NAME)
+        self._frame_shape = (img_height, img_width, 3)
+        self._frame_bytes = img_height * img_width * 3
+
+        self.class_names = []
+        self._entries = {}
+        self._rows = 0
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "r") as index_file:
+                index = json.load(index_file)
+            self.class_names = index["class_names"]
+            self._entries = index["entries"]
+            self._rows = index["rows"]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _decode(self, relative_path: str):
+        """Decodes an image of the dataset into a frame of the cache size."""
+        with Image.open(os.path.join(self.dataset_dir, relative_path)) as image:
+            image = image.convert("RGB").resize((self.img_width, self.img_height), Image.BILINEAR)
+            return np.asarray(image, dtype=np.uint8)
+
+    def update(self):
+        """Brings the cache in line with the dataset directory.
+
+        Only images that are new or whose size or modification time changed are
+        decoded. Rows of removed or changed images are reclaimed once they make up
+        more than half of the frames file.
+
+        Returns: A tuple of the number of images added and removed
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        images = scan_images(self.dataset_dir)
+
+        removed = [path for path in self._entries if path not in images]
+        for path in removed:
+            del self._entries[path]
+
+        changed = [path for path, (_, stat) in images.items()
+                   if path not in self._entries
+                   or self._entries[path]["mtime"] != stat.st_mtime
+                   or self._entries[path]["size"] != stat.st_size]
+
+        with open(self._frames_path, "ab") as frames_file:
+            # Drop frames written by a run that crashed before saving its index
+            frames_file.truncate(self._rows * self._frame_bytes)
+            for path in changed:
+                class_name, stat = images[path]
+                frames_file.write(self._decode(path).tobytes())
+                self._entries[path] = {"row": self._rows, "label": class_name,
+                                       "mtime": stat.st_mtime, "size": stat.st_size}
+                self._rows += 1
+
+        self.class_names = sorted({entry["label"] for entry in self._entries.values()})
+
+        if self._rows > 2 * len(self._entries):
+            self._compact()
+        self._save_index()
+
+        return len(changed), len(removed)
+
+    def _compact(self):
+        """Rewrites the frames file without the rows no image points to anymore."""
+        frames = self.frames()
+        compact_path = self._frames_path + ".tmp"
+        with open(compact_path, "wb") as compact_file:
+            for row, entry in enumerate(self._entries.values()):
+                compact_file.write(frames[entry["row"]].tobytes())
+                entry["row"] = row
+        del frames
+
+        os.replace(compact_path, self._frames_path)
+        self._rows = len(self._entries)
+
+    def _save_index(self):
+        index = {"class_names": self.class_names, "rows": self._rows, "entries": self._entries}
+        # Write then rename so a crash never leaves a half written index behind
+        with open(self._index_path + ".tmp", "w") as index_file:
+            json.dump(index, index_file)
+        os.replace(self._index_path + ".tmp", self._index_path)
+
+    def frames(self):
+        """Returns: A read only memory map of every frame row, shape (rows, height, width, 3)"""
+        if not self._rows:
+            return np.empty((0, *self._frame_shape), dtype=np.uint8)
+        return np.memmap(self._frames_path, dtype=np.uint8, mode="r", shape=(self._rows, *self._frame_shape))
+
+    def split(self, subset: str = None, validation_percent: int = DEFAULT_VALIDATION_PERCENT):
+        """Gets the frame rows and labels of a split.
+
+        Args:
+            subset: "training", "validation" or None for every image
+            validation_percent: The percentage of images that go in the validation split
+
+        Returns: A tuple of an array of frame rows and an array of integer labels
+        """
+        if subset not in ("training", "validation", None):
+            raise ValueError(SUBSET_ERR_MSG)
+
+        label_of = {name: i for i, name in enumerate(self.class_names)}
+        rows, labels = [], []
+        for path, entry in sorted(self._entries.items()):
+            if subset is not None and _is_validation(path, validation_percent) != (subset == "validation"):
+                continue
+            rows.append(entry["row"])
+            labels.append(label_of[entry["label"]])
+
+        return np.array(rows, dtype=np.int64), np.array(labels, dtype=np.int32)
+
+    def dataset(self, subset: str = None, batch_size: int = 32,
+                validation_percent: int = DEFAULT_VALIDATION_PERCENT, shuffle: bool = None):
+        """Creates a tf.data.Dataset that streams a split from the memory mapped frames.
+
+        Only the frames of the batch being built are read from disk, so memory use
+        does not grow with the dataset.
+
+        Args:
+            subset: "training", "validation" or None for every image
+            batch_size: The number of images per batch
+            validation_percent: The percentage of images that go in the validation split
+            shuffle: Whether to reshuffle every epoch, defaults to True for training only
+
+        Returns: A tf.data.Dataset of (float32 images, int32 labels) batches
+        """
+        rows, labels = self.split(subset, validation_percent)
+        frames = self.frames()
+        if shuffle is None:
+            shuffle = subset == "training"
+
+        def load_batch(batch_rows):
+            return np.asarray(frames[batch_rows])
+
+        def to_images(batch_rows, batch_labels):
+            images = tf.numpy_function(load_batch, [batch_rows], tf.uint8)
+            images.set_shape((None, *self._frame_shape))
+            return tf.cast(images, tf.float32), batch_labels
+
+        ds = tf.data.Dataset.from_tensor_slices((rows, labels))
+        if shuffle:
+            ds = ds.shuffle(min(len(rows), DEFAULT_SHUFFLE_BUFFER) or 1, reshuffle_each_iteration=True)
+
+        return ds.batch(batch_size).map(to_images, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
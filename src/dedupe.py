@@ -0,0 +1,218 @@
+"""Used to keep near-duplicate frames out of the datasets.
+
+When someone stands still in front of the camera, collection saves dozens of
+frames that are all but identical. They make every epoch slower without
+teaching the model anything. This module gives every image a 64 bit difference
+hash (dHash) and keeps a per dataset folder index of them, so a new frame can
+be rejected at save time if it is within a few bits of one already in the folder.
+
+The index is stored in the dataset folder itself and loaded once per session.
+Every hash is saved with the modification time and size of its image, so an
+image replaced under the same name is hashed again instead of being judged by
+the hash of the image it replaced.
+Lookups split each hash into bands: two hashes within max_distance bits of each
+other must share at least one band exactly (pigeonhole), so only the images in
+matching band buckets are compared instead of the whole folder.
+
+    Typical usage example:
+
+    index = HashIndex(dataset_path)
+    if index.find_duplicate(dhash(frame)) is None:
+        save(frame)
+"""
+import json
+import numpy as np
+import os
+
+from cv2 import cvtColor, resize, COLOR_RGB2GRAY, INTER_AREA
+from PIL import Image
+
+# Defaults for HashIndex class
+DEFAULT_MAX_DISTANCE = 4
+INDEX_FILE_NAME = ".phash_index.json"
+HASH_BITS = 64
+
+# Image file types that are hashed when deduping a folder
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp")
+
+# Output format string for dedupe_dataset
+DEDUPE_SUMMARY_MSG = "{folder}: removed {removed} of {total} images"
+
+
+def dhash(image: np.ndarray):
+    """Computes the 64 bit difference hash of an RGB or grayscale image.
+
+    The image is shrunk to 9x8 grayscale pixels and each bit records whether a pixel
+    is brighter than its right neighbour, which survives resizing, compression and
+    small lighting changes.
+
+    Returns: The hash as a Python integer
+    """
+    if image.ndim == 3:
+        image = cvtColor(image, COLOR_RGB2GRAY)
+    small = resize(image, (9, 8), interpolation=INTER_AREA).astype(np.int16)
+
+    bits = np.packbits((small[:, 1:] > small[:, :-1]).ravel())
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def hamming_distance(hash_a: int, hash_b: int):
+    """Returns: The number of bits that differ between two hashes"""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+class HashIndex:
+    """Index of the dHashes of the images in one dataset folder.
+
+    Attributes:
+        dataset_path: The path of the dataset folder
+        max_distance: The largest hamming distance that still counts as a duplicate
+    """
+
+    def __init__(self, dataset_path: str, max_distance: int = DEFAULT_MAX_DISTANCE, load: bool = True):
+        """Initializes HashIndex and loads the index saved in dataset_path, if any.
+
+        Args:
+            dataset_path: The path of the dataset folder
+            max_distance: The largest hamming distance that still counts as a duplicate
+            load: Whether to load the saved index or start out empty
+        """
+        self.dataset_path = dataset_path
+        self.max_distance = max_distance
+
+        # Split the hash into max_distance + 1 bands so a match within
+        # max_distance bits always shares at least one whole band
+        band_count = max_distance + 1
+        band_bits = HASH_BITS // band_count
+        self._bands = [(i * band_bits, band_bits if i < band_count - 1 else HASH_BITS - i * band_bits)
+                       for i in range(band_count)]
+
+        self._hashes = {}
+        # (mtime_ns, size) of every indexed image when it was hashed
+        self._stats = {}
+        self._buckets = [{} for _ in self._bands]
+
+        index_path = os.path.join(dataset_path, INDEX_FILE_NAME)
+        if load and os.path.exists(index_path):
+            with open(index_path, "r") as index_file:
+                saved = json.load(index_file)
+            # Images deleted or replaced by hand since the index was saved must not block new frames
+            for file_name, entry in saved.items():
+                # Indexes saved before stats were kept hold only the hash, their images are hashed again
+                if isinstance(entry, dict) and self._stat(file_name) == (entry["mtime_ns"], entry["size"]):
+                    self.add(file_name, int(entry["hash"], 16))
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, file_name: str):
+        return file_name in self._hashes
+
+    def _stat(self, file_name: str):
+        """Returns: A tuple of the (mtime_ns, size) of an image in the folder, or None if it does not exist"""
+        try:
+            stat = os.stat(os.path.join(self.dataset_path, file_name))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _band_keys(self, image_hash: int):
+        return [(image_hash >> shift) & ((1 << bits) - 1) for shift, bits in self._bands]
+
+    def add(self, file_name: str, image_hash: int):
+        """Adds the hash of an image in the folder to the index."""
+        if file_name in self._hashes:
+            self.remove(file_name)
+
+        self._hashes[file_name] = image_hash
+        self._stats[file_name] = self._stat(file_name)
+        for bucket, key in zip(self._buckets, self._band_keys(image_hash)):
+            bucket.setdefault(key, set()).add(file_name)
+
+    def remove(self, file_name: str):
+        """Removes an image from the index, if it is in it."""
+        image_hash = self._hashes.pop(file_name, None)
+        if image_hash is None:
+            return
+        del self._stats[file_name]
+
+        for bucket, key in zip(self._buckets, self._band_keys(image_hash)):
+            bucket[key].discard(file_name)
+            if not bucket[key]:
+                del bucket[key]
+
+    def get(self, file_name: str):
+        """Returns: The hash of an image in the index, or None if it is not in it or changed since it was hashed"""
+        if file_name not in self._hashes or self._stat(file_name) != self._stats[file_name]:
+            return None
+        return self._hashes[file_name]
+
+    def find_duplicate(self, image_hash: int):
+        """Looks for an image in the folder within max_distance bits of image_hash.
+
+        Returns: The file name of the duplicate, or None if there is none
+        """
+        for bucket, key in zip(self._buckets, self._band_keys(image_hash)):
+            for file_name in bucket.get(key, ()):
+                if hamming_distance(self._hashes[file_name], image_hash) <= self.max_distance:
+                    return file_name
+
+        return None
+
+    def save(self):
+        """Writes the index into the dataset folder."""
+        index_path = os.path.join(self.dataset_path, INDEX_FILE_NAME)
+        with open(index_path + ".tmp", "w") as index_file:
+            json.dump({file_name: {"hash": f"{image_hash:016x}", "mtime_ns": self._stats[file_name][0],
+                                   "size": self._stats[file_name][1]}
+                       for file_name, image_hash in self._hashes.items() if self._stats[file_name] is not None},
+                      index_file)
+        os.replace(index_path + ".tmp", index_path)
+
+
+def _hash_file(path: str):
+    with Image.open(path) as image:
+        return dhash(np.asarray(image.convert("RGB")))
+
+
+def dedupe_dataset(dataset_path: str, max_distance: int = DEFAULT_MAX_DISTANCE):
+    """Deletes the near-duplicate images of a dataset folder and rebuilds its hash index.
+
+    Images are kept in the order they were saved in, so the first frame of a run of
+    duplicates survives. Hashes already in the saved index are reused for images that
+    have not changed since they were hashed.
+
+    Returns: The number of images removed
+    """
+    known = HashIndex(dataset_path, max_distance)
+    index = HashIndex(dataset_path, max_distance, load=False)
+
+    file_names = sorted((file_name for file_name in os.listdir(dataset_path)
+                         if os.path.splitext(file_name)[1].lower() in IMAGE_EXTENSIONS),
+                        key=lambda file_name: (os.path.getmtime(os.path.join(dataset_path, file_name)), file_name))
+    removed = 0
+    for file_name in file_names:
+        path = os.path.join(dataset_path, file_name)
+        image_hash = known.get(file_name)
+        if image_hash is None:
+            image_hash = _hash_file(path)
+
+        if index.find_duplicate(image_hash) is not None:
+            os.remove(path)
+            removed += 1
+        else:
+            index.add(file_name, image_hash)
+
+    index.save()
+    print(DEDUPE_SUMMARY_MSG.format(folder=os.path.basename(dataset_path), removed=removed, total=len(file_names)))
+
+    return removed
+
+
+def dedupe_datasets(path: str, max_distance: int = DEFAULT_MAX_DISTANCE):
+    """Runs dedupe_dataset on every dataset folder in path.
+
+    Returns: The number of images removed
+    """
+    return sum(dedupe_dataset(os.path.join(path, folder), max_distance)
+               for folder in sorted(os.listdir(path)) if os.path.isdir(os.path.join(path, folder)))
@@ -1,112 +1,668 @@
-"""
+"""Used to recognize roommates in a camera feed with a trained model.
 
+detect shows the live feed in a window (see pipeline.py) and puts the latest
+prediction in the window title, detect_headless runs without a window on a
+camera, a video file or a recording and prints every prediction. Either way
+the model runs on an InferenceWorker thread so reading frames never waits on it.
 
- TODO FIX ALL OF THIS FUCKING GARBAGE, SUPER REPEATED CODE.
+A cascade (a model path ending in .cascade.json, see backends.CascadeBackend)
+runs a small gatekeeper model on every frame and the full model only on the
+frames the gatekeeper is unsure about.
 
+In the window an AdaptiveScheduler paces the display to a target frame rate and
+offers the model only as many frames as it can keep up with, so a slow model or
+a busy machine skips detections instead of stuttering the display.
 
-"""
+    Typical usage example:
 
+    detect(model_path, motion_gate=MotionGate())
+"""
+import math
 import numpy as np
 import os
-import tensorflow as tf
+import threading
+import time
+
+from backends import load_backend, DEFAULT_NUM_THREADS, SAVED_MODEL_SUFFIX
+from collections import deque
+from datetime import datetime
+from metrics import NULL_METRICS, Metrics
+from cv2 import cvtColor, resize, COLOR_BGR2RGB
+from data_collect import CamCapture, ThreadedCamCapture, DEFAULT_DATASET_PATH
+from motion import MotionGate
+from pipeline import FramePipeline, DisplayStage
+from recording import ReplayCapture, is_recording
+from roi import FaceCropper
+
+# The model make_and_train_model saves and the lean export it saves next to it, see cnn.export_inference_model
+DEFAULT_H5_MODEL_PATH = os.path.join(os.getcwd(), "model", "cat_dog_model.h5")
+DEFAULT_EXPORTED_MODEL_PATH = os.path.join(os.getcwd(), "model", f"cat_dog_model{SAVED_MODEL_SUFFIX}")
+
+
+def default_model_path():
+    """Returns: The default model's lean export if it has been exported, else the default .h5 model"""
+    if os.path.isdir(DEFAULT_EXPORTED_MODEL_PATH):
+        return DEFAULT_EXPORTED_MODEL_PATH
+    return DEFAULT_H5_MODEL_PATH
+
+# Format requested from cameras, compressed frames let USB cameras keep up at higher resolutions
+DEFAULT_CAPTURE_FOURCC = "MJPG"
+
+# Label reported when face cropping is on and no face is in the frame
+NO_FACE_LABEL = "nobody"
+
+# Defaults for InferenceWorker class
+DEFAULT_INFERENCE_STRIDE = 1
+DEFAULT_FPS_WINDOW = 30
+
+# Defaults for AdaptiveScheduler class
+DEFAULT_TARGET_FPS = 30
+DEFAULT_MAX_DETECTION_LATENCY = 0.5
+DEFAULT_MAX_STRIDE = 30
+DEFAULT_COST_SMOOTHING = 0.2
+# Frames between two back off (or recovery) steps, gives the averaged costs time to follow a step
+DEFAULT_ADJUST_FRAMES = 10
+# The display has room to take back skipped detections once its work fits in this share of a frame
+DISPLAY_HEADROOM = 0.8
+# Shortest delay between frames in ms, leaves Tk time to handle its events
+MIN_FRAME_DELAY = 1
+
+# Output format strings for detect_headless
+HEADLESS_PREDICTION_MSG = "{time} frame {index}: {class_name} ({confidence:.2f}%)"
+HEADLESS_SUMMARY_MSG = """Processed {frames} frames in {seconds:.2f}s ({fps:.2f} frames/sec)
+Per-frame latency: p50 {p50:.2f}ms, p99 {p99:.2f}ms
+Skipped inference on {skipped} static frames"""
+
+
+def _load_class_names(dataset_path: str = DEFAULT_DATASET_PATH):
+    """Gets the class names a model trained on dataset_path predicts.
+
+    tf.keras.utils.image_dataset_from_directory labels classes by the sorted
+    names of the dataset subfolders, so the same order is used here.
+
+    Returns: A list of the class name strings
+    """
+    return sorted(entry for entry in os.listdir(dataset_path)
+                  if os.path.isdir(os.path.join(dataset_path, entry)))
+
+
+def _resolve_class_names(backend, class_names=None):
+    """Picks the class names for backend.
+
+    Returns: class_names if given, else the backend's own class names (embedding
+             indexes know who is enrolled), else the dataset folder names
+    """
+    if class_names is not None:
+        return class_names
+    if getattr(backend, "class_names", None) is not None:
+        return backend.class_names
+    return _load_class_names()
+
+
+def _watch_backend(backend, metrics: Metrics):
+    """Reports how many frames a cascade's full model ran on to metrics."""
+    if hasattr(backend, "escalated"):
+        metrics.gauge("full_model_frames", lambda: backend.escalated)
+
+
+def _open_capture(backend, source=0, cropper: FaceCropper = None, metrics: Metrics = NULL_METRICS):
+    """Opens a ThreadedCamCapture on source that delivers frames close to the size the model takes.
+
+    Cameras are asked for the smallest standard resolution that holds the model's
+    input in the camera's own aspect ratio (see data_collect.capture_size), since
+    few cameras offer the square or tiny sizes models take, and FrameClassifier
+    only has to shrink those frames a little. Faces are cropped from full
+    resolution frames, so with a cropper the camera keeps its default resolution.
+    Video files are read as they are, recordings (see recording.py) are replayed
+    as fast as they are read.
+
+    Returns: The ThreadedCamCapture, or a recording.ReplayCapture for recordings
+    """
+    if is_recording(source):
+        return ReplayCapture(source)
+
+    is_camera = isinstance(source, int)
+    settings = {}
+    if is_camera and cropper is None:
+        height, width = backend.input_shape[:2]
+        settings = {"min_size": (width, height), "fourcc": DEFAULT_CAPTURE_FOURCC}
+
+    # Video files can wait for the consumer, live cameras can not
+    return ThreadedCamCapture(source, drop_when_full=is_camera, metrics=metrics, **settings)
+
 
-from cv2 import cvtColor, COLOR_BGR2RGB
-from data_collect import CamCapture, DEFAULT_FRAME_INTERVAL, DISPLAY_FRAME_ERR_MSG
-from PIL import ImageTk, Image
-from tkinter import Tk, Label
+class FpsCounter:
+    """Measures frames per second over a rolling window of frame timestamps."""
 
+    def __init__(self, window: int = DEFAULT_FPS_WINDOW):
+        self._times = deque(maxlen=window)
 
+    def tick(self):
+        """Records that a frame happened now."""
+        self._times.append(time.perf_counter())
 
-class DetectCamDisplay:
-    """Class for displaying camera feed into a tkinter window.
+    @property
+    def fps(self):
+        if len(self._times) < 2:
+            return 0.0
+        return (len(self._times) - 1) / (self._times[-1] - self._times[0])
 
 
+class FrameClassifier:
+    """Classifies single camera frames with an inference backend.
+
+    With a FaceCropper the faces in a frame are classified instead of the whole
+    frame, all faces of a frame going through the backend in one batch.
+
+    Attributes:
+        backend: The backend (see backends.py) that runs the model
+        class_names: A list of the class names the model predicts
+        cropper: The FaceCropper used to find faces, or None to classify whole frames
+    """
+
+    def __init__(self, backend, class_names, cropper: FaceCropper = None):
+        """Initializes FrameClassifier with a backend and its class names."""
+        self.backend = backend
+        self.class_names = class_names
+        self.cropper = cropper
+
+        # Height and width the model was built for
+        self._input_size = tuple(backend.input_shape[:2])
+
+    def preprocess(self, frame: np.ndarray):
+        """Converts a BGR camera frame into the RGB input the model expects."""
+        frame = cvtColor(frame, COLOR_BGR2RGB)
+        if self.cropper is not None:
+            # Faces are cropped from the full resolution frame
+            return frame
+        return self._fit_input(frame)
+
+    def _fit_input(self, frame: np.ndarray):
+        if frame.shape[:2] != self._input_size:
+            frame = resize(frame, (self._input_size[1], self._input_size[0]))
+        return frame
+
+    def classify_batch(self, frames: np.ndarray):
+        """Classifies a batch of model sized RGB frames in one backend call.
+
+        Returns: A list of (class name, confidence) tuples
+        """
+        scores = self.backend.predict(frames)
+        return [(self.class_names[int(np.argmax(score))], float(np.max(score))) for score in scores]
+
+    def classify(self, frame: np.ndarray):
+        """Classifies a single RGB frame.
+
+        Returns: A tuple of the predicted class name and its confidence, for the most
+                 confident face when face cropping is on
+        """
+        return self.classify_frames([frame])[0]
+
+    def classify_frames(self, frames):
+        """Classifies several RGB frames (e.g. from different cameras) in one backend call.
+
+        With face cropping the faces of every frame go into the same batch and the
+        results are routed back to the frame they were cropped from.
+
+        Returns: A list with a (class name, confidence) tuple per frame, for the most
+                 confident face of each frame when face cropping is on
+        """
+        if not len(frames):
+            return []
+
+        if self.cropper is None:
+            return self.classify_batch(np.stack([self._fit_input(frame) for frame in frames]))
+
+        faces_per_frame = [self.cropper.crop(frame) for frame in frames]
+        faces = [self._fit_input(face) for frame_faces in faces_per_frame for face in frame_faces]
+        if not faces:
+            return [(NO_FACE_LABEL, 0.0)] * len(frames)
+
+        face_results = iter(self.classify_batch(np.stack(faces)))
+        results = []
+        for frame_faces in faces_per_frame:
+            frame_results = [next(face_results) for _ in range(len(frame_faces))]
+            results.append(max(frame_results, key=lambda result: result[1]) if frame_results
+                           else (NO_FACE_LABEL, 0.0))
+
+        return results
+
+
+class AdaptiveScheduler:
+    """Paces a display loop and decides which of its frames the model runs on.
+
+    The display loop reports how long the work of each frame (capture, stages)
+    took and gets back the delay until the next frame, so frames start
+    1/target_fps apart however long they take. The InferenceWorker reports how
+    long each model call took. From exponentially weighted averages of both
+    costs the inference stride is picked: the model is offered a frame about as
+    often as it can finish one, which keeps detections at most max_latency
+    behind the display while the machine keeps up.
+
+    When the display falls behind its frame budget anyway, the stride is
+    raised step by step, so the machine drops detections rather than displayed
+    frames, and lowered again once the display has headroom.
+
     Attributes:
-        cam_source: The CamCapture object used to get video feed from
-        root: The root tkinter window used for display
-        video: A tkinter Label class used to show the image within root
+        target_fps: The display frame rate to hold
+        max_latency: The longest time in seconds from a frame being shown to it being detected on
+        max_stride: The largest stride, at least one frame in max_stride is detected on
+        stride: An integer, the model is offered every stride-th frame
+        frame_cost: The averaged seconds of work per displayed frame
+        inference_cost: The averaged seconds per model call
+        frames: An integer count of displayed frames
+        offered: An integer count of frames offered to the model
+        skipped: An integer count of frames not offered to the model
+        late_frames: An integer count of frames whose work took longer than the frame budget
+        over_latency: An integer count of frames displayed while the expected detection
+                      latency was above max_latency
+        stride_changes: An integer count of stride changes
     """
 
-    def _centered_tk(self, width_res: int, height_res: int):
-        """A helper function that creates a screen-centered
-           tkinter window with the given resolution.
+    def __init__(self, target_fps: float = DEFAULT_TARGET_FPS, max_latency: float = DEFAULT_MAX_DETECTION_LATENCY,
+                 max_stride: int = DEFAULT_MAX_STRIDE, smoothing: float = DEFAULT_COST_SMOOTHING,
+                 metrics: Metrics = NULL_METRICS):
+        """Initializes AdaptiveScheduler.
+
+        Args:
+            target_fps: The display frame rate to hold
+            max_latency: The longest time in seconds from a frame being shown to it being detected on
+            max_stride: The largest stride, at least one frame in max_stride is detected on
+            smoothing: The weight of the newest measurement in the averaged costs, between 0 and 1
+            metrics: The metrics.Metrics the stride and the counters are reported to
+        """
+        self.target_fps = target_fps
+        self.max_latency = max_latency
+        self.max_stride = max(1, max_stride)
+        self.stride = 1
+        self.frame_cost = 0.0
+        self.inference_cost = 0.0
+        self.frames = 0
+        self.offered = 0
+        self.skipped = 0
+        self.late_frames = 0
+        self.over_latency = 0
+        self.stride_changes = 0
+
+        self._smoothing = smoothing
+        self._backoff = 0
+        # The first frame is always offered
+        self._since_offer = self.max_stride
+
+        metrics.gauge("inference_stride", lambda: self.stride)
+        metrics.gauge("skipped_inferences", lambda: self.skipped)
+        metrics.gauge("late_frames", lambda: self.late_frames)
+        metrics.gauge("over_latency_frames", lambda: self.over_latency)
+
+    @property
+    def frame_budget(self):
+        """The seconds between the starts of two frames at the target frame rate."""
+        return 1 / self.target_fps
+
+    @property
+    def latency(self):
+        """The expected seconds from a frame being shown to the model's result on it, at most."""
+        return self.stride * max(self.frame_budget, self.frame_cost) + self.inference_cost
+
+    def _smooth(self, average: float, seconds: float):
+        return seconds if average == 0.0 else average + self._smoothing * (seconds - average)
+
+    def frame_done(self, seconds: float):
+        """Records the work time of a displayed frame and adjusts the stride.
 
         Args:
-            win: The tkinter window to center
-            width_res: The resolution of the width
-            height_res: The resolution of the height
+            seconds: The seconds the frame's capture and stages took
+
+        Returns: The milliseconds to wait before starting the next frame
         """
+        self.frame_cost = self._smooth(self.frame_cost, seconds)
+        self.frames += 1
+        if seconds > self.frame_budget:
+            self.late_frames += 1
 
-        win = Tk()
-        # @TODO Make window resizable later
-        win.resizable(width=False, height=False)
-        pos_horz = int(win.winfo_screenwidth()/2 - width_res/2)
-        pos_vert = int(win.winfo_screenheight()/2 - height_res/2)
-        win.geometry(f"{width_res}x{height_res}+{pos_horz}+{pos_vert}")
+        if self.frames % DEFAULT_ADJUST_FRAMES == 0:
+            self._adjust_backoff()
+        self._update_stride()
+        if self.latency > self.max_latency:
+            self.over_latency += 1
+
+        return max(MIN_FRAME_DELAY, int(round((self.frame_budget - self.frame_cost) * 1000)))
+
+    def inference_done(self, seconds: float):
+        """Records the seconds a model call took, called from the inference thread."""
+        self.inference_cost = self._smooth(self.inference_cost, seconds)
+
+    def _adjust_backoff(self):
+        if self.frame_cost > self.frame_budget:
+            # Inference competes with the display for the CPU, give the display priority
+            if self._required_stride() + self._backoff < self.max_stride:
+                self._backoff += 1
+        elif self._backoff and (self.frame_cost < self.frame_budget * DISPLAY_HEADROOM
+                                or self.latency > self.max_latency):
+            self._backoff -= 1
+
+    def _required_stride(self):
+        """Returns: The stride that offers the model a frame about as often as it finishes one"""
+        frame_interval = max(self.frame_budget, self.frame_cost)
+        # Rounded first, so a cost of exactly n frames is not pushed to n + 1 by float error
+        return max(1, math.ceil(round(self.inference_cost / frame_interval, 3)))
+
+    def _update_stride(self):
+        stride = min(self.max_stride, self._required_stride() + self._backoff)
+        if stride != self.stride:
+            self.stride = stride
+            self.stride_changes += 1
+
+    def should_infer(self):
+        """Called once per displayed frame.
+
+        Returns: A boolean representing if the model should run on this frame
+        """
+        self._since_offer += 1
+        if self._since_offer < self.stride:
+            self.skipped += 1
+            return False
 
-        return win
+        self._since_offer = 0
+        self.offered += 1
+        return True
 
-    def __init__(self, model_path, cam_source: CamCapture = CamCapture(), display_title: str = "Camera Feed"):
-        """Initializes CamDisplay with a camera source and window display title.
+    def counters(self):
+        """Returns: A dictionary of the scheduler's current decisions and counters"""
+        return {"stride": self.stride, "frame_cost_ms": self.frame_cost * 1000,
+                "inference_cost_ms": self.inference_cost * 1000, "latency_ms": self.latency * 1000,
+                "frames": self.frames, "offered": self.offered, "skipped": self.skipped,
+                "late_frames": self.late_frames, "over_latency": self.over_latency,
+                "stride_changes": self.stride_changes}
+
+
+class InferenceWorker:
+    """Runs a classification model over live frames on a background thread.
+
+    Frames are handed over through a single slot: if the model is still busy when a
+    new frame is submitted, the waiting frame is replaced. Predictions therefore lag
+    the display by at most one frame and the caller never blocks on the model.
+
+    Attributes:
+        classifier: The FrameClassifier used for classification
+        stride: An integer, only every stride-th submitted frame is inferred
+        motion_gate: The MotionGate that skips static frames, or None to infer every frame
+        player: The playback.ThemeSongPlayer triggered with every prediction, or None
+        metrics: The metrics.Metrics the motion gate and the model are timed into
+        scheduler: The AdaptiveScheduler told how long every model call took, or None
+        latest_result: A tuple of (frame index, class name, confidence) or None
+        inferences: An integer count of frames the model ran on
+        replaced_frames: An integer count of frames replaced before the model got to them
+        fps: An FpsCounter for completed inferences
+    """
+
+    def __init__(self, classifier: FrameClassifier, stride: int = DEFAULT_INFERENCE_STRIDE,
+                 motion_gate: MotionGate = None, player=None, metrics: Metrics = NULL_METRICS,
+                 scheduler: AdaptiveScheduler = None):
+        """Initializes InferenceWorker and starts its thread.
 
         Args:
-            cam_source: The CamCapture object to used to get video feed from
-            display_title: The title used to name the tkinter display window
+            classifier: The FrameClassifier used for classification
+            stride: An integer, only every stride-th submitted frame is inferred
+            motion_gate: The MotionGate that skips static frames, or None to infer every frame
+            player: The playback.ThemeSongPlayer triggered with every prediction, or None
+            metrics: The metrics.Metrics the motion gate and the model are timed into
+            scheduler: The AdaptiveScheduler told how long every model call took, or None
         """
+        self.classifier = classifier
+        self.stride = max(1, stride)
+        self.motion_gate = motion_gate
+        self.player = player
+        self.metrics = metrics
+        self.scheduler = scheduler
+        self.latest_result = None
+        self.inferences = 0
+        self.replaced_frames = 0
+        self.fps = FpsCounter()
 
-        self.cam_source = cam_source
+        metrics.gauge("replaced_frames", lambda: self.replaced_frames)
+        if motion_gate is not None:
+            metrics.gauge("static_frames", lambda: motion_gate.skipped)
 
-        # Set up tk display
-        self.root = self._centered_tk(
-            self.cam_source.width, self.cam_source.height)
-        self.root.title(display_title)
-        self.root.bind('<Escape>', lambda event: self.root.quit())
-        self.video = Label(self.root)
-        self.video.pack()
+        self._frame_index = 0
+        self._pending = None
+        self._running = True
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
 
-        # Tensorflow
-        self.model = tf.keras.models.load_model(model_path)
-        self.classnames = ["cat", "dog"]
+    def submit(self, frame: np.ndarray):
+        """Offers an RGB frame for inference without waiting on the model.
 
-    def _display_frame(self):
-        ret, frame = self.cam_source.capture.read()
-        if not ret:
-            raise RuntimeError(DISPLAY_FRAME_ERR_MSG)
+        Returns: A boolean representing if the frame was queued for inference
+        """
+        self._frame_index += 1
+        if (self._frame_index - 1) % self.stride:
+            return False
 
-        # Convert cv2 frame to Image
-        frame = cvtColor(frame, COLOR_BGR2RGB)
-        frame = Image.fromarray(frame)
-        print(f'frame size: {frame.size}')
-        self.video.frame_image = frame
-
-        # Flip display frame across y-axis to display "like a mirror", covert to ImageTk for display
-        mirror_frame = frame.transpose(Image.FLIP_LEFT_RIGHT)
-        mirror_frame = ImageTk.PhotoImage(mirror_frame)
-
-        # Update video label with new frame
-        self.video.mirror_frame = mirror_frame
-        self.video.configure(image=mirror_frame)
-
-        self.root.after(DEFAULT_FRAME_INTERVAL, self._display_frame)
-
-    def show(self):
-        """Shows the live feed from cam_source."""
-        self._display_frame()
-
-        img_arr = tf.keras.preprocessing.image.img_to_array(self.video.frame_image)
-        img_arr = tf.expand_dims(img_arr, 0)
-        predictions = self.model.predict(img_arr)
-        score = tf.nn.softmax(predictions[0])
-        print(
-            "This image most likely belongs to {} with a {:.2f} percent confidence."
-            .format(self.class_names[np.argmax(score)], 100 * np.max(score))
-        )
-
-        self.root.mainloop()
-    
-def detect():
-    model_path = os.path.join(os.getcwd(), "model", "cat_dog_model.h5")
-    display = DetectCamDisplay(model_path)
-    display.show()
-
-# (None, 240, 340, 3), found shape=(None, 240, 320, 3)
\ No newline at end of file
+        with self._condition:
+            if self._pending is not None:
+                self.replaced_frames += 1
+            self._pending = (self._frame_index, frame)
+            self._condition.notify()
+
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or not self._running)
+                if not self._running:
+                    return
+                index, frame = self._pending
+                self._pending = None
+
+            if self.motion_gate is not None:
+                with self.metrics.time("motion"):
+                    moving = self.motion_gate.should_infer(frame)
+                if not moving:
+                    continue
+
+            start = time.perf_counter()
+            with self.metrics.time("inference"):
+                class_name, confidence = self.classifier.classify(frame)
+            if self.scheduler is not None:
+                self.scheduler.inference_done(time.perf_counter() - start)
+            self.metrics.tick("inference")
+            self.latest_result = (index, class_name, confidence)
+            if self.player is not None:
+                self.player.trigger(class_name, confidence)
+            self.inferences += 1
+            self.fps.tick()
+
+    def close(self):
+        """Stops the inference thread."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+
+
+class InferenceStage:
+    """Pipeline stage (see pipeline.py) that classifies frames and shows the result in the window title.
+
+    Frames are handed to an InferenceWorker, so the display never waits on the model.
+    When the worker has an AdaptiveScheduler, only the frames it picks are handed over.
+
+    Attributes:
+        inference: The InferenceWorker frames are submitted to
+        fps: An FpsCounter for displayed frames
+    """
+
+    name = "detect"
+
+    def __init__(self, inference: InferenceWorker):
+        self.inference = inference
+        self.fps = FpsCounter()
+        self._root = None
+        self._display_title = None
+        self._shown_result = None
+
+    def attach(self, pipeline):
+        self._root = pipeline.root
+        self._display_title = pipeline.display_title
+
+    def process(self, frame):
+        scheduler = self.inference.scheduler
+        if scheduler is None or scheduler.should_infer():
+            self.inference.submit(frame.rgb)
+        self.fps.tick()
+        self._show_result()
+
+    def _show_result(self):
+        """Puts the newest prediction and frame rates in the window title."""
+        result = self.inference.latest_result
+        if result is None or result is self._shown_result:
+            return
+
+        self._shown_result = result
+        _, class_name, confidence = result
+        title = (f"{self._display_title} - {class_name} ({100 * confidence:.2f}%) | "
+                 f"display {self.fps.fps:.1f} fps, detect {self.inference.fps.fps:.1f} fps")
+        if self.inference.motion_gate is not None:
+            title += f", skipped {self.inference.motion_gate.skipped}"
+        if self.inference.scheduler is not None:
+            title += f", stride {self.inference.scheduler.stride}"
+        self._root.title(title)
+
+    def close(self):
+        """Stops the inference thread."""
+        self.inference.close()
+
+
+def detect(model_path: str = None, motion_gate: MotionGate = None, cropper: FaceCropper = None,
+           cam_source: CamCapture = None, class_names=None, inference_stride: int = DEFAULT_INFERENCE_STRIDE,
+           num_threads: int = DEFAULT_NUM_THREADS, player=None, metrics: Metrics = NULL_METRICS,
+           target_fps: float = DEFAULT_TARGET_FPS, max_latency: float = DEFAULT_MAX_DETECTION_LATENCY):
+    """Shows a camera's live feed in a window while detecting on it.
+
+    An AdaptiveScheduler holds the display at target_fps (or the camera's frame rate
+    if that is lower) and picks the frames the model runs on.
+
+    Args:
+        model_path: The model used for detection, any model backends.load_backend opens: a SavedModel
+                    folder (the lean export), a tf.keras .h5 model, a .tflite model, a .npz embedding
+                    index, a .cascade.json cascade or an http:// server.py URL, None for default_model_path
+        motion_gate: The MotionGate that skips static frames, or None to infer every frame
+        cropper: The FaceCropper used to classify faces, or None to classify whole frames
+        cam_source: The CamCapture object to used to get video feed from, defaults to the
+                    default camera capturing at the smallest standard resolution that holds
+                    the model's input
+        class_names: A list of the class names the model predicts,
+                     defaults to the folders of the default dataset path
+        inference_stride: An integer, the model runs on every inference_stride-th frame,
+                          only used when target_fps is None
+        num_threads: The number of threads the inference backend may use
+        player: The playback.ThemeSongPlayer that plays the theme song of recognized roommates, or None
+        metrics: The metrics.Metrics the capture, display and detect loops are timed into
+        target_fps: The display frame rate to hold, or None for a fixed frame interval and inference_stride
+        max_latency: The longest time in seconds from a frame being shown to it being detected on
+    """
+    backend = load_backend(model_path or default_model_path(), num_threads)
+    _watch_backend(backend, metrics)
+    classifier = FrameClassifier(backend, _resolve_class_names(backend, class_names), cropper)
+    if cam_source is None:
+        cam_source = _open_capture(backend, 0, cropper, metrics)
+
+    scheduler = None
+    if target_fps is not None:
+        if getattr(cam_source, "fps", 0) > 0:
+            # Running faster than the camera would only show the same frame again
+            target_fps = min(target_fps, cam_source.fps)
+        scheduler = AdaptiveScheduler(target_fps, max_latency, metrics=metrics)
+        inference_stride = 1
+    inference = InferenceWorker(classifier, inference_stride, motion_gate, player, metrics, scheduler)
+
+    # Classify before displaying so the model starts on the frame as early as possible
+    FramePipeline([InferenceStage(inference), DisplayStage()], cam_source, metrics=metrics,
+                  scheduler=scheduler).show()
+
+
+def detect_headless(model_path: str = None, source=0, class_names=None,
+                    num_threads: int = DEFAULT_NUM_THREADS, motion_gate: MotionGate = None,
+                    cropper: FaceCropper = None, player=None, metrics: Metrics = NULL_METRICS):
+    """Runs detection on a video source without any GUI.
+
+    Every frame goes through capture, preprocessing and inference on the calling thread.
+    Each prediction is printed with a timestamp and a throughput summary is printed when
+    the source runs out of frames or on Ctrl-C. Frames the motion gate rejects are
+    counted in the summary but not classified.
+
+    Args:
+        model_path: The model used for detection, any model backends.load_backend opens: a SavedModel
+                    folder (the lean export), a tf.keras .h5 model, a .tflite model, a .npz embedding
+                    index, a .cascade.json cascade or an http:// server.py URL, None for default_model_path
+        source: A camera device index, the path of a video file or of a recording folder
+        class_names: A list of the class names the model predicts,
+                     defaults to the folders of the default dataset path
+        num_threads: The number of threads the inference backend may use
+        motion_gate: The MotionGate that skips static frames, or None to infer every frame
+        cropper: The FaceCropper used to classify faces, or None to classify whole frames
+        player: The playback.ThemeSongPlayer that plays the theme song of recognized roommates, or None
+        metrics: The metrics.Metrics the read, motion, preprocess and inference stages are timed into
+
+    Returns: A dictionary of the throughput summary (frames, seconds, fps, p50 and p99 in ms,
+             skipped frames)
+    """
+    backend = load_backend(model_path or default_model_path(), num_threads)
+    _watch_backend(backend, metrics)
+    classifier = FrameClassifier(backend, _resolve_class_names(backend, class_names), cropper)
+    capture = _open_capture(backend, source, cropper, metrics)
+    if hasattr(capture, "dropped_frames"):
+        metrics.gauge("dropped_frames", lambda: capture.dropped_frames)
+
+    latencies = []
+    start = time.perf_counter()
+    try:
+        while True:
+            frame_start = time.perf_counter()
+            with metrics.time("read"):
+                ret, frame = capture.read_next()
+            if not ret:
+                if capture.finished:
+                    break
+                continue
+
+            if motion_gate is not None:
+                with metrics.time("motion"):
+                    moving = motion_gate.should_infer(frame)
+                if not moving:
+                    latencies.append(time.perf_counter() - frame_start)
+                    continue
+
+            with metrics.time("preprocess"):
+                rgb = classifier.preprocess(frame)
+            with metrics.time("inference"):
+                class_name, confidence = classifier.classify(rgb)
+            metrics.tick("inference")
+            metrics.report()
+            latencies.append(time.perf_counter() - frame_start)
+            if player is not None:
+                player.trigger(class_name, confidence)
+            print(HEADLESS_PREDICTION_MSG.format(time=datetime.now().isoformat(timespec="milliseconds"),
+                                                 index=len(latencies), class_name=class_name,
+                                                 confidence=100 * confidence))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.close()
+        metrics.report(force=True)
+
+    seconds = time.perf_counter() - start
+    latencies_ms = np.array(latencies or [0.0]) * 1000
+    summary = {
+        "frames": len(latencies),
+        "seconds": seconds,
+        "fps": len(latencies) / seconds if seconds else 0.0,
+        "p50": float(np.percentile(latencies_ms, 50)),
+        "p99": float(np.percentile(latencies_ms, 99)),
+        "skipped": motion_gate.skipped if motion_gate is not None else 0,
+    }
+    print(HEADLESS_SUMMARY_MSG.format(**summary))
+
+    return summary
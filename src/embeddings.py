@@ -0,0 +1,348 @@
+"""Used to recognize roommates from embeddings instead of a trained softmax head.
+
+A frozen MobileNetV2 backbone, loaded from a local weights file (nothing is
+downloaded), turns every dataset image into an embedding once. The embeddings
+are cached per image, so adding or removing a roommate only embeds the images
+that changed and takes seconds instead of a full make_and_train_model run.
+Frames are then classified by comparing their embedding against every person's
+centroid (or nearest enrolled image) with a single matrix product.
+
+The index is saved next to the dataset directory:
+
+    datasets_cache/embeddings.npz
+
+and can be handed to detector like any other model file.
+
+    Typical usage example:
+
+    index = EmbeddingIndex(dataset_dir, FeatureExtractor(weights_path))
+    index.update()
+    index.save()
+"""
+import numpy as np
+import os
+
+from backends import softmax, DEFAULT_NUM_THREADS
+from cv2 import resize, INTER_AREA
+from dataset_cache import scan_images, _is_validation, DEFAULT_CACHE_SUFFIX, DEFAULT_VALIDATION_PERCENT, SUBSET_ERR_MSG
+from PIL import Image
+
+# Defaults for FeatureExtractor class
+DEFAULT_BACKBONE_WEIGHTS = os.path.join(os.getcwd(), "model", "mobilenet_v2_0.35_96_no_top.h5")
+DEFAULT_EMBEDDING_SIZE = 96
+DEFAULT_BACKBONE_ALPHA = 0.35
+DEFAULT_EMBED_BATCH_SIZE = 32
+
+# Defaults for EmbeddingIndex class
+INDEX_FILE_NAME = "embeddings.npz"
+INDEX_EXTENSION = ".npz"
+DEFAULT_METHOD = "centroid"
+# Cosine similarities only span [-1, 1], dividing by the temperature spreads them
+# out so the softmax gives usable confidences
+DEFAULT_TEMPERATURE = 0.05
+
+# Default error message for EmbeddingIndex class
+METHOD_ERR_MSG = 'method must be "centroid" or "nearest"'
+EMPTY_INDEX_ERR_MSG = "The embedding index has no enrolled images."
+ENROLL_FOLDER_ERR_MSG = "No dataset folder to enroll {name} from at {path}"
+
+
+class FeatureExtractor:
+    """Frozen MobileNetV2 backbone that maps RGB frames to unit length embeddings.
+
+    Attributes:
+        weights_path: The path of the local backbone weights file (include_top=False)
+        input_size: An integer, the side length frames are resized to
+        alpha: The MobileNetV2 width multiplier the weights were trained with
+    """
+
+    def __init__(self, weights_path: str = DEFAULT_BACKBONE_WEIGHTS, input_size: int = DEFAULT_EMBEDDING_SIZE,
+                 alpha: float = DEFAULT_BACKBONE_ALPHA, num_threads: int = DEFAULT_NUM_THREADS):
+        """Builds the backbone and loads its weights from weights_path.
+
+        Args:
+            weights_path: The path of the local backbone weights file (include_top=False)
+            input_size: An integer, the side length frames are resized to
+            alpha: The MobileNetV2 width multiplier the weights were trained with
+            num_threads: The number of threads TensorFlow may use for a single op
+        """
+        import tensorflow as tf
+
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+        except RuntimeError:
+            pass
+
+        self.weights_path = weights_path
+        self.input_size = input_size
+        self.alpha = alpha
+
+        self.model = tf.keras.applications.MobileNetV2(input_shape=(input_size, input_size, 3), alpha=alpha,
+                                                       include_top=False, weights=weights_path, pooling="avg")
+        self.model.trainable = False
+        preprocess = tf.keras.applications.mobilenet_v2.preprocess_input
+        self._forward = tf.function(lambda batch: self.model(preprocess(batch), training=False))
+
+    def embed(self, frames, batch_size: int = DEFAULT_EMBED_BATCH_SIZE):
+        """Embeds RGB frames of any size.
+
+        Args:
+            frames: An array or list of RGB uint8 frames
+            batch_size: The number of frames run through the backbone at once
+
+        Returns: A float32 array of shape (frames, features) with unit length rows
+        """
+        embeddings = []
+        for start in range(0, len(frames), batch_size):
+            batch = np.stack([frame if frame.shape[:2] == (self.input_size, self.input_size)
+                              else resize(frame, (self.input_size, self.input_size), interpolation=INTER_AREA)
+                              for frame in frames[start:start + batch_size]]).astype(np.float32)
+            embeddings.append(self._forward(batch).numpy())
+
+        if not embeddings:
+            return np.empty((0, self.model.output_shape[-1]), dtype=np.float32)
+
+        embeddings = np.concatenate(embeddings)
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+class EmbeddingIndex:
+    """Per image embeddings of a dataset directory and the lookup over them.
+
+    Attributes:
+        dataset_dir: The path of the dataset directory (one subfolder per class)
+        extractor: The FeatureExtractor used to embed images
+        index_path: The path the index is saved at
+        class_names: A list of the enrolled class names, sorted
+        method: "centroid" compares against each class mean, "nearest" against each image
+    """
+
+    def __init__(self, dataset_dir: str, extractor: FeatureExtractor, index_path: str = None,
+                 method: str = DEFAULT_METHOD):
+        """Initializes EmbeddingIndex and loads the saved index, if any.
+
+        Args:
+            dataset_dir: The path of the dataset directory (one subfolder per class)
+            extractor: The FeatureExtractor used to embed images
+            index_path: Where the index is saved, defaults to next to dataset_dir
+            method: "centroid" compares against each class mean, "nearest" against each image
+        """
+        if method not in ("centroid", "nearest"):
+            raise ValueError(METHOD_ERR_MSG)
+
+        self.dataset_dir = os.path.normpath(dataset_dir)
+        self.extractor = extractor
+        if index_path is None:
+            index_path = os.path.join(self.dataset_dir + DEFAULT_CACHE_SUFFIX, INDEX_FILE_NAME)
+        self.index_path = index_path
+        self.method = method
+
+        # relative path -> (label, mtime, size, embedding)
+        self._entries = {}
+        if os.path.exists(index_path):
+            saved = np.load(index_path)
+            # Embeddings of a different backbone can not be compared, start over
+            if (str(saved["weights_path"]) != extractor.weights_path
+                    or int(saved["input_size"]) != extractor.input_size):
+                saved = {key: [] for key in ("paths", "labels", "mtimes", "sizes", "embeddings")}
+            for path, label, mtime, size, embedding in zip(saved["paths"], saved["labels"], saved["mtimes"],
+                                                           saved["sizes"], saved["embeddings"]):
+                self._entries[str(path)] = (str(label), float(mtime), int(size), embedding)
+
+        self._rebuild()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _rebuild(self):
+        """Recomputes the class names, label per image and class centroids."""
+        self.class_names = sorted({label for label, _, _, _ in self._entries.values()})
+        label_of = {name: i for i, name in enumerate(self.class_names)}
+
+        if not self._entries:
+            self._embeddings = None
+            self._labels = np.empty(0, dtype=np.int32)
+            self._centroids = None
+            return
+
+        self._embeddings = np.stack([embedding for _, _, _, embedding in self._entries.values()])
+        self._labels = np.array([label_of[label] for label, _, _, _ in self._entries.values()], dtype=np.int32)
+
+        sums = np.zeros((len(self.class_names), self._embeddings.shape[1]), dtype=np.float32)
+        np.add.at(sums, self._labels, self._embeddings)
+        self._centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+    def update(self, class_names=None):
+        """Embeds the images that are new or changed since the last update.
+
+        Args:
+            class_names: A list of the classes to update (for enrolling one person),
+                         defaults to every folder in dataset_dir
+
+        Returns: A tuple of the number of images embedded and removed
+        """
+        images = scan_images(self.dataset_dir)
+        if class_names is not None:
+            images = {path: image for path, image in images.items() if image[0] in class_names}
+
+        removed = [path for path, (label, _, _, _) in self._entries.items()
+                   if path not in images and (class_names is None or label in class_names)]
+        for path in removed:
+            del self._entries[path]
+
+        changed = [path for path, (_, stat) in images.items()
+                   if path not in self._entries
+                   or self._entries[path][1] != stat.st_mtime
+                   or self._entries[path][2] != stat.st_size]
+
+        frames = []
+        for path in changed:
+            with Image.open(os.path.join(self.dataset_dir, path)) as image:
+                frames.append(np.asarray(image.convert("RGB")))
+
+        for path, embedding in zip(changed, self.extractor.embed(frames)):
+            label, stat = images[path]
+            self._entries[path] = (label, stat.st_mtime, stat.st_size, embedding)
+
+        self._rebuild()
+        return len(changed), len(removed)
+
+    def enroll(self, name: str):
+        """Adds (or refreshes) one person from their dataset folder.
+
+        Returns: The number of images embedded
+        """
+        person_dir = os.path.join(self.dataset_dir, name)
+        if not os.path.isdir(person_dir):
+            raise IOError(ENROLL_FOLDER_ERR_MSG.format(name=name, path=person_dir))
+
+        added, _ = self.update([name])
+        return added
+
+    def remove(self, name: str):
+        """Removes one person from the index (their dataset folder is left alone).
+
+        Returns: The number of images removed
+        """
+        removed = [path for path, (label, _, _, _) in self._entries.items() if label == name]
+        for path in removed:
+            del self._entries[path]
+
+        self._rebuild()
+        return len(removed)
+
+    def split(self, subset: str = None, validation_percent: int = DEFAULT_VALIDATION_PERCENT):
+        """Gets the embeddings and labels of a split, the same split DatasetCache uses.
+
+        Args:
+            subset: "training", "validation" or None for every image
+            validation_percent: The percentage of images that go in the validation split
+
+        Returns: A tuple of an array of embeddings and an array of integer labels
+        """
+        if subset not in ("training", "validation", None):
+            raise ValueError(SUBSET_ERR_MSG)
+
+        label_of = {name: i for i, name in enumerate(self.class_names)}
+        embeddings, labels = [], []
+        for path, (label, _, _, embedding) in sorted(self._entries.items()):
+            if subset is not None and _is_validation(path, validation_percent) != (subset == "validation"):
+                continue
+            embeddings.append(embedding)
+            labels.append(label_of[label])
+
+        dimensions = self._embeddings.shape[1] if self._embeddings is not None else 0
+        return (np.array(embeddings, dtype=np.float32).reshape(-1, dimensions),
+                np.array(labels, dtype=np.int32))
+
+    def similarities(self, embeddings: np.ndarray):
+        """Compares embeddings against every enrolled class.
+
+        Returns: An array of shape (embeddings, classes) of cosine similarities
+        """
+        if self._embeddings is None:
+            raise RuntimeError(EMPTY_INDEX_ERR_MSG)
+
+        if self.method == "centroid":
+            return embeddings @ self._centroids.T
+
+        # Best match among each class's images
+        per_image = embeddings @ self._embeddings.T
+        similarities = np.full((len(embeddings), len(self.class_names)), -1.0, dtype=np.float32)
+        for label in range(len(self.class_names)):
+            similarities[:, label] = per_image[:, self._labels == label].max(axis=1)
+
+        return similarities
+
+    def save(self):
+        """Writes the index to index_path."""
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        paths = list(self._entries)
+        entries = list(self._entries.values())
+        dimensions = self._embeddings.shape[1] if self._embeddings is not None else 0
+
+        # np.savez appends .npz to names without it, so keep the extension on the temporary file
+        tmp_path = self.index_path + ".tmp" + INDEX_EXTENSION
+        np.savez(tmp_path,
+                 paths=np.array(paths, dtype=str),
+                 labels=np.array([label for label, _, _, _ in entries], dtype=str),
+                 mtimes=np.array([mtime for _, mtime, _, _ in entries], dtype=np.float64),
+                 sizes=np.array([size for _, _, size, _ in entries], dtype=np.int64),
+                 embeddings=(self._embeddings if self._embeddings is not None
+                             else np.empty((0, dimensions), dtype=np.float32)),
+                 dataset_dir=np.array(self.dataset_dir),
+                 weights_path=np.array(self.extractor.weights_path),
+                 input_size=np.array(self.extractor.input_size),
+                 alpha=np.array(self.extractor.alpha))
+        os.replace(tmp_path, self.index_path)
+
+
+class EmbeddingBackend:
+    """Inference backend (see backends.py) that classifies with an EmbeddingIndex.
+
+    Attributes:
+        index: The EmbeddingIndex frames are compared against
+        class_names: A list of the class names the probabilities are for
+        input_shape: A tuple of the (height, width, channels) frames are resized to
+    """
+
+    def __init__(self, index: EmbeddingIndex, temperature: float = DEFAULT_TEMPERATURE):
+        self.index = index
+        self.class_names = index.class_names
+        self.input_shape = (index.extractor.input_size, index.extractor.input_size, 3)
+        self.temperature = temperature
+
+    @classmethod
+    def from_index_file(cls, index_path: str, num_threads: int = DEFAULT_NUM_THREADS):
+        """Loads a saved EmbeddingIndex together with the backbone it was built with."""
+        saved = np.load(index_path)
+        extractor = FeatureExtractor(str(saved["weights_path"]), int(saved["input_size"]), float(saved["alpha"]),
+                                     num_threads)
+        return cls(EmbeddingIndex(str(saved["dataset_dir"]), extractor, index_path))
+
+    def predict(self, batch: np.ndarray):
+        """Returns the class probabilities for a batch of frames."""
+        return softmax(self.index.similarities(self.index.extractor.embed(batch)) / self.temperature)
+
+
+def enroll(dataset_dir: str, weights_path: str = DEFAULT_BACKBONE_WEIGHTS, name: str = None):
+    """Builds or updates the embedding index of dataset_dir and saves it.
+
+    Args:
+        dataset_dir: The path of the dataset directory (one subfolder per class)
+        weights_path: The path of the local backbone weights file
+        name: The one person to enroll, defaults to every folder in dataset_dir
+
+    Returns: The saved EmbeddingIndex
+    """
+    index = EmbeddingIndex(dataset_dir, FeatureExtractor(weights_path))
+    if name is None:
+        added, removed = index.update()
+    else:
+        added, removed = index.enroll(name), 0
+    index.save()
+
+    print(f"Embedding index: {len(index)} images of {len(index.class_names)} people "
+          f"({added} embedded, {removed} removed), saved to {index.index_path}")
+
+    return index
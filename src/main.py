@@ -1,12 +1,17 @@
 import os
+import sys
 
-from cli import run_cli
+from cli import run_cli, run_command
 
 # TODO this is temporary, find a longterm solution for finding dataset path
 DATASET_DIR = os.path.join(os.getcwd(), "datasets")
 
 def main():
-    run_cli()
+    # Any arguments run a command without the interactive menu, e.g. "main.py train --resume"
+    if len(sys.argv) > 1:
+        run_command(sys.argv[1:])
+    else:
+        run_cli()
 
 if __name__ == "__main__":
     main()
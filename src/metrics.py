@@ -0,0 +1,235 @@
+"""Used to measure where the time of the live capture, display and detect loops goes.
+
+The loops time each of their stages (reading a frame, mirroring it, uploading it
+to Tk, running the model...) into a Metrics object. Every stage keeps a rolling
+window of durations, so p50/p95/p99 follow what the loop does right now, and
+loops tick rates (frames per second) and expose counters like dropped frames.
+
+A one-line summary is printed every few seconds, and the same numbers can be
+exported to a JSON or Prometheus text file (picked by the file extension) that
+is rewritten in place.
+
+Timing is off unless a Metrics object is enabled. The loops then get
+NULL_METRICS, whose time() hands out one shared do-nothing context manager, so
+the hooks cost a method call per stage.
+
+The command line turns it on with the THEMESONG_METRICS environment variable,
+set to 1 for the summary only or to the path of the file to export to:
+
+    THEMESONG_METRICS=metrics.prom python main.py
+
+    Typical usage example:
+
+    metrics = Metrics(export_path="metrics.json")
+    with metrics.time("inference"):
+        classifier.classify(frame)
+    metrics.report()
+"""
+import contextlib
+import json
+import numpy as np
+import os
+import time
+
+from collections import deque
+
+METRICS_ENV_VAR = "THEMESONG_METRICS"
+PROMETHEUS_EXTENSION = ".prom"
+PROMETHEUS_PREFIX = "themesong"
+
+# Defaults for Metrics class
+DEFAULT_WINDOW = 300
+DEFAULT_SUMMARY_INTERVAL = 5.0
+PERCENTILES = (50, 95, 99)
+
+# A shared context manager that does nothing, handed out while timing is off
+_NULL_TIMING = contextlib.nullcontext()
+
+
+class _Timing:
+    """Context manager that records the time spent in its block into a Metrics stage."""
+
+    __slots__ = ("_metrics", "_name", "_start")
+
+    def __init__(self, metrics, name: str):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._metrics.record(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Metrics:
+    """Rolling stage timings, rates and counters of the live loops.
+
+    Safe to feed from several threads, each stage should be timed by one thread.
+
+    Attributes:
+        enabled: A boolean representing if anything is measured
+        window: The number of recent durations (and ticks) kept per stage (and rate)
+        summary_interval: The seconds between two summaries printed by report, None to never print
+        export_path: The .json or .prom file report rewrites, or None
+    """
+
+    def __init__(self, enabled: bool = True, window: int = DEFAULT_WINDOW,
+                 summary_interval: float = DEFAULT_SUMMARY_INTERVAL, export_path: str = None):
+        self.enabled = enabled
+        self.window = window
+        self.summary_interval = summary_interval
+        self.export_path = export_path
+
+        self._stages = {}
+        self._ticks = {}
+        self._counters = {}
+        self._gauges = {}
+        self._last_report = time.perf_counter()
+
+    def time(self, name: str):
+        """Returns: A context manager that records the time spent in its block as stage name"""
+        if not self.enabled:
+            return _NULL_TIMING
+        return _Timing(self, name)
+
+    def record(self, name: str, seconds: float):
+        """Records that stage name took seconds."""
+        if not self.enabled:
+            return
+        durations = self._stages.get(name)
+        if durations is None:
+            durations = self._stages.setdefault(name, deque(maxlen=self.window))
+        durations.append(seconds)
+
+    def tick(self, name: str):
+        """Records that an event of rate name (e.g. a displayed frame) happened now."""
+        if not self.enabled:
+            return
+        ticks = self._ticks.get(name)
+        if ticks is None:
+            ticks = self._ticks.setdefault(name, deque(maxlen=self.window))
+        ticks.append(time.perf_counter())
+
+    def count(self, name: str, amount: int = 1):
+        """Adds amount to counter name."""
+        if self.enabled:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def gauge(self, name: str, read):
+        """Registers a value that is only read when reporting, e.g. a capture's dropped_frames.
+
+        Args:
+            name: The name of the value
+            read: Called without arguments to read the current value
+        """
+        if self.enabled:
+            self._gauges[name] = read
+
+    def snapshot(self):
+        """Returns: A dictionary of the stage percentiles (ms), rates (per second) and counters"""
+        stages = {}
+        for name, durations in list(self._stages.items()):
+            # list() copies the deque in one step while other threads keep appending
+            durations_ms = np.array(list(durations)) * 1000
+            stages[name] = {"count": len(durations_ms), "mean": float(durations_ms.mean())}
+            stages[name].update({f"p{percentile}": float(value) for percentile, value
+                                 in zip(PERCENTILES, np.percentile(durations_ms, PERCENTILES))})
+
+        rates = {}
+        for name, ticks in list(self._ticks.items()):
+            ticks = list(ticks)
+            span = ticks[-1] - ticks[0] if ticks else 0.0
+            rates[name] = (len(ticks) - 1) / span if span > 0 else 0.0
+
+        counters = dict(self._counters)
+        counters.update({name: read() for name, read in self._gauges.items()})
+
+        return {"time": time.time(), "stages": stages, "rates": rates, "counters": counters}
+
+    def summary_line(self, snapshot: dict = None):
+        """Returns: The snapshot as one line, stages as p50/p95/p99 in milliseconds"""
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        parts = [f"{name} {stage['p50']:.2f}/{stage['p95']:.2f}/{stage['p99']:.2f}ms"
+                 for name, stage in snapshot["stages"].items()]
+        parts += [f"{name} {rate:.1f}fps" for name, rate in snapshot["rates"].items()]
+        parts += [f"{name} {value}" for name, value in snapshot["counters"].items()]
+        return " | ".join(parts)
+
+    def report(self, force: bool = False):
+        """Prints the summary line and rewrites the export file once summary_interval has passed.
+
+        Meant to be called every frame, costs a clock read between reports.
+
+        Args:
+            force: A boolean representing if the report is made now regardless of the interval
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        interval = self.summary_interval if self.summary_interval is not None else DEFAULT_SUMMARY_INTERVAL
+        if not force and now - self._last_report < interval:
+            return
+
+        self._last_report = now
+        snapshot = self.snapshot()
+        if self.summary_interval is not None:
+            print(self.summary_line(snapshot))
+        if self.export_path is not None:
+            self.export(self.export_path, snapshot)
+
+    def export(self, path: str, snapshot: dict = None):
+        """Writes a snapshot to path, as Prometheus text for .prom files and as JSON otherwise.
+
+        The file is replaced in one step, so readers never see half a file.
+        """
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        if path.endswith(PROMETHEUS_EXTENSION):
+            content = to_prometheus(snapshot)
+        else:
+            content = json.dumps(snapshot, indent=2)
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as export_file:
+            export_file.write(content)
+        os.replace(temp_path, path)
+
+
+# Shared by every loop that was not given a Metrics object, measures nothing
+NULL_METRICS = Metrics(enabled=False)
+
+
+# Module Functions
+def to_prometheus(snapshot: dict):
+    """Returns: The snapshot in the Prometheus text exposition format"""
+    # Prometheus expects base units, stages are kept in milliseconds
+    lines = [f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds summary"]
+    for name, stage in snapshot["stages"].items():
+        for percentile in PERCENTILES:
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_seconds{{stage="{name}",quantile="{percentile / 100}"}} '
+                         f'{stage[f"p{percentile}"] / 1000}')
+        lines.append(f'{PROMETHEUS_PREFIX}_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+
+    lines.append(f"# TYPE {PROMETHEUS_PREFIX}_rate_per_second gauge")
+    for name, rate in snapshot["rates"].items():
+        lines.append(f'{PROMETHEUS_PREFIX}_rate_per_second{{loop="{name}"}} {rate}')
+
+    lines.append(f"# TYPE {PROMETHEUS_PREFIX}_events gauge")
+    for name, value in snapshot["counters"].items():
+        lines.append(f'{PROMETHEUS_PREFIX}_events{{event="{name}"}} {value}')
+
+    return "\n".join(lines) + "\n"
+
+
+def from_env():
+    """Makes the Metrics the THEMESONG_METRICS environment variable asks for.
+
+    Returns: NULL_METRICS when it is unset or 0, an enabled Metrics printing summaries
+             when it is 1, and one that also exports to the file it names otherwise
+    """
+    value = os.environ.get(METRICS_ENV_VAR, "").strip()
+    if value in ("", "0"):
+        return NULL_METRICS
+    return Metrics(export_path=None if value == "1" else value)
@@ -0,0 +1,94 @@
+"""Used to skip classifier work while the camera is looking at a static scene.
+
+This module contains a cheap motion detector that compares heavily downscaled
+frames against a running background model. detector asks it before every
+inference and only runs the CNN when something in the scene moved, or moved
+recently enough to still be within the hold-over window.
+
+    Typical usage example:
+
+    gate = MotionGate()
+    if gate.should_infer(frame):
+        run_model(frame)
+"""
+import numpy as np
+import time
+
+from cv2 import accumulateWeighted, resize, INTER_AREA
+
+# Defaults for MotionGate class
+DEFAULT_MOTION_THRESHOLD = 0.02
+DEFAULT_PIXEL_THRESHOLD = 25
+DEFAULT_HOLD_OVER = 2.0
+DEFAULT_MOTION_SIZE = (32, 24)
+DEFAULT_LEARNING_RATE = 0.05
+
+
+class MotionGate:
+    """Decides whether a frame is worth running the classifier on.
+
+    Frames are shrunk to a few hundred pixels and turned to grayscale, then compared
+    against an exponentially weighted background. The motion score is the fraction
+    of pixels that differ from the background by more than pixel_threshold.
+
+    Attributes:
+        threshold: A float, the motion score above which a frame counts as moving
+        pixel_threshold: An integer, the gray level difference that counts as a changed pixel
+        hold_over: A float, seconds inference keeps running after motion stopped
+        size: A tuple of the (width, height) frames are shrunk to before comparing
+        learning_rate: A float, how fast the background adapts to the current frame
+        passed: An integer count of frames that were let through to the classifier
+        skipped: An integer count of frames the classifier was skipped for
+    """
+
+    def __init__(self, threshold: float = DEFAULT_MOTION_THRESHOLD,
+                 pixel_threshold: int = DEFAULT_PIXEL_THRESHOLD,
+                 hold_over: float = DEFAULT_HOLD_OVER,
+                 size: tuple = DEFAULT_MOTION_SIZE,
+                 learning_rate: float = DEFAULT_LEARNING_RATE):
+        """Initializes MotionGate with an empty background model."""
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.hold_over = hold_over
+        self.size = size
+        self.learning_rate = learning_rate
+
+        self.passed = 0
+        self.skipped = 0
+
+        self._background = None
+        self._last_motion = None
+
+    def motion_score(self, frame: np.ndarray):
+        """Compares frame against the background model and then updates the background.
+
+        Args:
+            frame: A color frame (channel order does not matter)
+
+        Returns: A float in [0, 1], the fraction of pixels that changed
+        """
+        small = resize(frame, self.size, interpolation=INTER_AREA)
+        gray = small.mean(axis=2, dtype=np.float32) if small.ndim == 3 else small.astype(np.float32)
+
+        if self._background is None:
+            self._background = gray
+            return 1.0
+
+        score = float(np.mean(np.abs(gray - self._background) > self.pixel_threshold))
+        accumulateWeighted(gray, self._background, self.learning_rate)
+
+        return score
+
+    def should_infer(self, frame: np.ndarray, now: float = None):
+        """Returns a boolean representing if the classifier should run on frame."""
+        now = time.monotonic() if now is None else now
+
+        if self.motion_score(frame) > self.threshold:
+            self._last_motion = now
+
+        if self._last_motion is not None and now - self._last_motion <= self.hold_over:
+            self.passed += 1
+            return True
+
+        self.skipped += 1
+        return False
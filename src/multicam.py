@@ -0,0 +1,254 @@
+"""Used to run one detector over several cameras (one per entrance).
+
+Every camera gets its own capture thread (see data_collect.ThreadedCamCapture),
+but they all share one model. Each tick the newest frame of every camera is
+gathered into a single batch and classified in one backend call, and the
+results are routed back to the camera they came from. This loads TensorFlow
+and the model once, and one batched call costs less than a call per camera.
+
+Video files and recordings (see recording.py) work as sources too, their
+frames are read in order so nothing is skipped.
+
+    Typical usage example:
+
+    detector = MultiCamDetector(FrameClassifier(backend, class_names), [0, "door.avi"])
+    detector.run()
+    print(detector.stats[1].summary())
+"""
+import numpy as np
+import time
+
+from backends import load_backend, DEFAULT_NUM_THREADS
+from collections import deque
+from cv2 import cvtColor, COLOR_BGR2RGB
+from datetime import datetime
+from detector import (FpsCounter, FrameClassifier, _open_capture, _resolve_class_names, default_model_path,
+                      DEFAULT_FPS_WINDOW)
+from motion import MotionGate
+from roi import FaceCropper
+
+# Defaults for MultiCamDetector class
+DEFAULT_LATENCY_WINDOW = 100
+# How long a tick waits for a live camera to deliver a new frame
+DEFAULT_TICK_TIMEOUT = 0.05
+# How long run sleeps when no camera had a new frame
+DEFAULT_IDLE_SLEEP = 0.005
+
+# Output format strings for detect_multi
+MULTICAM_PREDICTION_MSG = "{time} camera {camera} frame {index}: {class_name} ({confidence:.2f}%)"
+MULTICAM_SUMMARY_MSG = ("camera {camera}: {frames} frames, {inferences} inferences, {fps:.2f} frames/sec, "
+                        "latency p50 {p50:.2f}ms, p99 {p99:.2f}ms, skipped {skipped}")
+MULTICAM_BATCH_MSG = "{ticks} batched calls, {mean_batch:.2f} frames per call on average"
+
+
+class CameraStats:
+    """Frame rate and latency of one camera of a MultiCamDetector.
+
+    Latency is measured from reading a frame to having its result, so it
+    includes waiting for the other cameras of the batch.
+
+    Attributes:
+        frames: An integer count of frames read from the camera
+        inferences: An integer count of frames classified
+        skipped: An integer count of frames the motion gate skipped
+        fps: An FpsCounter for classified frames
+    """
+
+    def __init__(self, latency_window: int = DEFAULT_LATENCY_WINDOW):
+        self.frames = 0
+        self.inferences = 0
+        self.skipped = 0
+        self.fps = FpsCounter(DEFAULT_FPS_WINDOW)
+        self._latencies = deque(maxlen=latency_window)
+
+    def record(self, latency: float):
+        """Records the result of a frame that took latency seconds."""
+        self.inferences += 1
+        self.fps.tick()
+        self._latencies.append(latency)
+
+    def latency_ms(self, percentile: float):
+        """Returns: The percentile of the recent latencies in milliseconds, 0 without any"""
+        if not self._latencies:
+            return 0.0
+        return float(np.percentile(self._latencies, percentile)) * 1000
+
+    def summary(self):
+        """Returns: A dictionary of frames, inferences, skipped, fps, p50 and p99 (ms)"""
+        return {"frames": self.frames, "inferences": self.inferences, "skipped": self.skipped,
+                "fps": self.fps.fps, "p50": self.latency_ms(50), "p99": self.latency_ms(99)}
+
+
+class MultiCamDetector:
+    """Classifies the frames of several capture sources with one batched model call per tick.
+
+    Attributes:
+        classifier: The FrameClassifier shared by every camera
+        captures: A list of the ThreadedCamCapture (or recording.ReplayCapture) of every source
+        motion_gates: A list of a MotionGate per camera, or None to classify every frame
+        stats: A list of the CameraStats of every camera
+        latest_results: A list of the newest (frame index, class name, confidence) of
+                        every camera, None until the camera has a result
+        ticks: An integer count of batched model calls
+        batched_frames: An integer count of frames classified over all batched calls
+    """
+
+    def __init__(self, classifier: FrameClassifier, sources, gate_motion: bool = False,
+                 tick_timeout: float = DEFAULT_TICK_TIMEOUT):
+        """Initializes MultiCamDetector and opens every source.
+
+        Args:
+            classifier: The FrameClassifier shared by every camera
+            sources: A list of camera device indexes, video file paths and/or recording folders
+            gate_motion: A boolean representing if each camera gets a MotionGate that
+                         skips its static frames
+            tick_timeout: The seconds a tick waits for each source to deliver a frame
+        """
+        self.classifier = classifier
+        self.captures = []
+        try:
+            for source in sources:
+                self.captures.append(_open_capture(classifier.backend, source, classifier.cropper))
+        except IOError:
+            self.close()
+            raise
+
+        self.motion_gates = [MotionGate() for _ in self.captures] if gate_motion else None
+        self.stats = [CameraStats() for _ in self.captures]
+        self.latest_results = [None] * len(self.captures)
+        self.ticks = 0
+        self.batched_frames = 0
+
+        self._tick_timeout = tick_timeout
+        self._live = [isinstance(source, int) for source in sources]
+
+    @property
+    def finished(self):
+        """A boolean representing if every source has run out of frames."""
+        return all(capture.exhausted for capture in self.captures)
+
+    def _read(self, camera: int):
+        """Reads the frame of a camera for this tick.
+
+        Returns: The BGR frame, or None if the camera has no new frame
+        """
+        capture = self.captures[camera]
+        if self._live[camera]:
+            # Skip to the newest frame, without the last one again when the camera has nothing new
+            ret, frame = capture.read_latest(self._tick_timeout, repeat=False)
+        else:
+            ret, frame = capture.read_next(self._tick_timeout)
+
+        return frame if ret else None
+
+    def tick(self):
+        """Gathers a frame from every camera and classifies them in one batch.
+
+        Returns: A list of (camera, frame index, class name, confidence) tuples for
+                 the frames classified this tick
+        """
+        cameras, frames, read_times = [], [], []
+        for camera in range(len(self.captures)):
+            frame = self._read(camera)
+            if frame is None:
+                continue
+
+            read_time = time.perf_counter()
+            stats = self.stats[camera]
+            stats.frames += 1
+            if self.motion_gates is not None and not self.motion_gates[camera].should_infer(frame):
+                stats.skipped += 1
+                continue
+
+            cameras.append(camera)
+            frames.append(cvtColor(frame, COLOR_BGR2RGB))
+            read_times.append(read_time)
+
+        if not frames:
+            return []
+
+        results = self.classifier.classify_frames(frames)
+        done = time.perf_counter()
+        self.ticks += 1
+        self.batched_frames += len(frames)
+
+        routed = []
+        for camera, read_time, (class_name, confidence) in zip(cameras, read_times, results):
+            stats = self.stats[camera]
+            stats.record(done - read_time)
+            self.latest_results[camera] = (stats.frames, class_name, confidence)
+            routed.append((camera, stats.frames, class_name, confidence))
+
+        return routed
+
+    def run(self, on_result=None):
+        """Ticks until every source runs out of frames or Ctrl-C.
+
+        Args:
+            on_result: Called with (camera, frame index, class name, confidence) for
+                       every classified frame, or None
+        """
+        try:
+            while not self.finished:
+                results = self.tick()
+                if not results:
+                    # Live cameras hand out no new frame until the next one is grabbed
+                    time.sleep(DEFAULT_IDLE_SLEEP)
+                for result in results:
+                    if on_result is not None:
+                        on_result(*result)
+        except KeyboardInterrupt:
+            pass
+
+    def close(self):
+        """Stops every capture."""
+        for capture in self.captures:
+            capture.close()
+
+
+def detect_multi(model_path: str = None, sources=(0,), class_names=None,
+                 num_threads: int = DEFAULT_NUM_THREADS, gate_motion: bool = False, cropper: FaceCropper = None,
+                 player=None):
+    """Runs detection on several video sources without any GUI, with one model.
+
+    Each prediction is printed with a timestamp and its camera, per camera
+    statistics are printed when every source has run out of frames or on Ctrl-C.
+
+    Args:
+        model_path: The model used for detection, any model backends.load_backend opens: a SavedModel
+                    folder (the lean export), a tf.keras .h5 model, a .tflite model, a .npz embedding
+                    index, a .cascade.json cascade or an http:// server.py URL, None for
+                    detector.default_model_path
+        sources: A list of camera device indexes, video file paths and/or recording folders
+        class_names: A list of the class names the model predicts,
+                     defaults to the folders of the default dataset path
+        num_threads: The number of threads the inference backend may use
+        gate_motion: A boolean representing if static frames of each camera are skipped
+        cropper: The FaceCropper used to classify faces, or None to classify whole frames
+        player: The playback.ThemeSongPlayer that plays the theme song of recognized roommates, or None
+
+    Returns: A list of the summary dictionary of every camera (see CameraStats.summary)
+    """
+    backend = load_backend(model_path or default_model_path(), num_threads)
+    classifier = FrameClassifier(backend, _resolve_class_names(backend, class_names), cropper)
+    detector = MultiCamDetector(classifier, sources, gate_motion)
+
+    def print_result(camera, index, class_name, confidence):
+        print(MULTICAM_PREDICTION_MSG.format(time=datetime.now().isoformat(timespec="milliseconds"),
+                                             camera=camera, index=index, class_name=class_name,
+                                             confidence=100 * confidence))
+        if player is not None:
+            player.trigger(class_name, confidence)
+
+    try:
+        detector.run(print_result)
+    finally:
+        detector.close()
+
+    summaries = [stats.summary() for stats in detector.stats]
+    for camera, summary in enumerate(summaries):
+        print(MULTICAM_SUMMARY_MSG.format(camera=camera, **summary))
+    print(MULTICAM_BATCH_MSG.format(ticks=detector.ticks,
+                                    mean_batch=detector.batched_frames / detector.ticks if detector.ticks else 0.0))
+
+    return summaries
@@ -0,0 +1,276 @@
+"""Used to show live camera frames in a window and hand them to pluggable stages.
+
+Dataset collection and detection both read a camera, show its frames in a Tk
+window like a mirror and do one more thing with every frame (save it or
+classify it). FramePipeline does the reading and the window, and the extra work
+is done by stages:
+
+    DisplayStage    shows the frame, mirrored
+    SaveStage       saves the frame shown when space (or the burst key) is pressed
+    InferenceStage  classifies the frame (see detector.py)
+
+Every stage is timed into the pipeline's metrics.Metrics under its name, and
+DisplayStage also times its render and upload steps (see metrics.py).
+
+Frames are read DEFAULT_FRAME_INTERVAL ms apart, unless a scheduler (see
+detector.AdaptiveScheduler) picks each delay from the time the frame took.
+
+Frames stay NumPy arrays until a stage needs something else. The display
+mirrors into one reused buffer and pastes it into one reused PhotoImage, so the
+display loop allocates no new images per frame, and the unmirrored RGB image
+is only made when a frame is actually saved.
+
+    Typical usage example:
+
+    pipeline = FramePipeline([SaveStage(writer, name, dataset_path), DisplayStage()])
+    pipeline.show()
+"""
+import numpy as np
+import time
+
+from cv2 import cvtColor, flip, COLOR_BGR2RGB
+from data_collect import (CamCapture, ThreadedCamCapture, _BurstTrigger, BURST_KEY, DEFAULT_BURST_FPS,
+                          DEFAULT_FRAME_INTERVAL, DISPLAY_FRAME_ERR_MSG)
+from metrics import NULL_METRICS, Metrics
+from PIL import Image, ImageTk
+from tkinter import Tk, Label
+
+
+class Frame:
+    """One captured frame, as handed to every stage of a FramePipeline.
+
+    Conversions are made on first use and then shared by every stage.
+
+    Attributes:
+        index: An integer, the position of the frame in the feed
+        bgr: The frame as read from the camera (BGR, not mirrored), must not be modified
+    """
+
+    def __init__(self, index: int, bgr: np.ndarray):
+        self.index = index
+        self.bgr = bgr
+        self._rgb = None
+
+    @property
+    def rgb(self):
+        """The frame converted to RGB (not mirrored)."""
+        if self._rgb is None:
+            self._rgb = cvtColor(self.bgr, COLOR_BGR2RGB)
+        return self._rgb
+
+    def to_image(self):
+        """Returns: A new PIL Image of the frame as the camera saw it (not mirrored)"""
+        return Image.fromarray(self.rgb)
+
+
+class FrameRenderer:
+    """Turns BGR frames into an RGB PIL Image without allocating per frame.
+
+    The image and the buffer behind it are reused for every frame, so whatever
+    render returns is only valid until the next call.
+
+    Attributes:
+        mirror: A boolean representing if frames are flipped across the y-axis
+    """
+
+    def __init__(self, mirror: bool = True):
+        self.mirror = mirror
+        self._buffer = None
+        self._image = None
+
+    def render(self, bgr: np.ndarray):
+        """Returns: The reused RGB PIL Image, filled with bgr"""
+        height, width = bgr.shape[:2]
+        if self._image is None or self._image.size != (width, height):
+            self._buffer = np.empty((height, width, 3), dtype=np.uint8)
+            self._image = Image.new("RGB", (width, height))
+
+        if self.mirror:
+            flip(bgr, 1, dst=self._buffer)
+            source = self._buffer
+        else:
+            source = np.ascontiguousarray(bgr)
+
+        # The "BGR" raw mode swaps the channels while copying into the image
+        self._image.frombytes(source, "raw", "BGR")
+        return self._image
+
+
+class DisplayStage:
+    """Shows every frame in the pipeline window, mirrored by default.
+
+    Attributes:
+        renderer: The FrameRenderer frames are converted with
+        video: A tkinter Label class used to show the image within the window
+    """
+
+    name = "display"
+
+    def __init__(self, mirror: bool = True):
+        self.renderer = FrameRenderer(mirror)
+        self.video = None
+        self._photo = None
+        self._metrics = NULL_METRICS
+
+    def attach(self, pipeline):
+        self.video = Label(pipeline.root)
+        self.video.pack()
+        self._metrics = pipeline.metrics
+
+    def process(self, frame: Frame):
+        with self._metrics.time("render"):
+            image = self.renderer.render(frame.bgr)
+
+        with self._metrics.time("upload"):
+            if self._photo is None or (self._photo.width(), self._photo.height()) != image.size:
+                self._photo = ImageTk.PhotoImage(image)
+                self.video.configure(image=self._photo)
+            else:
+                self._photo.paste(image)
+
+    def close(self):
+        pass
+
+
+class SaveStage:
+    """Saves the frame currently shown when space is pressed, or continuously while
+    the burst key is held.
+
+    Attributes:
+        writer: The data_collect.ImageWriter saved frames are submitted to
+        name: The name of the dataset frames are saved for
+        dataset_path: The path of the dataset folder
+        burst_fps: The number of frames per second saved while the burst key is held
+    """
+
+    name = "save"
+
+    def __init__(self, writer, name: str, dataset_path: str, burst_fps: int = DEFAULT_BURST_FPS):
+        self.writer = writer
+        self.name = name
+        self.dataset_path = dataset_path
+        self.burst_fps = burst_fps
+        self._frame = None
+
+    def attach(self, pipeline):
+        # bind saving image to spacebar, holding the burst key saves continuously
+        pipeline.root.bind("<space>", lambda event: self.capture())
+        burst = _BurstTrigger(pipeline.root, self.capture, self.burst_fps)
+        pipeline.root.bind(f"<KeyPress-{BURST_KEY}>", burst.press)
+        pipeline.root.bind(f"<KeyRelease-{BURST_KEY}>", burst.release)
+
+    def process(self, frame: Frame):
+        self._frame = frame
+
+    def capture(self):
+        """Submits the current frame, unmirrored, to the writer.
+
+        Returns: A boolean representing if the frame was queued
+        """
+        if self._frame is None:
+            return False
+        return self.writer.submit(self.name, self.dataset_path, self._frame.to_image())
+
+    def close(self):
+        """Finishes writing the submitted frames."""
+        self.writer.close()
+
+
+class FramePipeline:
+    """Reads frames from a camera source into a tkinter window and runs them through stages.
+
+    A stage is any object with a name, and attach(pipeline), process(frame) and
+    close() methods. Stages run in order for every frame, so a DisplayStage goes last.
+
+    Attributes:
+        cam_source: The CamCapture object used to get video feed from
+        root: The root tkinter window used for display
+        display_title: The title of the window
+        stages: A list of the stages every frame goes through
+        metrics: The metrics.Metrics the loop is timed into
+        scheduler: The object whose frame_done(seconds) returns the ms to wait before the
+                   next frame, or None to wait DEFAULT_FRAME_INTERVAL ms
+    """
+
+    def _centered_tk(self, width_res: int, height_res: int):
+        """A helper function that creates a screen-centered
+           tkinter window with the given resolution.
+
+        Args:
+            width_res: The resolution of the width
+            height_res: The resolution of the height
+        """
+
+        win = Tk()
+        # @TODO Make window resizable later
+        win.resizable(width=False, height=False)
+        pos_horz = int(win.winfo_screenwidth()/2 - width_res/2)
+        pos_vert = int(win.winfo_screenheight()/2 - height_res/2)
+        win.geometry(f"{width_res}x{height_res}+{pos_horz}+{pos_vert}")
+
+        return win
+
+    def __init__(self, stages, cam_source: CamCapture = None, display_title: str = "Camera Feed",
+                 metrics: Metrics = NULL_METRICS, scheduler=None):
+        """Initializes FramePipeline, opens its window and attaches the stages.
+
+        Args:
+            stages: A list of the stages every frame goes through, in order
+            cam_source: The CamCapture object to used to get video feed from,
+                        defaults to a ThreadedCamCapture of the default camera
+            display_title: The title used to name the tkinter display window
+            metrics: The metrics.Metrics the loop is timed into, measures nothing by default
+            scheduler: The object whose frame_done(seconds) returns the ms to wait before the
+                       next frame (see detector.AdaptiveScheduler), or None for a fixed interval
+        """
+        self.metrics = metrics
+        self.scheduler = scheduler
+        self.cam_source = cam_source if cam_source is not None else ThreadedCamCapture(metrics=metrics)
+        if hasattr(self.cam_source, "dropped_frames"):
+            metrics.gauge("dropped_frames", lambda: self.cam_source.dropped_frames)
+
+        # Set up tk display
+        self.root = self._centered_tk(self.cam_source.width, self.cam_source.height)
+        self.display_title = display_title
+        self.root.title(display_title)
+        self.root.bind('<Escape>', lambda event: self.root.quit())
+
+        self.stages = list(stages)
+        for stage in self.stages:
+            stage.attach(self)
+
+        self._frame_index = 0
+
+    def _next_frame(self):
+        start = time.perf_counter()
+        with self.metrics.time("read"):
+            ret, bgr = self.cam_source.read()
+        if not ret:
+            raise RuntimeError(DISPLAY_FRAME_ERR_MSG)
+
+        frame = Frame(self._frame_index, bgr)
+        self._frame_index += 1
+        for stage in self.stages:
+            with self.metrics.time(stage.name):
+                stage.process(frame)
+
+        self.metrics.tick("display")
+        self.metrics.report()
+        if self.scheduler is None:
+            delay = DEFAULT_FRAME_INTERVAL
+        else:
+            delay = self.scheduler.frame_done(time.perf_counter() - start)
+        self.root.after(delay, self._next_frame)
+
+    def show(self):
+        """Shows the live feed from cam_source until the window is closed, then closes everything."""
+        self._next_frame()
+        self.root.mainloop()
+        self.close()
+
+    def close(self):
+        """Closes every stage and the camera source, then reports the metrics one last time."""
+        for stage in self.stages:
+            stage.close()
+        self.cam_source.close()
+        self.metrics.report(force=True)
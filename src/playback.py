@@ -0,0 +1,453 @@
+"""Used to play a roommate's theme song when the detector recognizes them.
+
+Songs live in a folder next to the datasets, named after the dataset (class)
+they belong to:
+
+    songs/
+        alice.mp3
+        bob.wav
+
+Decoding an MP3 or OGG takes hundreds of milliseconds, so every clip is decoded
+to raw PCM once at startup and kept in a ClipCache bounded by size. A trigger
+from the detection loop only queues the class name, a background thread takes
+the decoded clip from the cache and hands it to a sink, so the detector never
+waits on audio. Each roommate has a cooldown so standing in the doorway does
+not restart their song on every frame.
+
+WAV files are decoded with the standard library, every other format needs
+ffmpeg on the PATH. Sound is played through simpleaudio when it is installed,
+NullSink and WavFileSink play nothing and are used to measure the trigger to
+first sample latency without a sound card.
+
+    Typical usage example:
+
+    player = ThemeSongPlayer.from_songs_dir("songs", sink=NullSink())
+    player.trigger("alice", confidence=0.97)
+    player.wait()
+    print(player.latency_ms(50))
+"""
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import wave
+
+from collections import OrderedDict, deque
+
+DEFAULT_SONGS_PATH = os.path.join(os.getcwd(), "songs")
+SONG_EXTENSIONS = (".wav", ".mp3", ".ogg", ".flac", ".m4a")
+
+# Format clips are decoded to by ffmpeg, WAV files keep their own format
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_CHANNELS = 2
+DEFAULT_SAMPLE_WIDTH = 2
+
+# Defaults for ClipCache and ThemeSongPlayer classes
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_COOLDOWN = 60.0
+DEFAULT_MIN_CONFIDENCE = 0.8
+DEFAULT_LATENCY_WINDOW = 100
+
+# Default error messages for playback
+FFMPEG_ERR_MSG = "ffmpeg is needed to decode {path}, install it or convert the song to WAV."
+DECODE_ERR_MSG = "Could not decode {path}: {error}"
+SIMPLEAUDIO_ERR_MSG = "simpleaudio is not installed, install it with: pip install simpleaudio"
+PLAYBACK_ERR_MSG = "Could not play the theme song of {name}: {error}"
+NO_SONGS_MSG = "No theme songs found in {path}, detecting without playback."
+NO_SOUND_MSG = "simpleaudio is not installed, theme songs will not be heard."
+
+
+class Clip:
+    """A decoded theme song, ready to hand to a sink.
+
+    Attributes:
+        name: The class name the clip belongs to
+        pcm: The interleaved little-endian PCM samples as bytes
+        sample_rate: The samples per second of each channel
+        channels: The number of channels
+        sample_width: The bytes per sample
+    """
+
+    def __init__(self, name: str, pcm: bytes, sample_rate: int, channels: int, sample_width: int):
+        self.name = name
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+
+    @property
+    def nbytes(self):
+        """The size of the PCM samples in bytes."""
+        return len(self.pcm)
+
+    @property
+    def duration(self):
+        """The length of the clip in seconds."""
+        return self.nbytes / (self.sample_rate * self.channels * self.sample_width)
+
+
+# Module Functions
+def decode_clip(name: str, path: str, sample_rate: int = DEFAULT_SAMPLE_RATE, channels: int = DEFAULT_CHANNELS):
+    """Decodes a song file to PCM.
+
+    WAV files are read as they are, other formats are converted by ffmpeg to
+    16 bit PCM at sample_rate with channels channels.
+
+    Args:
+        name: The class name the clip belongs to
+        path: The path of the song file
+
+    Returns: The decoded Clip
+    """
+    if path.lower().endswith(".wav"):
+        try:
+            with wave.open(path, "rb") as wav_file:
+                return Clip(name, wav_file.readframes(wav_file.getnframes()), wav_file.getframerate(),
+                            wav_file.getnchannels(), wav_file.getsampwidth())
+        except (wave.Error, EOFError) as error:
+            raise IOError(DECODE_ERR_MSG.format(path=path, error=error))
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError(FFMPEG_ERR_MSG.format(path=path))
+
+    result = subprocess.run([ffmpeg, "-v", "error", "-i", path, "-f", f"s{8 * DEFAULT_SAMPLE_WIDTH}le",
+                             "-ac", str(channels), "-ar", str(sample_rate), "-"], capture_output=True)
+    if result.returncode:
+        raise IOError(DECODE_ERR_MSG.format(path=path, error=result.stderr.decode(errors="replace").strip()))
+
+    return Clip(name, result.stdout, sample_rate, channels, DEFAULT_SAMPLE_WIDTH)
+
+
+def find_songs(songs_dir: str = DEFAULT_SONGS_PATH, class_names=None):
+    """Finds the theme song of every class in songs_dir.
+
+    A song belongs to the class its file is named after (without extension).
+
+    Args:
+        songs_dir: The path of the songs folder
+        class_names: A list of class names to keep songs for, or None for every song
+
+    Returns: A dictionary mapping class names to song paths
+    """
+    if not os.path.isdir(songs_dir):
+        return {}
+
+    songs = {}
+    for file_name in sorted(os.listdir(songs_dir)):
+        name, extension = os.path.splitext(file_name)
+        if extension.lower() in SONG_EXTENSIONS and (class_names is None or name in class_names):
+            songs.setdefault(name, os.path.join(songs_dir, file_name))
+
+    return songs
+
+
+class ClipCache:
+    """Decoded clips, least recently used first out once they take more than max_bytes.
+
+    A clip that is not cached is decoded when asked for, a clip larger than
+    max_bytes is decoded on every request and never cached. Safe to use from
+    several threads.
+
+    Attributes:
+        paths: A dictionary mapping class names to song paths
+        max_bytes: The largest number of PCM bytes kept
+        hits: An integer count of requests served from the cache
+        misses: An integer count of requests that had to decode
+        evictions: An integer count of clips dropped to make room
+    """
+
+    def __init__(self, paths: dict, max_bytes: int = DEFAULT_CACHE_BYTES, decoder=decode_clip):
+        """Initializes ClipCache.
+
+        Args:
+            paths: A dictionary mapping class names to song paths
+            max_bytes: The largest number of PCM bytes kept
+            decoder: Called with (name, path) to decode a clip, see decode_clip
+        """
+        self.paths = dict(paths)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._decoder = decoder
+        self._clips = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str):
+        return name in self._clips
+
+    @property
+    def nbytes(self):
+        """The number of PCM bytes currently cached."""
+        return self._nbytes
+
+    def get(self, name: str):
+        """Returns: The Clip of class name, or None if the class has no song"""
+        with self._lock:
+            clip = self._clips.get(name)
+            if clip is not None:
+                self._clips.move_to_end(name)
+                self.hits += 1
+                return clip
+
+        path = self.paths.get(name)
+        if path is None:
+            return None
+
+        # Decode outside the lock so cached clips can be served meanwhile
+        clip = self._decoder(name, path)
+        with self._lock:
+            self.misses += 1
+            self._insert(clip)
+        return clip
+
+    def _insert(self, clip: Clip):
+        if clip.nbytes > self.max_bytes or clip.name in self._clips:
+            return
+
+        self._clips[clip.name] = clip
+        self._nbytes += clip.nbytes
+        while self._nbytes > self.max_bytes:
+            _, evicted = self._clips.popitem(last=False)
+            self._nbytes -= evicted.nbytes
+            self.evictions += 1
+
+    def preload(self):
+        """Decodes every song until the cache is full, songs that fail to decode are skipped.
+
+        Returns: A list of the class names that were decoded
+        """
+        loaded = []
+        for name, path in self.paths.items():
+            try:
+                clip = self._decoder(name, path)
+            except (IOError, RuntimeError) as error:
+                print(error)
+                continue
+
+            with self._lock:
+                if self._nbytes + clip.nbytes > self.max_bytes:
+                    break
+                self._insert(clip)
+            loaded.append(name)
+
+        return loaded
+
+
+class NullSink:
+    """Plays nothing, reports the first sample as played the moment a clip arrives.
+
+    Attributes:
+        realtime: A boolean representing if play blocks for the clip's duration like a sound card
+        played: A list of the names of the clips played
+    """
+
+    def __init__(self, realtime: bool = False):
+        self.realtime = realtime
+        self.played = []
+        self._stop = threading.Event()
+
+    def play(self, clip: Clip, on_start):
+        on_start()
+        self.played.append(clip.name)
+        if self.realtime:
+            self._stop.wait(clip.duration)
+
+    def stop(self):
+        self._stop.set()
+
+
+class WavFileSink:
+    """Writes every played clip to a WAV file instead of a sound card.
+
+    Attributes:
+        output_dir: The folder the WAV files are written to
+        paths: A list of the paths written, in play order
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.paths = []
+        os.makedirs(output_dir, exist_ok=True)
+
+    def play(self, clip: Clip, on_start):
+        path = os.path.join(self.output_dir, f"{len(self.paths)}_{clip.name}.wav")
+        with wave.open(path, "wb") as wav_file:
+            wav_file.setnchannels(clip.channels)
+            wav_file.setsampwidth(clip.sample_width)
+            wav_file.setframerate(clip.sample_rate)
+            on_start()
+            wav_file.writeframes(clip.pcm)
+        self.paths.append(path)
+
+    def stop(self):
+        pass
+
+
+class SimpleAudioSink:
+    """Plays clips on the default sound card through simpleaudio."""
+
+    def __init__(self):
+        try:
+            import simpleaudio
+        except ImportError:
+            raise RuntimeError(SIMPLEAUDIO_ERR_MSG)
+
+        self._simpleaudio = simpleaudio
+        self._playing = None
+
+    def play(self, clip: Clip, on_start):
+        self._playing = self._simpleaudio.play_buffer(clip.pcm, clip.channels, clip.sample_width, clip.sample_rate)
+        # play_buffer returns once the samples are queued on the device
+        on_start()
+        self._playing.wait_done()
+
+    def stop(self):
+        if self._playing is not None:
+            self._playing.stop()
+
+
+def default_sink():
+    """Returns: A SimpleAudioSink, or a NullSink when simpleaudio is not installed"""
+    try:
+        return SimpleAudioSink()
+    except RuntimeError:
+        print(NO_SOUND_MSG)
+        return NullSink()
+
+
+class ThemeSongPlayer:
+    """Plays the theme song of recognized roommates without blocking the detector.
+
+    Triggers are queued and played one after the other on a background thread.
+
+    Attributes:
+        cache: The ClipCache clips are taken from
+        sink: The sink clips are played on (see NullSink)
+        cooldown: The seconds after a trigger before the same roommate can trigger again
+        min_confidence: The lowest prediction confidence that triggers a song
+        triggered: An integer count of triggers queued for playback
+        suppressed: An integer count of triggers ignored because of the cooldown
+        played: An integer count of clips handed to the sink
+        failed: An integer count of clips that could not be decoded or played
+    """
+
+    def __init__(self, songs: dict, sink=None, cooldown: float = DEFAULT_COOLDOWN,
+                 min_confidence: float = DEFAULT_MIN_CONFIDENCE, cache_bytes: int = DEFAULT_CACHE_BYTES,
+                 preload: bool = True):
+        """Initializes ThemeSongPlayer, decodes the songs and starts the playback thread.
+
+        Args:
+            songs: A dictionary mapping class names to song paths (see find_songs)
+            sink: The sink clips are played on, defaults to default_sink()
+            cooldown: The seconds after a trigger before the same roommate can trigger again
+            min_confidence: The lowest prediction confidence that triggers a song
+            cache_bytes: The largest number of decoded PCM bytes kept in memory
+            preload: A boolean representing if the songs are decoded now instead of on first trigger
+        """
+        self.cache = ClipCache(songs, cache_bytes)
+        self.sink = sink if sink is not None else default_sink()
+        self.cooldown = cooldown
+        self.min_confidence = min_confidence
+        self.triggered = 0
+        self.suppressed = 0
+        self.played = 0
+        self.failed = 0
+
+        if preload:
+            self.cache.preload()
+
+        self._last_triggers = {}
+        self._latencies = deque(maxlen=DEFAULT_LATENCY_WINDOW)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_songs_dir(cls, songs_dir: str = DEFAULT_SONGS_PATH, class_names=None, **kwargs):
+        """Makes a ThemeSongPlayer for the songs in songs_dir (see find_songs).
+
+        Returns: The ThemeSongPlayer, or None if songs_dir has no songs
+        """
+        songs = find_songs(songs_dir, class_names)
+        if not songs:
+            print(NO_SONGS_MSG.format(path=songs_dir))
+            return None
+        return cls(songs, **kwargs)
+
+    @property
+    def class_names(self):
+        """A list of the class names that have a song."""
+        return list(self.cache.paths)
+
+    def trigger(self, class_name: str, confidence: float = 1.0, now: float = None):
+        """Queues the theme song of class_name unless it is cooling down.
+
+        Meant to be called with every prediction, only returns the time it takes
+        to check the cooldown and queue the name.
+
+        Args:
+            class_name: The predicted class name
+            confidence: The confidence of the prediction
+            now: The time.monotonic time of the prediction, defaults to now
+
+        Returns: A boolean representing if the song was queued
+        """
+        if confidence < self.min_confidence or class_name not in self.cache.paths:
+            return False
+
+        now = time.monotonic() if now is None else now
+        last = self._last_triggers.get(class_name)
+        if last is not None and now - last < self.cooldown:
+            self.suppressed += 1
+            return False
+
+        self._last_triggers[class_name] = now
+        self.triggered += 1
+        self._queue.put((class_name, time.perf_counter()))
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            class_name, trigger_time = item
+            try:
+                clip = self.cache.get(class_name)
+                self.sink.play(clip, lambda: self._latencies.append(time.perf_counter() - trigger_time))
+                self.played += 1
+            except Exception as error:
+                self.failed += 1
+                print(PLAYBACK_ERR_MSG.format(name=class_name, error=error))
+            finally:
+                self._queue.task_done()
+
+    def wait(self):
+        """Waits until every queued song has been played."""
+        self._queue.join()
+
+    def latency_ms(self, percentile: float):
+        """Returns: The percentile of the recent trigger to first sample latencies in milliseconds, 0 without any"""
+        if not self._latencies:
+            return 0.0
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))] * 1000
+
+    def close(self):
+        """Stops the song playing, drops the queued ones and stops the playback thread."""
+        while True:
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+            except queue.Empty:
+                break
+        self.sink.stop()
+        self._queue.put(None)
+        self._thread.join()
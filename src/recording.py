@@ -0,0 +1,336 @@
+"""Used to record camera sessions and replay them in place of a camera.
+
+A recording is a folder of raw BGR frames in chunked .npy files, plus the time
+every frame was captured:
+
+    recordings/session_2024_1_31_18_5_2_/
+        meta.json           width, height, frame count, chunk size, source fps
+        timestamps.npy      seconds since the first frame, one per frame
+        chunk_00000.npy     frames 0 to chunk_frames - 1, (chunk_frames, height, width, 3) uint8
+        chunk_00001.npy     ...
+
+Frames are stored losslessly, so a replay hands the detector exactly the pixels
+the camera did and results are repeatable. Chunks are memory mapped when
+replayed, nothing is decoded.
+
+ReplayCapture reads a recording like a camera (see data_collect.ThreadedCamCapture),
+either at the recorded timing or as fast as the consumer reads, so detection and
+dataset extraction can be tested offline at full CPU speed.
+
+    Typical usage example:
+
+    path = record_session(source=0, max_seconds=30)
+    detect_headless(model_path, source=path)
+"""
+import json
+import numpy as np
+import os
+import time
+
+from data_collect import ThreadedCamCapture, ImageWriter, get_time_string, DEFAULT_DATASET_PATH, DEFAULT_READ_TIMEOUT
+from PIL import Image
+
+DEFAULT_RECORDINGS_PATH = os.path.join(os.getcwd(), "recordings")
+SESSION_PREFIX = "session_"
+META_FILE_NAME = "meta.json"
+TIMESTAMPS_FILE_NAME = "timestamps.npy"
+CHUNK_FILE_NAME = "chunk_{index:05d}.npy"
+
+# Defaults for SessionRecorder class, 64 VGA frames make a 59MB chunk
+DEFAULT_CHUNK_FRAMES = 64
+
+# Output format strings for record_session and extract_dataset
+RECORDING_MSG = "Recording to {path} (Ctrl-C to stop)"
+RECORDED_MSG = "Recorded {frames} frames in {seconds:.1f}s"
+EXTRACTED_MSG = "Extracted {written} images from {frames} frames ({duplicates} near-duplicates skipped)"
+
+# Default error messages for recordings
+NOT_A_RECORDING_ERR_MSG = "Not a recording: "
+FRAME_SIZE_ERR_MSG = "Frame is {got}, the recording is {expected}"
+
+
+def is_recording(path):
+    """Returns: A boolean representing if path is a recording folder"""
+    return isinstance(path, str) and os.path.isfile(os.path.join(path, META_FILE_NAME))
+
+
+class SessionRecorder:
+    """Writes frames and their capture times into a recording folder.
+
+    Frames go straight into a memory mapped chunk file, the chunk is flushed to
+    disk once it is full.
+
+    Attributes:
+        path: The path of the recording folder
+        chunk_frames: The number of frames per chunk file
+        frames: An integer count of frames written
+    """
+
+    def __init__(self, path: str, chunk_frames: int = DEFAULT_CHUNK_FRAMES, source_fps: float = 0.0):
+        """Initializes SessionRecorder and creates the recording folder.
+
+        Args:
+            path: The path of the recording folder to create
+            chunk_frames: The number of frames per chunk file
+            source_fps: The frame rate the source reported, kept in the metadata
+        """
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.frames = 0
+
+        self._source_fps = source_fps
+        self._shape = None
+        self._chunk = None
+        self._timestamps = []
+        self._start = None
+        os.makedirs(path)
+
+    def write(self, frame: np.ndarray, timestamp: float = None):
+        """Appends a BGR frame to the recording.
+
+        Args:
+            frame: The frame, every frame of a recording has the same size
+            timestamp: The time.perf_counter time the frame was captured, defaults to now
+        """
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+        if self._shape is None:
+            self._shape = frame.shape
+            self._start = timestamp
+        elif frame.shape != self._shape:
+            raise ValueError(FRAME_SIZE_ERR_MSG.format(got=frame.shape, expected=self._shape))
+
+        row = self.frames % self.chunk_frames
+        if row == 0:
+            self._flush()
+            self._chunk = np.lib.format.open_memmap(
+                os.path.join(self.path, CHUNK_FILE_NAME.format(index=self.frames // self.chunk_frames)),
+                mode="w+", dtype=np.uint8, shape=(self.chunk_frames, *self._shape))
+
+        self._chunk[row] = frame
+        self._timestamps.append(timestamp - self._start)
+        self.frames += 1
+
+    def _flush(self):
+        if self._chunk is not None:
+            self._chunk.flush()
+            self._chunk = None
+
+    def close(self):
+        """Finishes the last chunk and writes the timestamps and metadata."""
+        used = self.frames % self.chunk_frames
+        if self._chunk is not None and used:
+            # Cut the unused rows off the last chunk
+            filename = self._chunk.filename
+            frames = np.array(self._chunk[:used])
+            self._chunk = None
+            np.save(filename, frames)
+        self._flush()
+
+        np.save(os.path.join(self.path, TIMESTAMPS_FILE_NAME), np.array(self._timestamps, dtype=np.float64))
+        height, width = self._shape[:2] if self._shape is not None else (0, 0)
+        with open(os.path.join(self.path, META_FILE_NAME), "w") as meta_file:
+            json.dump({"width": width, "height": height, "frames": self.frames,
+                       "chunk_frames": self.chunk_frames, "fps": self._source_fps}, meta_file, indent=2)
+
+
+class ReplayCapture:
+    """Reads a recording like a camera, for consumers of data_collect.ThreadedCamCapture.
+
+    In realtime mode frames become available at their recorded times: read_latest
+    skips frames that are already late like a live camera would, read_next hands
+    out every frame but waits for its time. Otherwise every frame is available
+    at once and both read every frame in order, as fast as they are called.
+
+    Attributes:
+        path: The path of the recording folder
+        realtime: A boolean representing if the recorded timing is kept
+        width: An integer for the frame width
+        height: An integer for the frame height
+        fps: A float for the frame rate of the recorded source (0 if it did not report it)
+        fourcc: A string of the four character code of the capture format, "raw"
+        frame_count: An integer count of frames in the recording
+        timestamps: An array of the seconds since the first frame of every frame
+        finished: A boolean representing if every frame has been read
+    """
+
+    def __init__(self, path: str, realtime: bool = False):
+        """Opens the recording at path.
+
+        Args:
+            path: The path of the recording folder
+            realtime: A boolean representing if frames are replayed at their recorded times
+        """
+        if not is_recording(path):
+            raise IOError(NOT_A_RECORDING_ERR_MSG + str(path))
+
+        with open(os.path.join(path, META_FILE_NAME), "r") as meta_file:
+            meta = json.load(meta_file)
+
+        self.path = path
+        self.realtime = realtime
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.fps = meta["fps"]
+        self.fourcc = "raw"
+        self.frame_count = meta["frames"]
+        self.timestamps = np.load(os.path.join(path, TIMESTAMPS_FILE_NAME))
+        self.finished = self.frame_count == 0
+
+        self._chunk_frames = meta["chunk_frames"]
+        self._chunk_index = None
+        self._chunk = None
+        self._position = 0
+        self._last_frame = None
+        self._start = None
+
+    def _frame(self, position: int):
+        """Returns: The frame at position, memory mapped from its chunk"""
+        chunk_index = position // self._chunk_frames
+        if chunk_index != self._chunk_index:
+            self._chunk = np.load(os.path.join(self.path, CHUNK_FILE_NAME.format(index=chunk_index)), mmap_mode="r")
+            self._chunk_index = chunk_index
+        return self._chunk[position % self._chunk_frames]
+
+    def _elapsed(self):
+        """Returns: The seconds since the replay started, starting it on the first call"""
+        if self._start is None:
+            self._start = time.perf_counter()
+        return time.perf_counter() - self._start
+
+    def _hand_out(self, position: int):
+        self._last_frame = self._frame(position)
+        self._position = position + 1
+        self.finished = self._position >= self.frame_count
+        return True, self._last_frame
+
+    @property
+    def exhausted(self):
+        """A boolean representing if every frame has been read."""
+        return self.finished
+
+    def read_next(self, timeout: float = DEFAULT_READ_TIMEOUT):
+        """Returns the next frame, waiting up to timeout seconds for its time in realtime mode.
+
+        Returns: A tuple of a boolean representing if a frame was read and the BGR frame
+        """
+        if self.finished:
+            return False, None
+
+        if self.realtime:
+            wait = self.timestamps[self._position] - self._elapsed()
+            if wait > timeout:
+                time.sleep(timeout)
+                return False, None
+            if wait > 0:
+                time.sleep(wait)
+
+        return self._hand_out(self._position)
+
+    def read_latest(self, timeout: float = DEFAULT_READ_TIMEOUT, repeat: bool = True):
+        """Returns the newest frame whose time has come, skipping older ones in realtime mode.
+
+        Like a live camera, the previous frame is handed out again when no new frame
+        is due yet, unless repeat is False. Without realtime this is the same as read_next.
+
+        Returns: A tuple of a boolean representing if a frame was read and the BGR frame
+        """
+        if not self.realtime or self._last_frame is None:
+            return self.read_next(timeout)
+        if self.finished:
+            return False, None
+
+        due = int(np.searchsorted(self.timestamps, self._elapsed(), side="right")) - 1
+        if due < self._position:
+            if not repeat:
+                return False, None
+            return True, self._last_frame
+        return self._hand_out(due)
+
+    def read(self):
+        """Same as read_latest, so display loops always show the freshest frame."""
+        return self.read_latest()
+
+    def close(self):
+        """Releases the memory mapped chunk."""
+        self._chunk = None
+        self._chunk_index = None
+
+
+# Module Functions
+def record_session(path: str = None, source=0, max_frames: int = None, max_seconds: float = None,
+                   chunk_frames: int = DEFAULT_CHUNK_FRAMES, **capture_settings):
+    """Records every frame of a camera (or video file) until a limit, the end of the source or Ctrl-C.
+
+    Args:
+        path: The path of the recording folder to create, defaults to a
+              timestamped folder in the default recordings path
+        source: A camera device index or the path of a video file
+        max_frames: The largest number of frames to record, None for no limit
+        max_seconds: The longest time to record, None for no limit
+        chunk_frames: The number of frames per chunk file
+        capture_settings: The width, height, fps and fourcc to request, see data_collect.CamCapture
+
+    Returns: The path of the recording folder
+    """
+    if path is None:
+        path = os.path.join(DEFAULT_RECORDINGS_PATH, f"{SESSION_PREFIX}{get_time_string()}")
+
+    # Keep every frame, the grabber waits for the recorder instead of dropping frames
+    capture = ThreadedCamCapture(source, drop_when_full=False, **capture_settings)
+    recorder = SessionRecorder(path, chunk_frames, capture.fps)
+    print(RECORDING_MSG.format(path=path))
+
+    start = time.perf_counter()
+    try:
+        while max_frames is None or recorder.frames < max_frames:
+            if max_seconds is not None and time.perf_counter() - start >= max_seconds:
+                break
+
+            ret, frame = capture.read_next()
+            if not ret:
+                if capture.finished:
+                    break
+                continue
+            recorder.write(frame)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.close()
+        recorder.close()
+
+    print(RECORDED_MSG.format(frames=recorder.frames, seconds=time.perf_counter() - start))
+    return path
+
+
+def extract_dataset(recording_path: str, name: str, dataset_path: str = DEFAULT_DATASET_PATH, every: int = 1,
+                    cropper=None, encoder: str = "png"):
+    """Saves frames of a recording into a dataset folder, like create_dataset does from a camera.
+
+    Near-duplicate frames are skipped by the data_collect.ImageWriter.
+
+    Args:
+        recording_path: The path of the recording folder
+        name: The name of the dataset, images go into dataset_path/name
+        dataset_path: The path of the datasets folder
+        every: An integer, every every-th frame is saved
+        cropper: A roi.FaceCropper to save only the cropped faces of a frame, or None
+        encoder: One of "png", "jpeg" or "webp"
+
+    Returns: The data_collect.ImageWriter, with its written and duplicates counts
+    """
+    replay = ReplayCapture(recording_path)
+    class_path = os.path.join(dataset_path, name)
+    os.makedirs(class_path, exist_ok=True)
+
+    writer = ImageWriter(encoder, cropper=cropper)
+    try:
+        for position in range(0, replay.frame_count, max(1, every)):
+            frame = replay._frame(position)
+            # Frames are stored BGR like the camera delivers them
+            writer.submit(name, class_path, Image.fromarray(frame[:, :, ::-1]), block=True)
+    finally:
+        writer.close()
+        replay.close()
+
+    print(EXTRACTED_MSG.format(written=writer.written, frames=replay.frame_count, duplicates=writer.duplicates))
+    return writer
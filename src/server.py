@@ -0,0 +1,308 @@
+"""Used to serve a roommate classifier to several programs from one warm process.
+
+Loading the Keras model costs seconds and hundreds of MB per program. The
+server loads it once and answers predictions over HTTP on localhost, so the
+detector, a doorbell script and offline tools can share it. Requests that
+arrive within a few milliseconds of each other are coalesced by a
+DynamicBatcher into one model call.
+
+Endpoints (frames and probabilities travel as .npy bytes):
+
+    POST /predict   body: a (batch, height, width, 3) array of RGB frames in [0, 255]
+                    response: a (batch, classes) array of class probabilities
+    GET  /info      the model's input_shape and class_names as JSON
+    GET  /stats     queue depth, batch size histogram and request latency as JSON
+
+Clients use backends.ServiceBackend, load_backend picks it for http:// paths.
+
+    Typical usage example:
+
+    serve("model/cat_dog_model.h5", port=8765)
+    backend = load_backend("http://127.0.0.1:8765")
+"""
+import io
+import json
+import numpy as np
+import threading
+import time
+
+from backends import load_backend, DEFAULT_NUM_THREADS
+from collections import Counter, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Defaults for serve
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Defaults for DynamicBatcher class
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT = 0.005
+DEFAULT_LATENCY_WINDOW = 1000
+
+# Output format strings for serve
+SERVING_MSG = "Serving {model} on http://{host}:{port} (Ctrl-C to stop)"
+STATS_MSG = ("{requests} requests in {batches} batches, queue depth max {max_queue_depth}, "
+             "latency p50 {p50:.2f}ms, p99 {p99:.2f}ms\nBatch sizes: {batch_sizes}")
+
+# Default error messages for the server
+INPUT_SHAPE_ERR_MSG = "Expected frames shaped (batch, {shape}), got {got}"
+BATCHER_CLOSED_ERR_MSG = "The batcher is closed."
+
+
+def encode_array(array: np.ndarray):
+    """Returns: The .npy bytes of array"""
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_array(data: bytes):
+    """Returns: The array stored in .npy bytes"""
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+class DynamicBatcher:
+    """Coalesces concurrent prediction requests into batched backend calls.
+
+    The batching thread takes the oldest request, then keeps adding requests
+    that arrive within max_wait seconds until the batch holds max_batch_size
+    frames. One backend call runs on the whole batch and every request gets its
+    own rows of the result.
+
+    Attributes:
+        backend: The backend predictions run on (see backends.py)
+        max_batch_size: The largest number of frames in one backend call
+        max_wait: The seconds the first request of a batch waits for others to join
+        batch_sizes: A Counter of the number of frames in every backend call
+        requests: An integer count of requests answered
+        max_queue_depth: The largest number of requests that were waiting at once
+    """
+
+    def __init__(self, backend, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait: float = DEFAULT_MAX_WAIT):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.max_queue_depth = 0
+
+        self._queue = deque()
+        self._latencies = deque(maxlen=DEFAULT_LATENCY_WINDOW)
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self):
+        """The number of requests waiting for a batch."""
+        return len(self._queue)
+
+    def submit(self, frames: np.ndarray):
+        """Queues frames for prediction without waiting for the result.
+
+        Returns: A concurrent.futures.Future of the class probabilities of frames
+        """
+        if frames.ndim != 4 or tuple(frames.shape[1:]) != tuple(self.backend.input_shape):
+            raise ValueError(INPUT_SHAPE_ERR_MSG.format(shape=tuple(self.backend.input_shape), got=frames.shape))
+
+        future = Future()
+        with self._condition:
+            if not self._running:
+                raise RuntimeError(BATCHER_CLOSED_ERR_MSG)
+            self._queue.append((frames, future, time.perf_counter()))
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            self._condition.notify()
+        return future
+
+    def predict(self, frames: np.ndarray):
+        """Returns the class probabilities of frames, waiting for their batch."""
+        return self.submit(frames).result()
+
+    def _next_batch(self):
+        """Waits for requests and takes as many as fit in a batch.
+
+        Returns: A list of (frames, future, arrival time) tuples, empty once closed
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._queue or not self._running)
+            if not self._queue:
+                return []
+
+            # Give concurrent requests max_wait seconds from the oldest one to join the batch
+            deadline = self._queue[0][2] + self.max_wait
+            while self._running and sum(len(item[0]) for item in self._queue) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = [self._queue.popleft()]
+            size = len(batch[0][0])
+            while self._queue and size + len(self._queue[0][0]) <= self.max_batch_size:
+                size += len(self._queue[0][0])
+                batch.append(self._queue.popleft())
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            try:
+                probabilities = self.backend.predict(np.concatenate([frames for frames, _, _ in batch]))
+            except Exception as error:
+                for _, future, _ in batch:
+                    future.set_exception(error)
+                continue
+
+            done = time.perf_counter()
+            self.batch_sizes[len(probabilities)] += 1
+            start = 0
+            for frames, future, arrival in batch:
+                future.set_result(probabilities[start:start + len(frames)])
+                start += len(frames)
+                self._latencies.append(done - arrival)
+                self.requests += 1
+
+    def stats(self):
+        """Returns: A dictionary of the request counts, queue depth, batch size histogram and latency (ms)"""
+        latencies_ms = np.array(self._latencies or [0.0]) * 1000
+        return {
+            "requests": self.requests,
+            "batches": sum(self.batch_sizes.values()),
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p99": float(np.percentile(latencies_ms, 99)),
+        }
+
+    def close(self):
+        """Answers the queued requests and stops the batching thread."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join()
+
+
+class _PredictionHandler(BaseHTTPRequestHandler):
+    """Answers the endpoints of InferenceServer."""
+
+    # Keep-alive so clients do not reconnect for every frame
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, Nagle would hold the body back ~40ms
+    disable_nagle_algorithm = True
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, content):
+        self._send(status, json.dumps(content).encode(), "application/json")
+
+    def do_GET(self):
+        if self.path == "/info":
+            self._send_json(200, self.server.info)
+        elif self.path == "/stats":
+            self._send_json(200, self.server.batcher.stats())
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+
+        try:
+            probabilities = self.server.batcher.predict(decode_array(body))
+        except ValueError as error:
+            self._send_json(400, {"error": str(error)})
+            return
+
+        self._send(200, encode_array(probabilities), "application/octet-stream")
+
+    def log_message(self, format, *args):
+        # A line per frame would flood the terminal, /stats has the numbers
+        pass
+
+
+class InferenceServer(ThreadingHTTPServer):
+    """HTTP server that answers predictions through a DynamicBatcher.
+
+    Attributes:
+        batcher: The DynamicBatcher requests go through
+        info: A dictionary of the model's input_shape and class_names, served on /info
+    """
+
+    daemon_threads = True
+
+    def __init__(self, backend, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, class_names=None,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait: float = DEFAULT_MAX_WAIT):
+        """Initializes InferenceServer and binds it, call serve_forever to answer requests.
+
+        Args:
+            backend: The backend predictions run on (see backends.py)
+            host: The address to listen on, keep it on localhost, there is no authentication
+            port: The port to listen on, 0 picks a free one
+            class_names: A list of the class names the model predicts, defaults to the backend's own
+            max_batch_size: The largest number of frames in one backend call
+            max_wait: The seconds the first request of a batch waits for others to join
+        """
+        super().__init__((host, port), _PredictionHandler)
+        self.batcher = DynamicBatcher(backend, max_batch_size, max_wait)
+        if class_names is None:
+            class_names = getattr(backend, "class_names", None)
+        self.info = {"input_shape": list(backend.input_shape), "class_names": class_names}
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+
+
+# Module Functions
+def serve(model_path: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          num_threads: int = DEFAULT_NUM_THREADS, class_names=None,
+          max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait: float = DEFAULT_MAX_WAIT):
+    """Loads a model once and serves predictions until Ctrl-C, then prints the statistics.
+
+    Args:
+        model_path: The model to serve: a SavedModel folder (see cnn.export_inference_model), a tf.keras
+                    .h5 model, a .tflite model, a .npz embedding index or a .cascade.json cascade
+        host: The address to listen on
+        port: The port to listen on
+        num_threads: The number of threads the inference backend may use
+        class_names: A list of the class names the model predicts, served to clients on /info
+        max_batch_size: The largest number of frames in one backend call
+        max_wait: The seconds the first request of a batch waits for others to join
+
+    Returns: The statistics dictionary of the batcher (see DynamicBatcher.stats)
+    """
+    backend = load_backend(model_path, num_threads)
+    if class_names is None:
+        # detector pulls in tkinter and OpenCV, which the server does not need otherwise
+        from detector import _resolve_class_names
+        try:
+            class_names = _resolve_class_names(backend)
+        except FileNotFoundError:
+            # Clients then name the classes themselves
+            class_names = None
+
+    server = InferenceServer(backend, host, port, class_names, max_batch_size, max_wait)
+    print(SERVING_MSG.format(model=model_path, host=host, port=server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    stats = server.batcher.stats()
+    print(STATS_MSG.format(**stats))
+    return stats
@@ -0,0 +1,266 @@
+"""Used to tune the hyperparameters of the CNN in cnn.py.
+
+Every combination of a search space (or a random sample of them) is trained as
+a trial in a pool of worker processes. Each worker is limited to a few
+TensorFlow threads, so trials running side by side do not fight over the same
+cores. The dataset is decoded once into a dataset_cache.DatasetCache before the
+pool starts, and every trial memory maps the same frames file, so the OS page
+cache holds one copy of the frames for all of them.
+
+Trial models and the leaderboard are written to model_output_dir:
+
+    model/cat_dog_sweep/trial_3.h5
+    model/cat_dog_sweep/leaderboard.json
+    model/cat_dog_sweep/leaderboard.csv
+
+    Typical usage example:
+
+    run_sweep(dataset_dir, model_output_dir, "cat_dog", 320, 240,
+              {"dropout": [0.1, 0.3], "dense_units": [64, 128]})
+"""
+import backends
+import cnn
+import contextlib
+import csv
+import data_collect
+import dataset_cache
+import itertools
+import json
+import multiprocessing
+import numpy as np
+import os
+import random
+import tensorflow as tf
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tensorflow import keras
+
+# Hyperparameters a search space can contain, batch_size goes to model.fit and
+# the rest to cnn._build_model
+SEARCH_SPACE_KEYS = ("batch_size", "rotation", "zoom", "dropout", "filters", "dense_units")
+DEFAULT_SEARCH_SPACE = {
+    "batch_size": [16, 32],
+    "dropout": [0.2, 0.4],
+    "rotation": [0.0, 0.1],
+    "dense_units": [64, 128],
+}
+
+# Defaults for run_sweep
+DEFAULT_THREADS_PER_TRIAL = 2
+DEFAULT_SWEEP_SEED = 123
+SWEEP_DIR_SUFFIX = "_sweep"
+LEADERBOARD_FILE_NAME = "leaderboard"
+LEADERBOARD_COLUMNS = ("rank", "trial", "accuracy", "seconds", "size_kb", "latency_ms", "epochs", "path")
+
+# Output format strings for run_sweep
+TRIAL_DONE_MSG = "Trial {trial} done ({done}/{total}): accuracy {accuracy:.4f}, {seconds:.1f}s"
+TRIAL_FAILED_MSG = "Trial {trial} failed: {error}"
+LEADERBOARD_HEADER = f"{'rank':<6}{'trial':<7}{'accuracy':>10}{'seconds':>10}{'size kB':>10}{'ms/frame':>10}  hyperparameters"
+LEADERBOARD_ROW = ("{rank:<6}{trial:<7}{accuracy:>10.4f}{seconds:>10.1f}{size_kb:>10.1f}{latency_ms:>10.2f}"
+                   "  {hyperparameters}")
+
+# Default error messages for run_sweep
+SEARCH_SPACE_ERR_MSG = "Unknown hyperparameter in search space: "
+NO_TRIALS_ERR_MSG = "Every trial of the sweep failed."
+
+
+def expand_search_space(search_space: dict, max_trials: int = None, seed: int = DEFAULT_SWEEP_SEED):
+    """Turns a search space into the hyperparameters of every trial.
+
+    Args:
+        search_space: A dictionary mapping hyperparameter names to lists of values to try
+        max_trials: The largest number of trials, a random sample of the grid is
+                    taken when it has more combinations, None for the full grid
+        seed: The seed of the random sample
+
+    Returns: A list of hyperparameter dictionaries, one per trial
+    """
+    for key in search_space:
+        if key not in SEARCH_SPACE_KEYS:
+            raise ValueError(SEARCH_SPACE_ERR_MSG + key)
+
+    keys = sorted(search_space)
+    # JSON search spaces give lists, layer widths are kept as tuples like cnn.DEFAULT_FILTERS
+    values = [[tuple(value) if isinstance(value, list) else value for value in search_space[key]] for key in keys]
+    trials = [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
+    if max_trials is not None and max_trials < len(trials):
+        trials = random.Random(seed).sample(trials, max_trials)
+
+    return trials
+
+
+@contextlib.contextmanager
+def _thread_limit_env(num_threads: int):
+    """Sets the thread count environment variables the worker processes start with.
+
+    OpenMP and the TensorFlow runtime read these when they load, before the
+    worker initializer gets to run.
+    """
+    names = ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS")
+    saved = {name: os.environ.get(name) for name in names}
+    os.environ.update({"OMP_NUM_THREADS": str(num_threads), "TF_NUM_INTRAOP_THREADS": str(num_threads),
+                       "TF_NUM_INTEROP_THREADS": "1"})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _init_worker(num_threads: int):
+    """Limits the TensorFlow threads of a worker process."""
+    tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def _run_trial(trial: int, hyperparameters: dict, dataset_dir: str, cache_dir: str, img_width: int,
+               img_height: int, epochs: int, patience: int, sweep_dir: str, num_threads: int, seed: int):
+    """Trains and measures one trial in a worker process.
+
+    The cache is only read here, run_sweep already brought it up to date.
+
+    Returns: A dictionary of the trial results
+    """
+    tf.keras.utils.set_random_seed(seed + trial)
+
+    model_hyperparameters = dict(hyperparameters)
+    batch_size = model_hyperparameters.pop("batch_size", cnn.DEFAULT_BATCH_SIZE)
+
+    cache = dataset_cache.DatasetCache(dataset_dir, img_width, img_height, cache_dir)
+    model = cnn._build_model(len(cache.class_names), img_width, img_height, **model_hyperparameters)
+
+    callbacks = []
+    if patience is not None:
+        callbacks.append(keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience,
+                                                       restore_best_weights=True))
+
+    start = time.perf_counter()
+    history = model.fit(
+        cache.dataset("training", batch_size),
+        validation_data=cache.dataset("validation", batch_size),
+        epochs=epochs,
+        callbacks=callbacks,
+        verbose=0
+    )
+    seconds = time.perf_counter() - start
+
+    path = os.path.join(sweep_dir, f"trial_{trial}.h5")
+    model.save(path)
+
+    # Measure the saved model the way detector runs it, one frame at a time
+    rows, labels = cache.split("validation")
+    images = np.asarray(cache.frames()[rows])
+    accuracy, latency_ms = cnn._evaluate_backend(backends.load_backend(path, num_threads), images, labels)
+
+    return {"trial": trial, "hyperparameters": hyperparameters, "accuracy": accuracy, "seconds": seconds,
+            "size_kb": os.path.getsize(path) / 1024, "latency_ms": latency_ms,
+            "epochs": len(history.history['loss']), "path": path, "history": history.history}
+
+
+def _write_leaderboard(results: list, sweep_dir: str):
+    """Writes the ranked results as JSON and CSV into sweep_dir."""
+    with open(os.path.join(sweep_dir, f"{LEADERBOARD_FILE_NAME}.json"), "w") as json_file:
+        json.dump([{key: value for key, value in result.items() if key != "history"} for result in results],
+                  json_file, indent=2)
+
+    hyperparameter_names = sorted({name for result in results for name in result["hyperparameters"]})
+    with open(os.path.join(sweep_dir, f"{LEADERBOARD_FILE_NAME}.csv"), "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow([*LEADERBOARD_COLUMNS, *hyperparameter_names])
+        for result in results:
+            writer.writerow([result[column] for column in LEADERBOARD_COLUMNS] +
+                            [result["hyperparameters"].get(name, "") for name in hyperparameter_names])
+
+
+def run_sweep(dataset_dir, model_output_dir, model_name, img_width, img_height, search_space=None,
+              max_trials=None, workers=None, threads_per_trial=DEFAULT_THREADS_PER_TRIAL,
+              epochs=cnn.DEFAULT_EPOCH_AMOUNT, patience=cnn.DEFAULT_PATIENCE, seed=DEFAULT_SWEEP_SEED,
+              save_policy=cnn.SAVE_POLICY_PROMPT):
+    """Trains a trial per hyperparameter combination in parallel and saves the best model.
+
+    Trials are ranked by validation accuracy, ties by latency. The best model is
+    saved through cnn._handle_save_data like make_and_train_model saves its model.
+
+    Args:
+        dataset_dir: The path of the dataset
+                     directory (containing all subfolders with training examples)
+        model_output_dir: The path to save the best model, the trials and the leaderboard
+        model_name: The name of the best model when saved into model_output_dir
+        img_width: The width images are resized to
+        img_height: The height images are resized to
+        search_space: A dictionary mapping hyperparameter names (see SEARCH_SPACE_KEYS)
+                      to lists of values to try, defaults to DEFAULT_SEARCH_SPACE
+        max_trials: The largest number of trials, None to train the full grid
+        workers: The number of trials trained at once, defaults to the cores divided
+                 by threads_per_trial
+        threads_per_trial: The number of TensorFlow threads each trial may use
+        epochs: The largest number of epochs per trial
+        patience: The number of epochs without a lower val_loss before a trial stops,
+                  None to always train for epochs
+        seed: The seed of the trial sample and of every trial's weights
+        save_policy: What to do when the best model's file already exists,
+                     "prompt" to ask, "overwrite" or "timestamp" to run unattended
+
+    Returns:
+        A list of the trial results, best first.
+    """
+    trials = expand_search_space(DEFAULT_SEARCH_SPACE if search_space is None else search_space, max_trials, seed)
+
+    if not cnn._paths_exist(dataset_dir, model_output_dir):
+        return
+
+    # Decode the dataset once here, the trials only read the memory mapped frames
+    cache = dataset_cache.DatasetCache(dataset_dir, img_width, img_height)
+    added, removed = cache.update()
+    print(f"Dataset cache: {len(cache)} images ({added} decoded, {removed} removed)")
+
+    sweep_dir = os.path.join(model_output_dir, f"{data_collect.normalize(model_name)}{SWEEP_DIR_SUFFIX}")
+    os.makedirs(sweep_dir, exist_ok=True)
+
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // threads_per_trial)
+    workers = min(workers, len(trials))
+
+    results = []
+    # TensorFlow is not fork safe once it is loaded, so workers are started fresh
+    with _thread_limit_env(threads_per_trial), \
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                initializer=_init_worker, initargs=(threads_per_trial,)) as pool:
+        futures = {pool.submit(_run_trial, trial, hyperparameters, dataset_dir, cache.cache_dir, img_width,
+                               img_height, epochs, patience, sweep_dir, threads_per_trial, seed): trial
+                   for trial, hyperparameters in enumerate(trials)}
+
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as error:
+                print(TRIAL_FAILED_MSG.format(trial=futures[future], error=error))
+                continue
+
+            results.append(result)
+            print(TRIAL_DONE_MSG.format(done=len(results), total=len(trials), **result))
+
+    if not results:
+        raise RuntimeError(NO_TRIALS_ERR_MSG)
+
+    results.sort(key=lambda result: (-result["accuracy"], result["latency_ms"]))
+    for rank, result in enumerate(results, start=1):
+        result["rank"] = rank
+
+    _write_leaderboard(results, sweep_dir)
+
+    print(LEADERBOARD_HEADER)
+    for result in results:
+        print(LEADERBOARD_ROW.format(**result))
+
+    best = results[0]
+    model_path = cnn._handle_save_data(tf.keras.models.load_model(best["path"]), cnn._plot_history(best["history"]),
+                                       model_output_dir, model_name, save_policy)
+    cnn._export_trained_model(model_path)
+
+    return results
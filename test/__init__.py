@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modules in src import each other by their flat module names (they are run from
+# inside src), so src has to be importable as a top level path for the tests too
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,136 @@
+import unittest
+import json
+import os
+import tempfile
+import numpy as np
+import tensorflow as tf
+from unittest import mock
+from src import backends
+from src import cnn
+
+
+class StubBackend:
+    """Stands in for a model backend, answers with fixed probabilities and keeps what it was given."""
+
+    def __init__(self, input_shape, probabilities):
+        self.input_shape = input_shape
+        self.probabilities = np.array(probabilities, dtype=np.float32)
+        self.batches = []
+
+    def predict(self, batch):
+        self.batches.append(batch)
+        return np.repeat(self.probabilities[np.newaxis], len(batch), axis=0)
+
+
+class ConfidenceByBrightness(StubBackend):
+    """Gatekeeper stand-in that is sure about bright frames only."""
+
+    def predict(self, batch):
+        self.batches.append(batch)
+        return np.array([[0.95, 0.05] if frame.mean() > 127 else [0.6, 0.4] for frame in batch], dtype=np.float32)
+
+
+class BackendsTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in backends.py
+    """
+
+    def test_softmax(self):
+        probabilities = backends.softmax(np.array([[0.0, 0.0], [1.0, 2.0], [1000.0, 0.0]], dtype=np.float32))
+
+        np.testing.assert_allclose([[0.5, 0.5], [0.26894142, 0.73105858], [1.0, 0.0]], probabilities, rtol=1e-6)
+        np.testing.assert_allclose([1.0, 1.0, 1.0], probabilities.sum(axis=-1), rtol=1e-6)
+
+    def test_load_backend_dispatch(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            saved_model_path = os.path.join(tmp_dir, f"door_model{backends.SAVED_MODEL_SUFFIX}")
+            os.makedirs(saved_model_path)
+            open(os.path.join(saved_model_path, backends.SAVED_MODEL_FILE_NAME), "w").close()
+
+            expected = {"http://localhost:8000": "ServiceBackend",
+                        f"door{backends.CASCADE_SUFFIX}": "CascadeBackend",
+                        saved_model_path: "SavedModelBackend",
+                        "door_model_int8.tflite": "TFLiteBackend",
+                        "door_model.h5": "KerasBackend"}
+            for model_path, backend_name in expected.items():
+                with mock.patch.multiple(backends, ServiceBackend=mock.DEFAULT, CascadeBackend=mock.DEFAULT,
+                                         SavedModelBackend=mock.DEFAULT, TFLiteBackend=mock.DEFAULT,
+                                         KerasBackend=mock.DEFAULT) as patched:
+                    backend = backends.load_backend(model_path, num_threads=2)
+
+                called = [name for name, backend_class in patched.items()
+                          if backend_class.called or backend_class.from_file.called]
+                self.assertEqual([backend_name], called, model_path)
+                self.assertIsNotNone(backend)
+
+        # Embedding indexes are opened by embeddings.py, which imports this module
+        with mock.patch("embeddings.EmbeddingBackend") as embedding_backend:
+            backends.load_backend("door.npz", num_threads=2)
+        embedding_backend.from_index_file.assert_called_once_with("door.npz", 2)
+
+    def test_tflite_round_trip(self):
+        model = cnn._build_model(2, 32, 24)
+        frames = np.random.default_rng(0).integers(0, 256, (3, 24, 32, 3), dtype=np.uint8)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = os.path.join(tmp_dir, "door_model.h5")
+            model.save(model_path)
+            tflite_path = os.path.join(tmp_dir, "door_model.tflite")
+            with open(tflite_path, "wb") as model_file:
+                model_file.write(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+
+            keras_backend = backends.load_backend(model_path, num_threads=1)
+            tflite_backend = backends.load_backend(tflite_path, num_threads=1)
+
+            self.assertIsInstance(tflite_backend, backends.TFLiteBackend)
+            self.assertEqual((24, 32, 3), tflite_backend.input_shape)
+            # Batches of any size resize the interpreter's input
+            np.testing.assert_allclose(keras_backend.predict(frames), tflite_backend.predict(frames), atol=1e-5)
+            np.testing.assert_allclose(keras_backend.predict(frames[:1]), tflite_backend.predict(frames[:1]),
+                                       atol=1e-5)
+
+    def test_cascade_runs_full_model_on_unsure_frames(self):
+        model = StubBackend((24, 32, 3), [0.1, 0.9])
+        gatekeeper = ConfidenceByBrightness((6, 8, 1), None)
+        cascade = backends.CascadeBackend(model, gatekeeper, threshold=0.9)
+        batch = np.stack([np.full((24, 32, 3), value, dtype=np.uint8) for value in (255, 0, 200, 10)])
+
+        probabilities = cascade.predict(batch)
+
+        np.testing.assert_allclose([[0.95, 0.05], [0.1, 0.9], [0.95, 0.05], [0.1, 0.9]], probabilities)
+        self.assertEqual((4, 6, 8, 1), gatekeeper.batches[0].shape)
+        self.assertEqual(1, len(model.batches))
+        self.assertEqual([0, 10], [int(frame.max()) for frame in model.batches[0]])
+        self.assertEqual((4, 2), (cascade.frames, cascade.escalated))
+
+    def test_cascade_skips_full_model_when_sure(self):
+        model = StubBackend((24, 32, 3), [0.1, 0.9])
+        cascade = backends.CascadeBackend(model, ConfidenceByBrightness((24, 32, 3), None), threshold=0.5)
+
+        cascade.predict(np.zeros((3, 24, 32, 3), dtype=np.uint8))
+
+        self.assertEqual([], model.batches)
+        self.assertEqual(0, cascade.escalated)
+
+    def test_cascade_rejects_other_classes(self):
+        cascade = backends.CascadeBackend(StubBackend((24, 32, 3), [0.2, 0.3, 0.5]),
+                                          StubBackend((6, 8, 1), [0.5, 0.5]), threshold=0.9)
+
+        with self.assertRaises(ValueError):
+            cascade.predict(np.zeros((1, 24, 32, 3), dtype=np.uint8))
+
+    def test_save_cascade_stores_relative_paths(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cascade_path = os.path.join(tmp_dir, f"door{backends.CASCADE_SUFFIX}")
+            backends.save_cascade(cascade_path, os.path.join(tmp_dir, "door_model.h5"),
+                                  os.path.join(tmp_dir, "door_gatekeeper_model.h5"), 0.75)
+
+            with open(cascade_path, "r") as cascade_file:
+                cascade = json.load(cascade_file)
+
+        self.assertEqual({"model": "door_model.h5", "gatekeeper": "door_gatekeeper_model.h5", "threshold": 0.75},
+                         cascade)
+
+
+if __name__ == '__main__':
+    unittest.main()
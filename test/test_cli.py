@@ -0,0 +1,53 @@
+import unittest
+import os
+import subprocess
+import sys
+from src import cli
+
+# Modules that take seconds to import and must not load before a menu option is picked
+HEAVY_MODULES = ["tensorflow", "keras", "matplotlib", "cv2", "tkinter", "PIL", "numpy"]
+
+
+def import_times(module, cwd):
+    """Imports module in a fresh interpreter with python -X importtime.
+
+    Returns: A dictionary mapping every imported module name to its cumulative import time in microseconds
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, capture_output=True, text=True, check=True)
+
+    times = {}
+    for line in result.stderr.splitlines():
+        # Lines look like "import time:       123 |        456 |   module.name"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+class CliTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in cli.py
+    """
+
+    def test_cli_startup_imports_only_standard_library(self):
+        times = import_times("cli", os.path.join(os.getcwd(), "src"))
+        loaded = sorted({name.split(".")[0] for name in times} & set(HEAVY_MODULES))
+
+        self.assertEqual([], loaded, f"cli imported {loaded} at startup "
+                                     f"(took {times.get('cli', 0) / 1000:.1f}ms)")
+
+    def test_train_command_leaves_defaults_to_cnn(self):
+        args = cli.build_parser().parse_args(["train", "--epochs", "30", "--resume"])
+
+        self.assertEqual("train", args.command)
+        self.assertEqual(30, args.epochs)
+        self.assertIsNone(args.batch_size)
+        self.assertTrue(args.resume)
+        self.assertEqual("timestamp", args.save_policy)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,43 +1,199 @@
 import unittest
 import os
-import csv
+import tempfile
+import numpy as np
+from PIL import Image
+from tensorflow import keras
+from tensorflow.keras import layers
+from unittest import mock
+from src import backends
 from src import cnn
+from src import dataset_cache
 
 TEST_CSV_1_VALUES = [[os.path.join(os.getcwd(), "test", "test_images", "test_labeled_folder", "test_img_1.png"), "test_labeled_folder"],
                     [os.path.join(os.getcwd(), "test", "test_images", "test_labeled_folder_2", "test_img_1.png"), "test_labeled_folder_2"]]
 
 
+class FakeSaveable:
+    """Stands in for a trained model and its result graph, writes "new" to the path."""
+
+    def save(self, path):
+        with open(path, "w") as saved_file:
+            saved_file.write("new")
+
+    savefig = save
+
+
 class CnnTests(unittest.TestCase):
     """Testing class to test all helper functions, classes, and functions
        in cnn.py
     """
 
-    def test_create_cnn_csv_1(self):
+    def test_scan_labeled_images(self):
+        # Training labels every image with the name of the folder it is in
         test_path = os.path.join(os.getcwd(), "test", "test_images")
-        # name for the actual output csv
-        actual_label = "test_labeled_data"
-        cnn._create_cnn_csv(test_path, actual_label)
+        images = dataset_cache.scan_images(test_path)
+
+        actual_values = [[os.path.join(test_path, *relative_path.split("/")), class_name]
+                         for relative_path, (class_name, _) in images.items()]
+        self.assertEqual(TEST_CSV_1_VALUES, actual_values)
+
+    def test_save_policy_overwrite(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            for file_name in ("test_model.h5", "test_graph.jpg"):
+                with open(os.path.join(output_dir, file_name), "w") as old_file:
+                    old_file.write("old")
+
+            with mock.patch("builtins.input", side_effect=AssertionError("prompted")):
+                cnn._handle_save_data(FakeSaveable(), FakeSaveable(), output_dir, "test", "overwrite")
+
+            self.assertEqual(["test_graph.jpg", "test_model.h5"], sorted(os.listdir(output_dir)))
+            with open(os.path.join(output_dir, "test_model.h5")) as saved_file:
+                self.assertEqual("new", saved_file.read())
+
+    def test_save_policy_timestamp(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            with open(os.path.join(output_dir, "test_model.h5"), "w") as old_file:
+                old_file.write("old")
+
+            with mock.patch("builtins.input", side_effect=AssertionError("prompted")), \
+                    mock.patch.object(cnn.data_collect, "get_time_string", return_value="2026_10_17_12_00_00"):
+                model_path = cnn._handle_save_data(FakeSaveable(), FakeSaveable(), output_dir, "test", "timestamp")
+
+            # The model and its graph are saved together under the model name and one time
+            self.assertEqual(os.path.join(output_dir, "test_2026_10_17_12_00_00_model.h5"), model_path)
+            self.assertEqual(["test_2026_10_17_12_00_00_graph.jpg", "test_2026_10_17_12_00_00_model.h5",
+                              "test_model.h5"], sorted(os.listdir(output_dir)))
+            with open(os.path.join(output_dir, "test_model.h5")) as old_file:
+                self.assertEqual("old", old_file.read())
+
+    def test_save_policy_timestamp_same_second(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            with open(os.path.join(output_dir, "test_model.h5"), "w") as old_file:
+                old_file.write("old")
+
+            with mock.patch.object(cnn.data_collect, "get_time_string", return_value="2026_10_17_12_00_00"):
+                for _ in range(3):
+                    cnn._handle_save_data(FakeSaveable(), FakeSaveable(), output_dir, "test", "timestamp")
+
+            self.assertEqual(["test_2026_10_17_12_00_00_1_graph.jpg", "test_2026_10_17_12_00_00_1_model.h5",
+                              "test_2026_10_17_12_00_00_2_graph.jpg", "test_2026_10_17_12_00_00_2_model.h5",
+                              "test_2026_10_17_12_00_00_graph.jpg", "test_2026_10_17_12_00_00_model.h5",
+                              "test_model.h5"], sorted(os.listdir(output_dir)))
+
+    def test_save_policy_unknown(self):
+        with self.assertRaises(ValueError):
+            cnn._handle_save_data(FakeSaveable(), FakeSaveable(), os.getcwd(), "test", "ask")
+
+    def test_cascade_threshold_keeps_accuracy(self):
+        # The gatekeeper gets the two frames it is least sure about wrong
+        gatekeeper = np.array([[0.9, 0.1], [0.8, 0.2], [0.6, 0.4], [0.55, 0.45]])
+        model = np.array([[0.9, 0.1], [0.9, 0.1], [0.1, 0.9], [0.1, 0.9]])
+        labels = np.array([0, 0, 1, 1])
+
+        threshold, accuracy, escalated = cnn._choose_cascade_threshold(gatekeeper, model, labels, 0.0)
+
+        self.assertAlmostEqual(0.8, threshold)
+        self.assertEqual((1.0, 0.5), (accuracy, escalated))
+
+    def test_cascade_threshold_with_accuracy_drop(self):
+        gatekeeper = np.array([[0.9, 0.1], [0.8, 0.2], [0.6, 0.4], [0.55, 0.45]])
+        model = np.array([[0.9, 0.1], [0.9, 0.1], [0.1, 0.9], [0.1, 0.9]])
+        labels = np.array([0, 0, 1, 1])
+
+        threshold, accuracy, escalated = cnn._choose_cascade_threshold(gatekeeper, model, labels, 0.25)
+
+        self.assertAlmostEqual(0.6, threshold)
+        self.assertEqual((0.75, 0.25), (accuracy, escalated))
+
+    def test_cascade_with_empty_validation_split(self):
+        backend = mock.Mock(input_shape=(12, 16, 3))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # None of these paths hash into the validation split
+            dataset_dir = os.path.join(tmp_dir, "dataset")
+            for relative_path in ("a/0.png", "a/1.png", "b/0.png", "b/1.png"):
+                os.makedirs(os.path.join(dataset_dir, os.path.dirname(relative_path)), exist_ok=True)
+                Image.new("RGB", (16, 12)).save(os.path.join(dataset_dir, relative_path))
+
+            with mock.patch.object(cnn.backends, "load_backend", return_value=backend):
+                with self.assertRaisesRegex(ValueError, "validation split"):
+                    cnn.tune_cascade("model.h5", "gatekeeper.h5", dataset_dir)
+
+        backend.predict.assert_not_called()
+
+    def test_export_tflite_grayscale_model(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # a/2.png and b/2.png hash into the validation split
+            dataset_dir = os.path.join(tmp_dir, "dataset")
+            for class_name, value in (("a", 40), ("b", 200)):
+                os.makedirs(os.path.join(dataset_dir, class_name))
+                for i in range(3):
+                    Image.new("RGB", (16, 12), (value, value, value)).save(
+                        os.path.join(dataset_dir, class_name, f"{i}.png"))
+            model_path = os.path.join(tmp_dir, "gatekeeper.h5")
+            cnn._build_model(2, 16, 12, channels=1).save(model_path)
+
+            report = cnn.export_tflite_models(model_path, dataset_dir, calibration_samples=2)
+
+            self.assertEqual(["keras", "float16", "int8"], list(report))
+            for result in report.values():
+                self.assertTrue(os.path.isfile(result["path"]))
+
+    def test_lean_model_folds_scaling(self):
+        model = cnn._build_model(2, 16, 12)
+        lean_model = cnn._lean_model(model)
+
+        layer_names = [layer.__class__.__name__ for layer in lean_model.layers]
+        self.assertEqual("Conv2D", layer_names[0])
+        self.assertNotIn("Rescaling", layer_names)
+        self.assertNotIn("Dropout", layer_names)
+
+        frames = np.random.default_rng(0).integers(0, 256, (4, 12, 16, 3)).astype(np.float32)
+        np.testing.assert_allclose(model(frames, training=False), lean_model(frames), atol=1e-4)
+
+    def test_lean_model_keeps_other_nested_models(self):
+        inputs = keras.Input(shape=(12, 16, 3))
+        model = keras.Sequential([inputs,
+                                  keras.Sequential([layers.RandomFlip("horizontal")]),
+                                  keras.Sequential([layers.Conv2D(4, 3), layers.Flatten()]),
+                                  layers.Dense(2)])
+        lean_model = cnn._lean_model(model)
+
+        self.assertEqual(["Sequential", "Dense"], [layer.__class__.__name__ for layer in lean_model.layers])
+        frames = np.random.default_rng(0).integers(0, 256, (4, 12, 16, 3)).astype(np.float32)
+        np.testing.assert_allclose(model(frames, training=False), lean_model(frames), atol=1e-4)
 
-        expected_csv_path = os.path.join(test_path, f"{actual_label}.csv")
+    def test_export_inference_model_rejects_mismatch(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            model_path = os.path.join(output_dir, "test_model.h5")
+            cnn._build_model(2, 16, 12).save(model_path)
 
-        self.assertTrue(os.path.exists(expected_csv_path))
-        self.assertTrue(os.path.isfile(expected_csv_path))
+            # A lean model that is sure of the first class, unlike the untrained saved model
+            sure_model = keras.Sequential([keras.Input(shape=(12, 16, 3)), layers.Flatten(),
+                                           layers.Dense(2, kernel_initializer="zeros",
+                                                        bias_initializer=keras.initializers.Constant([5.0, -5.0]))])
+            with mock.patch.object(cnn, "_lean_model", lambda model: sure_model):
+                with self.assertRaises(ValueError):
+                    cnn.export_inference_model(model_path, compare=False)
 
-        # Getting contents of csv, then deleting in case of failure below
-        actual_csv_values = []
-        with open(expected_csv_path, 'rt') as actual_csv:
-            reader = csv.reader(actual_csv)
+            self.assertFalse(os.path.exists(os.path.join(output_dir, "test_model_inference")))
 
-            for row in reader:
-                # ignoring empty rows
-                if row == []:
-                    continue 
-                actual_csv_values.append(row)
+    def test_failed_export_after_training_only_warns(self):
+        with mock.patch.object(cnn, "export_inference_model", side_effect=ValueError("too far off")):
+            self.assertIsNone(cnn._export_trained_model("test_model.h5"))
 
-        os.remove(expected_csv_path)
+    def test_export_inference_model(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            model_path = os.path.join(output_dir, "test_model.h5")
+            model = cnn._build_model(3, 16, 12, channels=1)
+            model.save(model_path)
 
-        # Comparing the contents of expected and actual csvs
-        self.assertTrue(len(actual_csv_values) == len(TEST_CSV_1_VALUES), f"{len(actual_csv_values)} is not {len(TEST_CSV_1_VALUES)}")
+            export_path = cnn.export_inference_model(model_path, compare=False)
+            backend = backends.load_backend(export_path)
 
-        for i in range(len(actual_csv_values)):
-            self.assertTrue(TEST_CSV_1_VALUES[i] == actual_csv_values[i], f"{actual_csv_values[i]} is not {TEST_CSV_1_VALUES[i]}")
\ No newline at end of file
+            frames = np.random.default_rng(0).integers(0, 256, (5, 12, 16, 1), dtype=np.uint8)
+            expected = backends.softmax(model(frames.astype(np.float32), training=False).numpy())
+            self.assertEqual(os.path.join(output_dir, "test_model_inference"), export_path)
+            self.assertIsInstance(backend, backends.SavedModelBackend)
+            self.assertEqual((12, 16, 1), backend.input_shape)
+            np.testing.assert_allclose(expected, backend.predict(frames), atol=1e-5)
@@ -3,11 +3,15 @@ import filecmp
 import os
 import shutil
 import builtins
+import tempfile
+import numpy as np
+from cv2 import VideoWriter, VideoWriter_fourcc, CAP_PROP_FPS, CAP_PROP_FRAME_HEIGHT, CAP_PROP_FRAME_WIDTH
 from tkinter import Tk, Label
 from PIL import ImageTk, Image
 from datetime import datetime
 from src import data_collect
 from contextlib import contextmanager
+from unittest import mock
 
 """Helper function for tests that require CLI input from user.
 
@@ -23,9 +27,33 @@ def mockRawInput(mock):
     builtins.input = original_input
 
 
+def write_test_video(path, frame_count, width=64, height=48):
+    """Writes a small MJPG video whose frame i is filled with the value i."""
+    writer = VideoWriter(path, VideoWriter_fourcc(*"MJPG"), 30, (width, height))
+    for i in range(frame_count):
+        writer.write(np.full((height, width, 3), i, dtype=np.uint8))
+    writer.release()
+
+
 """data_collect.py tests"""
 
 
+class FakeCamera:
+    """Stands in for cv2.VideoCapture of a 640x480 camera that grants what it is set to, the rate slightly off."""
+
+    def __init__(self, source):
+        self.settings = {CAP_PROP_FRAME_WIDTH: 640, CAP_PROP_FRAME_HEIGHT: 480, CAP_PROP_FPS: 15}
+
+    def isOpened(self):
+        return True
+
+    def set(self, setting, value):
+        self.settings[setting] = value + 0.00003 if setting == CAP_PROP_FPS else value
+
+    def get(self, setting):
+        return float(self.settings.get(setting, 0))
+
+
 class DataCollectTests(unittest.TestCase):
     """Testing class to test all helper functions, classes, and functions
        in data_collect.py
@@ -53,30 +81,30 @@ class DataCollectTests(unittest.TestCase):
             expected += str(unit)
             expected += "_"
 
-        actual = data_collect._get_time_string()
+        actual = data_collect.get_time_string()
         self.assertEqual(expected, actual)
 
     def test_normalize_string_lowercase(self):
         expected = "test"
-        actual = data_collect._normalize("test")
+        actual = data_collect.normalize("test")
 
         self.assertEqual(expected, actual)
 
     def test_normalize_string_uppercase(self):
         expected = "test"
-        actual = data_collect._normalize("TEST")
+        actual = data_collect.normalize("TEST")
 
         self.assertEqual(expected, actual)
 
     def test_normalize_string_space_replace(self):
         expected = "t_e_s_t"
-        actual = data_collect._normalize("t e s t")
+        actual = data_collect.normalize("t e s t")
 
         self.assertEqual(expected, actual)
 
     def test_normalize_string_forbidden_ascii(self):
         expected = "__________"  # Length = 10
-        actual = data_collect._normalize('<>:"/\\|\?*')
+        actual = data_collect.normalize('<>:"/\\|\?*')
 
         self.assertEqual(expected, actual)
 
@@ -89,25 +117,25 @@ class DataCollectTests(unittest.TestCase):
         for code in control_codes:
             test_string += code
 
-        actual = data_collect._normalize(test_string)
+        actual = data_collect.normalize(test_string)
 
         self.assertEqual(expected, actual)
 
     def test_normalize_string_extended_ascii(self):
         expected = "_____"  # Length = 5
-        actual = data_collect._normalize('ĊæäÀɐ')
+        actual = data_collect.normalize('ĊæäÀɐ')
 
         self.assertEqual(expected, actual)
 
     def test_normalize_string_emoji(self):
         expected = "_____"  # Length = 5
-        actual = data_collect._normalize("😂😎😑🤗🤐")
+        actual = data_collect.normalize("😂😎😑🤗🤐")
 
         self.assertEqual(expected, actual)
 
     def test_normalize_string_emoticon(self):
         expected = "____"  # Length = 4
-        actual = data_collect._normalize("⊙﹏⊙∥")
+        actual = data_collect.normalize("⊙﹏⊙∥")
 
         self.assertEqual(expected, actual)
 
@@ -127,6 +155,70 @@ class DataCollectTests(unittest.TestCase):
             raise AssertionError(
                 "Save directory did not contain a saved image.")
 
+    def test_save_frame_same_second_does_not_overwrite(self):
+        test_img = Image.open("test/test_images/test_img_1.png")
+        with tempfile.TemporaryDirectory() as save_path:
+            for _ in range(5):
+                data_collect._save_frame("test", save_path, test_img)
+
+            self.assertEqual(5, len(os.listdir(save_path)))
+
+    def test_save_frame_lossy_encoders(self):
+        test_img = Image.open("test/test_images/test_img_1.png")
+        with tempfile.TemporaryDirectory() as save_path:
+            jpeg_path = data_collect._save_frame("test", save_path, test_img, "jpeg", 50)
+            webp_path = data_collect._save_frame("test", save_path, test_img, "webp", 50)
+
+            self.assertTrue(jpeg_path.endswith(".jpg"))
+            self.assertEqual("JPEG", Image.open(jpeg_path).format)
+            self.assertTrue(webp_path.endswith(".webp"))
+            self.assertEqual("WEBP", Image.open(webp_path).format)
+
+    def test_save_frame_unknown_encoder(self):
+        test_img = Image.open("test/test_images/test_img_1.png")
+        with self.assertRaises(ValueError):
+            data_collect._save_frame("test", "test", test_img, "gif")
+
+    def test_image_writer_writes_every_queued_frame(self):
+        test_img = Image.open("test/test_images/test_img_1.png")
+        # Decode now, lazily loaded images must not be shared with the writer thread
+        test_img.load()
+        with tempfile.TemporaryDirectory() as save_path:
+            writer = data_collect.ImageWriter(backlog=10, dedupe=False)
+            for _ in range(10):
+                self.assertTrue(writer.submit("test", save_path, test_img))
+            writer.close()
+
+            self.assertEqual(10, writer.written)
+            self.assertEqual(10, len(os.listdir(save_path)))
+
+    def test_image_writer_skips_near_duplicates(self):
+        test_img = Image.open("test/test_images/test_img_1.png")
+        test_img.load()
+        with tempfile.TemporaryDirectory() as save_path:
+            writer = data_collect.ImageWriter()
+            for _ in range(3):
+                writer.submit("test", save_path, test_img)
+            writer.submit("test", save_path, test_img.transpose(Image.FLIP_TOP_BOTTOM))
+            writer.close()
+
+            self.assertEqual(2, writer.written)
+            self.assertEqual(2, writer.duplicates)
+
+    def test_image_writer_keeps_writing_after_failed_save(self):
+        test_img = Image.open("test/test_images/test_img_1.png")
+        test_img.load()
+        with tempfile.TemporaryDirectory() as save_path:
+            writer = data_collect.ImageWriter(backlog=2)
+            for _ in range(5):
+                writer.submit("test", os.path.join(save_path, "missing"), test_img, block=True)
+            writer.submit("test", save_path, test_img, block=True)
+            writer.close(timeout=5)
+
+            self.assertEqual(5, writer.failed)
+            self.assertEqual(1, writer.written)
+            self.assertFalse(writer._thread.is_alive())
+
     def test_handle_existing_dataset_n(self):
         with mockRawInput('n'):
             self.assertFalse(data_collect._handle_existing_dataset())
@@ -135,6 +227,111 @@ class DataCollectTests(unittest.TestCase):
         with mockRawInput('y'):
             self.assertTrue(data_collect._handle_existing_dataset())
 
+    def test_threaded_cam_capture_read_next_keeps_every_frame(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            video_path = os.path.join(tmp_dir, "test_video.avi")
+            write_test_video(video_path, 20)
+
+            capture = data_collect.ThreadedCamCapture(video_path, buffer_size=2, drop_when_full=False)
+            frame_count = 0
+            while True:
+                ret, _ = capture.read_next()
+                if not ret:
+                    break
+                frame_count += 1
+            capture.close()
+
+        self.assertEqual(20, frame_count)
+        self.assertEqual(0, capture.dropped_frames)
+
+    def test_threaded_cam_capture_read_latest_drops_old_frames(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            video_path = os.path.join(tmp_dir, "test_video.avi")
+            write_test_video(video_path, 20)
+
+            capture = data_collect.ThreadedCamCapture(video_path, buffer_size=4)
+            # Wait for the whole file to be grabbed
+            capture._thread.join()
+            ret, frame = capture.read_latest()
+            finished_ret, _ = capture.read_latest()
+            capture.close()
+
+        self.assertTrue(ret)
+        self.assertEqual((48, 64, 3), frame.shape)
+        self.assertFalse(finished_ret)
+        self.assertEqual(20, capture.captured_frames)
+        self.assertEqual(19, capture.dropped_frames)
+
+    def test_threaded_cam_capture_read_latest_duplicates_stale_frame(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            video_path = os.path.join(tmp_dir, "test_video.avi")
+            write_test_video(video_path, 1)
+
+            capture = data_collect.ThreadedCamCapture(video_path)
+            capture._thread.join()
+            first_ret, first_frame = capture.read_latest()
+            # Pretend the source is a live camera that stalled instead of ending
+            capture.finished = False
+            ret, frame = capture.read_latest()
+            capture.close()
+
+        self.assertTrue(first_ret)
+        self.assertTrue(ret)
+        self.assertIs(first_frame, frame)
+        self.assertEqual(1, capture.duplicated_frames)
+
+    def test_threaded_cam_capture_read_latest_without_repeat(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            video_path = os.path.join(tmp_dir, "test_video.avi")
+            write_test_video(video_path, 1)
+
+            capture = data_collect.ThreadedCamCapture(video_path)
+            capture._thread.join()
+            first_ret, _ = capture.read_latest(repeat=False)
+            capture.finished = False
+            ret, frame = capture.read_latest(repeat=False)
+            capture.close()
+
+        self.assertTrue(first_ret)
+        self.assertFalse(ret)
+        self.assertIsNone(frame)
+        self.assertEqual(0, capture.duplicated_frames)
+
+    def test_cam_capture_reports_granted_settings(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            video_path = os.path.join(tmp_dir, "test_video.avi")
+            write_test_video(video_path, 2)
+
+            # A video file can not be asked for a different resolution
+            capture = data_collect.CamCapture(video_path, width=32, height=24)
+            ret, frame = capture.read()
+            capture.close()
+
+        self.assertEqual((64, 48), (capture.width, capture.height))
+        self.assertEqual((48, 64, 3), frame.shape)
+        self.assertEqual("MJPG", capture.fourcc)
+        self.assertAlmostEqual(30, capture.fps)
+
+    def test_capture_size_keeps_aspect_ratio(self):
+        self.assertEqual((160, 120), data_collect.capture_size(96, 96, 4 / 3))
+        self.assertEqual((320, 180), data_collect.capture_size(96, 96, 16 / 9))
+        self.assertEqual((424, 240), data_collect.capture_size(320, 240, 16 / 9))
+        # No standard mode of an odd aspect ratio, the smallest large enough one is picked
+        self.assertEqual((352, 288), data_collect.capture_size(300, 250, 3.0))
+        self.assertIsNone(data_collect.capture_size(4000, 3000, 4 / 3))
+
+    def test_cam_capture_requests_standard_mode(self):
+        with mock.patch.object(data_collect, "VideoCapture", FakeCamera), mock.patch("builtins.print") as printed:
+            capture = data_collect.CamCapture(0, fps=30, min_size=(96, 96))
+
+        self.assertEqual((160, 120), (capture.width, capture.height))
+        # The driver reports 30.00003, which is what was asked for
+        self.assertAlmostEqual(30, capture.fps, places=3)
+        printed.assert_not_called()
+
+    def test_fourcc_to_string(self):
+        self.assertEqual("MJPG", data_collect._fourcc_to_string(VideoWriter_fourcc(*"MJPG")))
+
 
 if __name__ == '__main__':
     unittest.main()
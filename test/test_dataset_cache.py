@@ -0,0 +1,89 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from PIL import Image
+from src import dataset_cache
+
+
+def write_image(path, value, width=32, height=24):
+    Image.fromarray(np.full((height, width, 3), value, dtype=np.uint8)).save(path)
+
+
+class DatasetCacheTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in dataset_cache.py
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dataset_dir = os.path.join(self.tmp_dir.name, "datasets")
+        for class_name, value in (("alice", 10), ("bob", 200)):
+            os.makedirs(os.path.join(self.dataset_dir, class_name))
+            for i in range(5):
+                write_image(os.path.join(self.dataset_dir, class_name, f"{i}.png"), value)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_update_decodes_every_image_once(self):
+        cache = dataset_cache.DatasetCache(self.dataset_dir, 16, 12)
+
+        self.assertEqual((10, 0), cache.update())
+        self.assertEqual((0, 0), cache.update())
+        self.assertEqual(["alice", "bob"], cache.class_names)
+        self.assertEqual((10, 12, 16, 3), cache.frames().shape)
+
+    def test_cache_is_stored_next_to_dataset(self):
+        cache = dataset_cache.DatasetCache(self.dataset_dir, 16, 12)
+        cache.update()
+
+        self.assertTrue(os.path.isdir(os.path.join(self.tmp_dir.name, "datasets_cache", "16x12")))
+
+    def test_update_only_adds_new_images(self):
+        dataset_cache.DatasetCache(self.dataset_dir, 16, 12).update()
+        write_image(os.path.join(self.dataset_dir, "bob", "new.png"), 100)
+
+        # A fresh cache object reloads the index saved by the first run
+        cache = dataset_cache.DatasetCache(self.dataset_dir, 16, 12)
+        self.assertEqual((1, 0), cache.update())
+        self.assertEqual(11, len(cache))
+
+    def test_update_forgets_removed_images(self):
+        cache = dataset_cache.DatasetCache(self.dataset_dir, 16, 12)
+        cache.update()
+        os.remove(os.path.join(self.dataset_dir, "alice", "0.png"))
+
+        self.assertEqual((0, 1), cache.update())
+        self.assertEqual(9, len(cache))
+
+    def test_split_labels_match_frames(self):
+        cache = dataset_cache.DatasetCache(self.dataset_dir, 16, 12)
+        cache.update()
+
+        train_rows, train_labels = cache.split("training")
+        val_rows, val_labels = cache.split("validation")
+        frames = cache.frames()
+
+        self.assertEqual(10, len(train_rows) + len(val_rows))
+        self.assertFalse(set(train_rows) & set(val_rows))
+        for row, label in zip(np.concatenate([train_rows, val_rows]), np.concatenate([train_labels, val_labels])):
+            self.assertEqual(10 if label == 0 else 200, frames[row][0, 0, 0])
+
+    def test_compact_keeps_frames(self):
+        cache = dataset_cache.DatasetCache(self.dataset_dir, 16, 12)
+        cache.update()
+        for i in range(5):
+            os.remove(os.path.join(self.dataset_dir, "alice", f"{i}.png"))
+        for i in range(3):
+            write_image(os.path.join(self.dataset_dir, "bob", f"{i}.png"), 50, width=31)
+
+        cache.update()
+        rows, _ = cache.split()
+
+        self.assertEqual(5, cache.frames().shape[0])
+        self.assertEqual([50, 50, 50, 200, 200], sorted(cache.frames()[rows][:, 0, 0, 0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
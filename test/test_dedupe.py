@@ -0,0 +1,85 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from PIL import Image
+from src import dedupe
+
+
+def make_image(seed, width=64, height=48):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+class DedupeTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in dedupe.py
+    """
+
+    def test_dhash_ignores_small_changes(self):
+        image = make_image(0)
+        brighter = np.clip(image.astype(np.int16) + 3, 0, 255).astype(np.uint8)
+
+        self.assertLessEqual(dedupe.hamming_distance(dedupe.dhash(image), dedupe.dhash(brighter)), 2)
+
+    def test_dhash_tells_different_images_apart(self):
+        distance = dedupe.hamming_distance(dedupe.dhash(make_image(0)), dedupe.dhash(make_image(1)))
+
+        self.assertGreater(distance, dedupe.DEFAULT_MAX_DISTANCE)
+
+    def test_hash_index_finds_hashes_within_distance(self):
+        with tempfile.TemporaryDirectory() as dataset_path:
+            index = dedupe.HashIndex(dataset_path, max_distance=3)
+            index.add("a.png", 0b1111)
+
+            self.assertEqual("a.png", index.find_duplicate(0b1000))
+            self.assertIsNone(index.find_duplicate(0b11110000))
+
+    def test_hash_index_is_saved_and_loaded(self):
+        with tempfile.TemporaryDirectory() as dataset_path:
+            Image.fromarray(make_image(0)).save(os.path.join(dataset_path, "a.png"))
+            index = dedupe.HashIndex(dataset_path)
+            index.add("a.png", 12345)
+            index.add("deleted.png", 999)
+            index.save()
+
+            loaded = dedupe.HashIndex(dataset_path)
+
+            self.assertEqual(12345, loaded.get("a.png"))
+            self.assertNotIn("deleted.png", loaded)
+
+    def test_dedupe_dataset_keeps_first_of_duplicates(self):
+        with tempfile.TemporaryDirectory() as dataset_path:
+            for i, seed in enumerate((0, 0, 1, 0)):
+                path = os.path.join(dataset_path, f"{i}.png")
+                Image.fromarray(make_image(seed)).save(path)
+                os.utime(path, (i, i))
+
+            removed = dedupe.dedupe_dataset(dataset_path)
+
+            self.assertEqual(2, removed)
+            self.assertEqual(["0.png", "2.png"], sorted(name for name in os.listdir(dataset_path)
+                                                        if name.endswith(".png")))
+            self.assertEqual(2, len(dedupe.HashIndex(dataset_path)))
+
+    def test_dedupe_dataset_rehashes_replaced_images(self):
+        with tempfile.TemporaryDirectory() as dataset_path:
+            index = dedupe.HashIndex(dataset_path)
+            for i, file_name in enumerate(("0.png", "1.png")):
+                path = os.path.join(dataset_path, file_name)
+                Image.fromarray(make_image(0)).save(path)
+                os.utime(path, (i, i))
+                index.add(file_name, dedupe.dhash(make_image(0)))
+            index.save()
+
+            # 1.png is replaced by a different image under the same name after it was indexed
+            path = os.path.join(dataset_path, "1.png")
+            Image.fromarray(make_image(1)).save(path)
+            os.utime(path, (2, 2))
+
+            self.assertIsNone(dedupe.HashIndex(dataset_path).get("1.png"))
+            self.assertEqual(0, dedupe.dedupe_dataset(dataset_path))
+            self.assertTrue(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,245 @@
+import unittest
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from unittest import mock
+from src import detector
+from src import motion
+from src import recording
+
+
+class StubClassifier:
+    """Stands in for detector.FrameClassifier, takes a fixed time per frame."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def classify(self, frame):
+        time.sleep(self.seconds)
+        return "alice", 0.9
+
+
+class BlockingClassifier:
+    """Stands in for detector.FrameClassifier, holds every frame until released and keeps the frames it saw."""
+
+    def __init__(self):
+        self.frames = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def classify(self, frame):
+        self.frames.append(int(frame[0, 0, 0]))
+        self.started.set()
+        self.release.wait(5)
+        return "bob", 0.8
+
+
+class BrightnessBackend:
+    """Stands in for a model backend, predicts the second class for bright frames and keeps its batches."""
+
+    def __init__(self, input_shape):
+        self.input_shape = input_shape
+        self.batches = []
+
+    def predict(self, batch):
+        self.batches.append(batch)
+        return np.array([[0.1, 0.9] if frame.mean() > 127 else [0.8, 0.2] for frame in batch], dtype=np.float32)
+
+
+def make_frame(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def run_frames(scheduler, count, frame_seconds):
+    return [scheduler.frame_done(frame_seconds) for _ in range(count)]
+
+
+class AdaptiveSchedulerTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in detector.py
+    """
+
+    def test_delay_fills_frame_budget(self):
+        scheduler = detector.AdaptiveScheduler(target_fps=20)
+
+        self.assertEqual(40, scheduler.frame_done(0.01))
+        self.assertEqual(0, scheduler.late_frames)
+
+    def test_late_frame_gets_minimum_delay(self):
+        scheduler = detector.AdaptiveScheduler(target_fps=20)
+
+        self.assertEqual(detector.MIN_FRAME_DELAY, scheduler.frame_done(0.08))
+        self.assertEqual(1, scheduler.late_frames)
+
+    def test_stride_follows_inference_cost(self):
+        scheduler = detector.AdaptiveScheduler(target_fps=30)
+        scheduler.inference_done(0.1)
+        run_frames(scheduler, 1, 0.005)
+
+        self.assertEqual(3, scheduler.stride)
+        offered = [scheduler.should_infer() for _ in range(7)]
+        self.assertEqual([True, False, False, True, False, False, True], offered)
+        self.assertEqual(4, scheduler.skipped)
+
+    def test_slow_display_skips_inference(self):
+        scheduler = detector.AdaptiveScheduler(target_fps=30, max_stride=8)
+        scheduler.inference_done(0.01)
+
+        delays = run_frames(scheduler, 100, 0.05)
+
+        self.assertEqual(8, scheduler.stride)
+        self.assertEqual([detector.MIN_FRAME_DELAY] * 100, delays)
+        self.assertEqual(100, scheduler.late_frames)
+
+        # Once the display has headroom again, detections come back
+        run_frames(scheduler, 200, 0.005)
+        self.assertEqual(1, scheduler.stride)
+        self.assertGreater(scheduler.stride_changes, 1)
+
+    def test_over_latency_is_counted(self):
+        scheduler = detector.AdaptiveScheduler(target_fps=30, max_latency=0.2)
+        scheduler.inference_done(0.5)
+        run_frames(scheduler, 3, 0.005)
+
+        self.assertEqual(3, scheduler.over_latency)
+        self.assertGreater(scheduler.counters()["latency_ms"], 500)
+
+    def test_worker_reports_inference_cost(self):
+        scheduler = detector.AdaptiveScheduler()
+        worker = detector.InferenceWorker(StubClassifier(0.02), scheduler=scheduler)
+        worker.submit(np.zeros((4, 4, 3), dtype=np.uint8))
+        for _ in range(100):
+            if worker.latest_result is not None:
+                break
+            time.sleep(0.01)
+        worker.close()
+
+        self.assertEqual("alice", worker.latest_result[1])
+        self.assertGreaterEqual(scheduler.inference_cost, 0.02)
+
+
+class InferenceWorkerTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in detector.py
+    """
+
+    def test_busy_worker_replaces_waiting_frame(self):
+        classifier = BlockingClassifier()
+        worker = detector.InferenceWorker(classifier)
+        worker.submit(make_frame(1))
+        self.assertTrue(classifier.started.wait(5))
+
+        # The model is busy with frame 1, so frame 3 takes the place of frame 2
+        worker.submit(make_frame(2))
+        worker.submit(make_frame(3))
+        classifier.release.set()
+        self.assertTrue(wait_for(lambda: worker.inferences == 2))
+        worker.close()
+
+        self.assertEqual([1, 3], classifier.frames)
+        self.assertEqual(1, worker.replaced_frames)
+        self.assertEqual((3, "bob", 0.8), worker.latest_result)
+
+    def test_stride_skips_frames(self):
+        classifier = StubClassifier(0)
+        worker = detector.InferenceWorker(classifier, stride=3)
+
+        queued = [worker.submit(make_frame(i)) for i in range(7)]
+        worker.close()
+
+        self.assertEqual([True, False, False, True, False, False, True], queued)
+
+    def test_close_stops_thread(self):
+        classifier = BlockingClassifier()
+        worker = detector.InferenceWorker(classifier)
+        worker.submit(make_frame(1))
+        self.assertTrue(classifier.started.wait(5))
+
+        # Closing waits for the running call, a frame still waiting is dropped
+        worker.submit(make_frame(2))
+        classifier.release.set()
+        worker.close()
+
+        self.assertFalse(worker._thread.is_alive())
+        self.assertLessEqual(worker.inferences, 2)
+        self.assertEqual(1, classifier.frames[0])
+
+    def test_close_idle_worker(self):
+        worker = detector.InferenceWorker(StubClassifier(0))
+        worker.close()
+
+        self.assertFalse(worker._thread.is_alive())
+        self.assertEqual(0, worker.inferences)
+        self.assertIsNone(worker.latest_result)
+
+
+class DetectHeadlessTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in detector.py
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "session")
+        self.backend = BrightnessBackend((12, 16, 3))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def record(self, values):
+        recorder = recording.SessionRecorder(self.path, chunk_frames=4)
+        for i, value in enumerate(values):
+            recorder.write(np.full((24, 32, 3), value, dtype=np.uint8), timestamp=100 + i * 0.01)
+        recorder.close()
+
+    def detect_headless(self, model_path="stub_model.h5", expected_path="stub_model.h5", **kwargs):
+        with mock.patch.object(detector, "load_backend", return_value=self.backend) as load_backend:
+            summary = detector.detect_headless(model_path, self.path, class_names=["dark", "bright"], **kwargs)
+        load_backend.assert_called_once_with(expected_path, detector.DEFAULT_NUM_THREADS)
+        return summary
+
+    def test_summary_covers_every_recorded_frame(self):
+        self.record([0, 255, 0, 255, 0, 255])
+
+        summary = self.detect_headless()
+
+        self.assertEqual({"frames", "seconds", "fps", "p50", "p99", "skipped"}, set(summary))
+        self.assertEqual(6, summary["frames"])
+        self.assertEqual(0, summary["skipped"])
+        self.assertGreater(summary["fps"], 0)
+        self.assertLessEqual(summary["p50"], summary["p99"])
+        # Frames are resized to the model's input before every single frame call
+        self.assertEqual([(1, 12, 16, 3)] * 6, [batch.shape for batch in self.backend.batches])
+
+    def test_default_model_is_picked_when_called(self):
+        self.record([0])
+        export_path = os.path.join(self.tmp_dir.name, "cat_dog_model_inference")
+        h5_path = os.path.join(self.tmp_dir.name, "cat_dog_model.h5")
+
+        with mock.patch.multiple(detector, DEFAULT_EXPORTED_MODEL_PATH=export_path, DEFAULT_H5_MODEL_PATH=h5_path):
+            self.detect_headless(None, h5_path)
+            # An export made after the detector was imported is picked up
+            os.makedirs(export_path)
+            self.detect_headless(None, export_path)
+
+    def test_static_frames_are_skipped(self):
+        self.record([90] * 5)
+
+        summary = self.detect_headless(motion_gate=motion.MotionGate(hold_over=0))
+
+        self.assertEqual(5, summary["frames"])
+        self.assertEqual(4, summary["skipped"])
+        self.assertEqual(1, len(self.backend.batches))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from PIL import Image
+from src import embeddings
+
+
+class MeanColorExtractor:
+    """Stands in for FeatureExtractor, embeds a frame as its normalized mean color."""
+
+    weights_path = "mean_color"
+    input_size = 8
+    alpha = 1.0
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed(self, frames):
+        self.embedded += len(frames)
+        means = np.array([frame.reshape(-1, 3).mean(axis=0) for frame in frames], dtype=np.float32).reshape(-1, 3)
+        return means / np.maximum(np.linalg.norm(means, axis=1, keepdims=True), 1e-12)
+
+
+def write_image(path, color, width=16, height=12):
+    Image.fromarray(np.full((height, width, 3), color, dtype=np.uint8)).save(path)
+
+
+class EmbeddingsTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in embeddings.py
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dataset_dir = os.path.join(self.tmp_dir.name, "datasets")
+        for class_name, color in (("alice", (200, 10, 10)), ("bob", (10, 10, 200))):
+            os.makedirs(os.path.join(self.dataset_dir, class_name))
+            for i in range(3):
+                write_image(os.path.join(self.dataset_dir, class_name, f"{i}.png"), color)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_update_embeds_every_image_once(self):
+        extractor = MeanColorExtractor()
+        index = embeddings.EmbeddingIndex(self.dataset_dir, extractor)
+
+        self.assertEqual((6, 0), index.update())
+        self.assertEqual((0, 0), index.update())
+        self.assertEqual(6, extractor.embedded)
+        self.assertEqual(["alice", "bob"], index.class_names)
+
+    def test_enroll_only_embeds_new_person(self):
+        extractor = MeanColorExtractor()
+        index = embeddings.EmbeddingIndex(self.dataset_dir, extractor)
+        index.update()
+
+        os.makedirs(os.path.join(self.dataset_dir, "carol"))
+        write_image(os.path.join(self.dataset_dir, "carol", "0.png"), (10, 200, 10))
+
+        self.assertEqual(1, index.enroll("carol"))
+        self.assertEqual(7, extractor.embedded)
+        self.assertEqual(["alice", "bob", "carol"], index.class_names)
+
+    def test_enroll_unknown_person_raises(self):
+        index = embeddings.EmbeddingIndex(self.dataset_dir, MeanColorExtractor())
+        index.update()
+
+        with self.assertRaises(IOError):
+            index.enroll("carol")
+        self.assertEqual(["alice", "bob"], index.class_names)
+
+    def test_remove_person(self):
+        index = embeddings.EmbeddingIndex(self.dataset_dir, MeanColorExtractor())
+        index.update()
+
+        self.assertEqual(3, index.remove("alice"))
+        self.assertEqual(["bob"], index.class_names)
+        self.assertEqual(3, len(index))
+
+    def test_deleted_images_are_dropped(self):
+        index = embeddings.EmbeddingIndex(self.dataset_dir, MeanColorExtractor())
+        index.update()
+        os.remove(os.path.join(self.dataset_dir, "bob", "0.png"))
+
+        self.assertEqual((0, 1), index.update())
+        self.assertEqual(5, len(index))
+
+    def test_saved_index_is_reused(self):
+        index = embeddings.EmbeddingIndex(self.dataset_dir, MeanColorExtractor())
+        index.update()
+        index.save()
+
+        extractor = MeanColorExtractor()
+        reloaded = embeddings.EmbeddingIndex(self.dataset_dir, extractor)
+        self.assertEqual((0, 0), reloaded.update())
+        self.assertEqual(0, extractor.embedded)
+        self.assertEqual(["alice", "bob"], reloaded.class_names)
+
+    def test_index_of_other_backbone_is_not_reused(self):
+        index = embeddings.EmbeddingIndex(self.dataset_dir, MeanColorExtractor())
+        index.update()
+        index.save()
+
+        extractor = MeanColorExtractor()
+        extractor.weights_path = "other_backbone"
+        self.assertEqual((6, 0), embeddings.EmbeddingIndex(self.dataset_dir, extractor).update())
+
+    def test_split_matches_dataset_cache(self):
+        index = embeddings.EmbeddingIndex(self.dataset_dir, MeanColorExtractor())
+        index.update()
+
+        train_features, train_labels = index.split("training")
+        val_features, val_labels = index.split("validation")
+
+        self.assertEqual(6, len(train_labels) + len(val_labels))
+        self.assertEqual((len(train_labels), 3), train_features.shape)
+        self.assertEqual((len(val_labels), 3), val_features.shape)
+
+        with self.assertRaises(ValueError):
+            index.split("testing")
+
+    def test_backend_classifies_by_centroid_and_nearest(self):
+        for method in ("centroid", "nearest"):
+            index = embeddings.EmbeddingIndex(self.dataset_dir, MeanColorExtractor(), method=method)
+            index.update()
+            backend = embeddings.EmbeddingBackend(index)
+
+            frames = np.array([np.full((8, 8, 3), (180, 20, 20), dtype=np.uint8),
+                               np.full((8, 8, 3), (20, 20, 180), dtype=np.uint8)])
+            probabilities = backend.predict(frames)
+
+            self.assertEqual((2, 2), probabilities.shape)
+            self.assertEqual([0, 1], list(np.argmax(probabilities, axis=1)))
+            self.assertTrue(np.allclose(1.0, probabilities.sum(axis=1)))
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            embeddings.EmbeddingIndex(self.dataset_dir, MeanColorExtractor(), method="cosine")
+
+    def test_empty_index(self):
+        index = embeddings.EmbeddingIndex(self.dataset_dir, MeanColorExtractor())
+
+        with self.assertRaises(RuntimeError):
+            index.similarities(np.ones((1, 3), dtype=np.float32))
+
+
+if __name__ == '__main__':
+    unittest.main()
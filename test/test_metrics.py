@@ -0,0 +1,100 @@
+import unittest
+import json
+import os
+import tempfile
+import timeit
+from src import metrics
+
+
+class MetricsTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in metrics.py
+    """
+
+    def test_stage_percentiles(self):
+        stats = metrics.Metrics()
+        for ms in range(1, 101):
+            stats.record("inference", ms / 1000)
+
+        stage = stats.snapshot()["stages"]["inference"]
+        self.assertEqual(100, stage["count"])
+        self.assertAlmostEqual(50.5, stage["p50"])
+        self.assertAlmostEqual(99.01, stage["p99"])
+
+    def test_window_keeps_recent_durations(self):
+        stats = metrics.Metrics(window=10)
+        for ms in range(100):
+            stats.record("read", ms / 1000)
+
+        self.assertEqual(10, stats.snapshot()["stages"]["read"]["count"])
+        self.assertAlmostEqual(94.5, stats.snapshot()["stages"]["read"]["p50"])
+
+    def test_time_context_records(self):
+        stats = metrics.Metrics()
+        with stats.time("render"):
+            pass
+        stats.tick("display")
+        stats.count("saved", 2)
+        stats.gauge("dropped_frames", lambda: 7)
+
+        line = stats.summary_line()
+        self.assertIn("render", line)
+        self.assertIn("display 0.0fps", line)
+        self.assertIn("saved 2", line)
+        self.assertIn("dropped_frames 7", line)
+
+    def test_disabled_records_nothing(self):
+        stats = metrics.Metrics(enabled=False)
+        with stats.time("render"):
+            pass
+        stats.tick("display")
+        stats.gauge("dropped_frames", lambda: 7)
+
+        self.assertEqual({}, stats.snapshot()["stages"])
+        self.assertEqual({}, stats.snapshot()["counters"])
+        self.assertIs(metrics.NULL_METRICS.time("a"), metrics.NULL_METRICS.time("b"))
+
+    def test_disabled_overhead_is_small(self):
+        def hook():
+            with metrics.NULL_METRICS.time("read"):
+                pass
+
+        seconds = min(timeit.repeat(hook, number=10000, repeat=3)) / 10000
+        self.assertLess(seconds, 5e-6)
+
+    def test_export_json_and_prometheus(self):
+        stats = metrics.Metrics()
+        stats.record("inference", 0.004)
+        stats.count("dropped_frames")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, "metrics.json")
+            prom_path = os.path.join(tmp_dir, "metrics.prom")
+            stats.export(json_path)
+            stats.export(prom_path)
+
+            with open(json_path) as json_file:
+                self.assertAlmostEqual(4.0, json.load(json_file)["stages"]["inference"]["p50"])
+            with open(prom_path) as prom_file:
+                prometheus = prom_file.read()
+            self.assertEqual(["metrics.json", "metrics.prom"], sorted(os.listdir(tmp_dir)))
+
+        self.assertIn('themesong_stage_seconds{stage="inference",quantile="0.5"} 0.004', prometheus)
+        self.assertIn('themesong_events{event="dropped_frames"} 1', prometheus)
+
+    def test_from_env(self):
+        saved = os.environ.get(metrics.METRICS_ENV_VAR)
+        try:
+            os.environ[metrics.METRICS_ENV_VAR] = "0"
+            self.assertIs(metrics.NULL_METRICS, metrics.from_env())
+            os.environ[metrics.METRICS_ENV_VAR] = "out.prom"
+            self.assertEqual("out.prom", metrics.from_env().export_path)
+        finally:
+            if saved is None:
+                os.environ.pop(metrics.METRICS_ENV_VAR, None)
+            else:
+                os.environ[metrics.METRICS_ENV_VAR] = saved
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from src import motion
+
+
+def make_frame(value, width=320, height=240):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+class MotionTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in motion.py
+    """
+
+    def test_first_frame_is_inferred(self):
+        gate = motion.MotionGate(hold_over=0)
+        self.assertTrue(gate.should_infer(make_frame(0), now=0))
+
+    def test_static_scene_is_skipped(self):
+        gate = motion.MotionGate(hold_over=1)
+        for now in range(5):
+            gate.should_infer(make_frame(100), now=now)
+
+        self.assertEqual(2, gate.passed)
+        self.assertEqual(3, gate.skipped)
+
+    def test_motion_restarts_inference(self):
+        gate = motion.MotionGate(hold_over=0)
+        gate.should_infer(make_frame(0), now=0)
+        self.assertFalse(gate.should_infer(make_frame(0), now=1))
+
+        moved = make_frame(0)
+        moved[:120] = 255
+        self.assertTrue(gate.should_infer(moved, now=2))
+
+    def test_hold_over_keeps_inferring_after_motion(self):
+        gate = motion.MotionGate(hold_over=5)
+        gate.should_infer(make_frame(0), now=0)
+
+        self.assertTrue(gate.should_infer(make_frame(0), now=4))
+        self.assertFalse(gate.should_infer(make_frame(0), now=6))
+
+    def test_small_change_stays_below_threshold(self):
+        gate = motion.MotionGate(hold_over=0)
+        gate.should_infer(make_frame(100), now=0)
+
+        self.assertFalse(gate.should_infer(make_frame(110), now=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import os
+import tempfile
+import cv2
+import numpy as np
+from src import detector
+from src import multicam
+
+
+class BrightnessBackend:
+    """Stands in for a backends.Backend, predicts class 1 for bright frames."""
+
+    input_shape = (12, 16, 3)
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, batch):
+        self.batch_sizes.append(len(batch))
+        bright = batch.reshape(len(batch), -1).mean(axis=1) > 127
+        return np.stack([np.where(bright, 0.1, 0.9), np.where(bright, 0.9, 0.1)], axis=1)
+
+
+def write_video(path, value, frames):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (16, 12))
+    for _ in range(frames):
+        writer.write(np.full((12, 16, 3), value, dtype=np.uint8))
+    writer.release()
+
+
+class MultiCamTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in multicam.py
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dark_path = os.path.join(self.tmp_dir.name, "dark.avi")
+        self.bright_path = os.path.join(self.tmp_dir.name, "bright.avi")
+        write_video(self.dark_path, 20, 12)
+        write_video(self.bright_path, 230, 8)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_results_are_routed_per_camera(self):
+        backend = BrightnessBackend()
+        classifier = detector.FrameClassifier(backend, ["dark", "bright"])
+        cams = multicam.MultiCamDetector(classifier, [self.dark_path, self.bright_path])
+
+        results = []
+        try:
+            cams.run(lambda *result: results.append(result))
+        finally:
+            cams.close()
+
+        self.assertEqual({"dark"}, {name for camera, _, name, _ in results if camera == 0})
+        self.assertEqual({"bright"}, {name for camera, _, name, _ in results if camera == 1})
+        self.assertEqual([12, 8], [stats.inferences for stats in cams.stats])
+        self.assertEqual(8, cams.latest_results[1][0])
+        # Both videos share a batched call while each still has frames
+        self.assertEqual(2, max(backend.batch_sizes))
+        self.assertEqual(20, cams.batched_frames)
+
+    def test_classify_frames_matches_classify(self):
+        classifier = detector.FrameClassifier(BrightnessBackend(), ["dark", "bright"])
+        frames = [np.full((12, 16, 3), value, dtype=np.uint8) for value in (10, 240, 30)]
+
+        self.assertEqual([classifier.classify(frame) for frame in frames], classifier.classify_frames(frames))
+        self.assertEqual([], classifier.classify_frames([]))
+
+    def test_camera_stats_summary(self):
+        stats = multicam.CameraStats()
+        for latency in (0.01, 0.02, 0.03):
+            stats.record(latency)
+
+        summary = stats.summary()
+        self.assertEqual(3, summary["inferences"])
+        self.assertAlmostEqual(20.0, summary["p50"])
+
+
+if __name__ == '__main__':
+    unittest.main()
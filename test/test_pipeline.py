@@ -0,0 +1,82 @@
+import unittest
+import numpy as np
+from src import pipeline
+
+
+class StubWriter:
+    """Stands in for data_collect.ImageWriter, keeps the submitted frames."""
+
+    def __init__(self):
+        self.submitted = []
+        self.closed = False
+
+    def submit(self, name, dataset_path, frame):
+        self.submitted.append((name, dataset_path, frame))
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+def make_bgr_frame(width=8, height=6):
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:, 0] = (255, 0, 0)  # Blue left column
+    frame[:, -1] = (0, 0, 255)  # Red right column
+    return frame
+
+
+class PipelineTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in pipeline.py
+    """
+
+    def test_frame_rgb_is_converted_once(self):
+        frame = pipeline.Frame(0, make_bgr_frame())
+
+        self.assertIs(frame.rgb, frame.rgb)
+        self.assertEqual([0, 0, 255], list(frame.rgb[0, 0]))
+
+    def test_frame_image_is_not_mirrored(self):
+        image = pipeline.Frame(0, make_bgr_frame()).to_image()
+
+        self.assertEqual((0, 0, 255), image.getpixel((0, 0)))
+        self.assertEqual((255, 0, 0), image.getpixel((7, 0)))
+
+    def test_renderer_mirrors_to_rgb(self):
+        image = pipeline.FrameRenderer().render(make_bgr_frame())
+
+        self.assertEqual((255, 0, 0), image.getpixel((0, 0)))
+        self.assertEqual((0, 0, 255), image.getpixel((7, 0)))
+
+    def test_renderer_without_mirror(self):
+        image = pipeline.FrameRenderer(mirror=False).render(make_bgr_frame())
+
+        self.assertEqual((0, 0, 255), image.getpixel((0, 0)))
+
+    def test_renderer_reuses_its_image(self):
+        renderer = pipeline.FrameRenderer()
+        first = renderer.render(make_bgr_frame())
+        second = renderer.render(np.full((6, 8, 3), 7, dtype=np.uint8))
+
+        self.assertIs(first, second)
+        self.assertEqual((7, 7, 7), second.getpixel((3, 3)))
+        self.assertIsNot(first, renderer.render(make_bgr_frame(width=4)))
+
+    def test_save_stage_saves_current_frame(self):
+        writer = StubWriter()
+        stage = pipeline.SaveStage(writer, "alice", "datasets/alice")
+
+        self.assertFalse(stage.capture())
+        stage.process(pipeline.Frame(0, make_bgr_frame()))
+        self.assertTrue(stage.capture())
+
+        name, dataset_path, image = writer.submitted[0]
+        self.assertEqual(("alice", "datasets/alice"), (name, dataset_path))
+        self.assertEqual((0, 0, 255), image.getpixel((0, 0)))
+
+        stage.close()
+        self.assertTrue(writer.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
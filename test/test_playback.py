@@ -0,0 +1,108 @@
+import unittest
+import os
+import tempfile
+import wave
+from src import playback
+
+
+def write_wav(path, frames, sample_rate=8000, channels=1):
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes((bytes(range(256)) * frames)[:frames * 2 * channels])
+
+
+def fake_clip(name, nbytes):
+    return playback.Clip(name, bytes(nbytes), 8000, 1, 2)
+
+
+class PlaybackTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in playback.py
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.songs_dir = os.path.join(self.tmp_dir.name, "songs")
+        os.makedirs(self.songs_dir)
+        write_wav(os.path.join(self.songs_dir, "alice.wav"), 8000)
+        write_wav(os.path.join(self.songs_dir, "bob.wav"), 4000)
+        open(os.path.join(self.songs_dir, "notes.txt"), "w").close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_find_songs(self):
+        self.assertEqual(["alice", "bob"], sorted(playback.find_songs(self.songs_dir)))
+        self.assertEqual(["bob"], list(playback.find_songs(self.songs_dir, ["bob", "carol"])))
+        self.assertEqual({}, playback.find_songs(os.path.join(self.tmp_dir.name, "missing")))
+
+    def test_decode_wav(self):
+        clip = playback.decode_clip("alice", os.path.join(self.songs_dir, "alice.wav"))
+
+        self.assertEqual((8000, 1, 2), (clip.sample_rate, clip.channels, clip.sample_width))
+        self.assertAlmostEqual(1.0, clip.duration)
+
+    def test_clip_cache_evicts_least_recently_used(self):
+        decoded = []
+
+        def decoder(name, path):
+            decoded.append(name)
+            return fake_clip(name, 400)
+
+        cache = playback.ClipCache({"alice": "a", "bob": "b", "carol": "c"}, max_bytes=1000, decoder=decoder)
+        cache.get("alice")
+        cache.get("bob")
+        cache.get("alice")
+        cache.get("carol")
+
+        self.assertIn("alice", cache)
+        self.assertNotIn("bob", cache)
+        self.assertEqual(800, cache.nbytes)
+        self.assertEqual((1, 3, 1), (cache.hits, cache.misses, cache.evictions))
+        self.assertIsNone(cache.get("dave"))
+
+    def test_clip_cache_preload_stops_when_full(self):
+        cache = playback.ClipCache({"alice": "a", "bob": "b"}, max_bytes=500,
+                                   decoder=lambda name, path: fake_clip(name, 400))
+
+        self.assertEqual(["alice"], cache.preload())
+
+    def test_player_cooldown_and_confidence(self):
+        sink = playback.NullSink()
+        player = playback.ThemeSongPlayer.from_songs_dir(self.songs_dir, sink=sink, cooldown=10)
+        try:
+            self.assertTrue(player.trigger("alice", now=100.0))
+            self.assertFalse(player.trigger("alice", now=105.0))
+            self.assertTrue(player.trigger("alice", now=111.0))
+            self.assertFalse(player.trigger("bob", confidence=0.5, now=100.0))
+            self.assertFalse(player.trigger("carol", now=100.0))
+            player.wait()
+        finally:
+            player.close()
+
+        self.assertEqual(["alice", "alice"], sink.played)
+        self.assertEqual((2, 1, 2), (player.triggered, player.suppressed, player.played))
+        self.assertGreater(player.latency_ms(50), 0.0)
+
+    def test_player_writes_wav_sink(self):
+        sink = playback.WavFileSink(os.path.join(self.tmp_dir.name, "out"))
+        player = playback.ThemeSongPlayer(playback.find_songs(self.songs_dir), sink=sink)
+        try:
+            player.trigger("bob")
+            player.wait()
+        finally:
+            player.close()
+
+        original = playback.decode_clip("bob", os.path.join(self.songs_dir, "bob.wav"))
+        self.assertEqual(original.pcm, playback.decode_clip("bob", sink.paths[0]).pcm)
+        # Preloaded clips are played straight from the cache
+        self.assertEqual(1, player.cache.hits)
+
+    def test_player_without_songs(self):
+        self.assertIsNone(playback.ThemeSongPlayer.from_songs_dir(os.path.join(self.tmp_dir.name, "missing")))
+
+
+if __name__ == '__main__':
+    unittest.main()
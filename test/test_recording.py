@@ -0,0 +1,97 @@
+import unittest
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+from src import recording
+
+
+def make_frame(value, width=16, height=12):
+    frame = np.full((height, width, 3), value, dtype=np.uint8)
+    frame[0, 0] = (255, 0, 0)  # Blue corner, to check the channel order
+    return frame
+
+
+class RecordingTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in recording.py
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "session")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def record(self, count, interval=0.01, chunk_frames=3):
+        recorder = recording.SessionRecorder(self.path, chunk_frames)
+        for i in range(count):
+            recorder.write(make_frame(i * 10), timestamp=100 + i * interval)
+        recorder.close()
+
+    def test_replay_returns_recorded_frames_in_order(self):
+        self.record(7)
+        replay = recording.ReplayCapture(self.path)
+
+        frames = []
+        while not replay.finished:
+            ret, frame = replay.read()
+            self.assertTrue(ret)
+            frames.append(frame.copy())
+        replay.close()
+
+        self.assertEqual((16, 12, 7), (replay.width, replay.height, replay.frame_count))
+        self.assertEqual([i * 10 for i in range(7)], [int(frame[5, 5, 0]) for frame in frames])
+        np.testing.assert_allclose([i * 0.01 for i in range(7)], replay.timestamps)
+        self.assertEqual((False, None), replay.read_next())
+        # The last chunk only holds the frame that was written into it
+        self.assertEqual((1, 12, 16, 3), np.load(os.path.join(self.path, "chunk_00002.npy")).shape)
+
+    def test_realtime_replay_skips_late_frames(self):
+        self.record(20, interval=0.02)
+        replay = recording.ReplayCapture(self.path, realtime=True)
+
+        self.assertTrue(replay.read_latest()[0])
+        time.sleep(0.1)
+        _, frame = replay.read_latest()
+        replay.close()
+
+        self.assertGreaterEqual(int(frame[5, 5, 0]), 40)
+
+    def test_recorder_rejects_other_frame_sizes(self):
+        recorder = recording.SessionRecorder(self.path)
+        recorder.write(make_frame(0))
+        with self.assertRaises(ValueError):
+            recorder.write(make_frame(0, width=8))
+
+    def test_replay_of_missing_recording(self):
+        with self.assertRaises(IOError):
+            recording.ReplayCapture(self.tmp_dir.name)
+
+    def test_record_session_from_video(self):
+        video_path = os.path.join(self.tmp_dir.name, "door.avi")
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (16, 12))
+        for i in range(5):
+            writer.write(make_frame(i * 40))
+        writer.release()
+
+        path = recording.record_session(self.path, video_path)
+
+        self.assertTrue(recording.is_recording(path))
+        self.assertEqual(5, recording.ReplayCapture(path).frame_count)
+
+    def test_extract_dataset(self):
+        self.record(6)
+        dataset_path = os.path.join(self.tmp_dir.name, "datasets")
+
+        writer = recording.extract_dataset(self.path, "alice", dataset_path, every=2)
+
+        images = [name for name in os.listdir(os.path.join(dataset_path, "alice")) if name.endswith(".png")]
+        self.assertEqual(3, writer.written + writer.duplicates)
+        self.assertEqual(writer.written, len(images))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+import numpy as np
+from src import roi
+
+
+class RoiTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in roi.py
+    """
+
+    def test_no_faces_in_blank_frame(self):
+        cropper = roi.FaceCropper()
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+
+        self.assertEqual([], cropper.detect(frame))
+        self.assertEqual((0, roi.DEFAULT_ROI_SIZE, roi.DEFAULT_ROI_SIZE, 3), cropper.crop(frame).shape)
+
+    def test_crop_resizes_every_box(self):
+        cropper = roi.FaceCropper(size=32)
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        frame[10:60, 10:60] = 255
+
+        crops = cropper.crop(frame, [(10, 10, 50, 50), (0, 0, 240, 240)])
+
+        self.assertEqual((2, 32, 32, 3), crops.shape)
+        self.assertTrue(np.all(crops[0] == 255))
+
+    def test_bad_cascade_path_raises(self):
+        with self.assertRaises(IOError):
+            roi.FaceCropper(cascade_path="not_a_cascade.xml")
+
+
+if __name__ == '__main__':
+    unittest.main()
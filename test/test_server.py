@@ -0,0 +1,98 @@
+import unittest
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from src import backends
+from src import server
+
+
+class MeanBackend:
+    """Stands in for a backends.Backend, records the size of every batch."""
+
+    input_shape = (4, 6, 3)
+    class_names = ["dark", "bright"]
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batch_sizes = []
+
+    def predict(self, batch):
+        self.batch_sizes.append(len(batch))
+        time.sleep(self.delay)
+        bright = batch.reshape(len(batch), -1).mean(axis=1) / 255
+        return np.stack([1 - bright, bright], axis=1).astype(np.float32)
+
+
+def frames(*values):
+    return np.stack([np.full(MeanBackend.input_shape, value, dtype=np.uint8) for value in values])
+
+
+class ServerTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in server.py
+    """
+
+    def test_batcher_coalesces_concurrent_requests(self):
+        backend = MeanBackend()
+        batcher = server.DynamicBatcher(backend, max_batch_size=8, max_wait=0.2)
+        try:
+            futures = [batcher.submit(frames(value)) for value in (0, 51, 255)]
+            results = [future.result(timeout=5) for future in futures]
+        finally:
+            batcher.close()
+
+        self.assertEqual([3], backend.batch_sizes)
+        np.testing.assert_allclose([[1, 0], [0.8, 0.2], [0, 1]], np.concatenate(results), atol=1e-6)
+        stats = batcher.stats()
+        self.assertEqual((3, 1, 3), (stats["requests"], stats["batches"], stats["max_queue_depth"]))
+        self.assertEqual({"3": 1}, stats["batch_sizes"])
+
+    def test_batcher_respects_max_batch_size(self):
+        backend = MeanBackend()
+        batcher = server.DynamicBatcher(backend, max_batch_size=2, max_wait=0.2)
+        try:
+            futures = [batcher.submit(frames(value)) for value in (0, 1, 2)]
+            for future in futures:
+                future.result(timeout=5)
+        finally:
+            batcher.close()
+
+        self.assertEqual([2, 1], backend.batch_sizes)
+
+    def test_batcher_rejects_wrong_shape(self):
+        batcher = server.DynamicBatcher(MeanBackend())
+        try:
+            with self.assertRaises(ValueError):
+                batcher.submit(np.zeros((1, 8, 8, 3), dtype=np.uint8))
+        finally:
+            batcher.close()
+
+    def test_service_backend_round_trip(self):
+        backend = MeanBackend(delay=0.02)
+        inference_server = server.InferenceServer(backend, port=0, max_wait=0.02)
+        thread = threading.Thread(target=inference_server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client = backends.load_backend(f"http://127.0.0.1:{inference_server.server_address[1]}")
+            self.assertEqual(MeanBackend.input_shape, client.input_shape)
+            self.assertEqual(["dark", "bright"], client.class_names)
+
+            with ThreadPoolExecutor(4) as pool:
+                results = list(pool.map(lambda value: client.predict(frames(value))[0], range(0, 256, 32)))
+
+            np.testing.assert_allclose([value / 255 for value in range(0, 256, 32)],
+                                       [result[1] for result in results], atol=1e-6)
+            with self.assertRaises(IOError):
+                client.predict(np.zeros((1, 2, 2, 3), dtype=np.uint8))
+        finally:
+            inference_server.shutdown()
+            inference_server.server_close()
+
+        self.assertEqual(8, inference_server.batcher.requests)
+        # Four clients at once never had to wait for a batch each
+        self.assertLess(len(backend.batch_sizes), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import json
+import os
+import tempfile
+import numpy as np
+from PIL import Image
+from src import sweep
+
+
+class SweepTests(unittest.TestCase):
+    """Testing class to test all helper functions, classes, and functions
+       in sweep.py
+    """
+
+    def test_expand_search_space_grid(self):
+        trials = sweep.expand_search_space({"dropout": [0.1, 0.3], "filters": [[8, 16], [16, 32, 64]]})
+
+        self.assertEqual(4, len(trials))
+        self.assertIn({"dropout": 0.3, "filters": (8, 16)}, trials)
+
+    def test_expand_search_space_sample(self):
+        space = {"dropout": [0.1, 0.2, 0.3], "dense_units": [32, 64, 128]}
+        trials = sweep.expand_search_space(space, max_trials=4, seed=1)
+
+        self.assertEqual(4, len(trials))
+        self.assertEqual(4, len({tuple(sorted(trial.items())) for trial in trials}))
+        self.assertEqual(trials, sweep.expand_search_space(space, max_trials=4, seed=1))
+
+    def test_expand_search_space_unknown_key(self):
+        with self.assertRaises(ValueError):
+            sweep.expand_search_space({"learning_rate": [0.1]})
+
+    def test_run_sweep_saves_best_trial(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dataset_dir = os.path.join(tmp_dir, "datasets")
+            output_dir = os.path.join(tmp_dir, "model")
+            os.makedirs(output_dir)
+            for class_name, value in (("alice", 30), ("bob", 220)):
+                os.makedirs(os.path.join(dataset_dir, class_name))
+                for i in range(10):
+                    Image.fromarray(np.full((12, 16, 3), value + i, dtype=np.uint8)).save(
+                        os.path.join(dataset_dir, class_name, f"{i}.png"))
+
+            results = sweep.run_sweep(dataset_dir, output_dir, "test", 16, 12,
+                                      {"dropout": [0.1, 0.3], "filters": [[4]], "dense_units": [8]},
+                                      workers=2, threads_per_trial=1, epochs=1, save_policy="overwrite")
+
+            self.assertEqual([1, 2], [result["rank"] for result in results])
+            self.assertTrue(os.path.exists(os.path.join(output_dir, "test_model.h5")))
+
+            with open(os.path.join(output_dir, "test_sweep", "leaderboard.json")) as leaderboard_file:
+                leaderboard = json.load(leaderboard_file)
+            self.assertEqual(2, len(leaderboard))
+            for column in ("accuracy", "seconds", "size_kb", "latency_ms"):
+                self.assertIn(column, leaderboard[0])
+
+
+if __name__ == '__main__':
+    unittest.main()